@@ -15,10 +15,35 @@
 #    along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 """Producer to send messages to kafka server."""
+import atexit
 import json
+import logging
+import time
+import weakref
 
 from django.conf import settings
 from kafka import KafkaProducer
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+kafka_messages_sent_total = Counter(
+    "rbac_kafka_messages_sent_total", "Total number of messages acknowledged by the kafka server", ["topic"]
+)
+kafka_messages_failed_total = Counter(
+    "rbac_kafka_messages_failed_total", "Total number of messages which could not be sent to kafka", ["topic"]
+)
+kafka_messages_pending = Gauge(
+    "rbac_kafka_messages_pending", "Number of messages buffered by the producer and not yet acknowledged"
+)
+kafka_delivery_duration_seconds = Histogram(
+    "rbac_kafka_delivery_duration_seconds",
+    "Time from handing a message to the producer until it is acknowledged by the kafka server",
+    ["topic"],
+)
+
+# Producers which may hold buffered messages, flushed when the process shuts down
+_producers = weakref.WeakSet()
 
 
 class FakeKafkaProducer:
@@ -28,6 +53,10 @@ class FakeKafkaProducer:
         """No operation method."""
         pass
 
+    def flush(self, timeout=None):
+        """No operation method."""
+        pass
+
 
 class RBACProducer:
     """Kafka message producer to emit events to notification service."""
@@ -38,22 +67,76 @@ class RBACProducer:
             if settings.DEVELOPMENT or settings.MOCK_KAFKA or not settings.KAFKA_ENABLED:
                 self.producer = FakeKafkaProducer()
             else:
+                # Sends block for at most max_block_ms once buffer_memory is exhausted, which bounds the memory
+                # used by undelivered messages and slows down the callers when kafka can not keep up.
+                producer_config = {
+                    "linger_ms": settings.KAFKA_PRODUCER_LINGER_MS,
+                    "batch_size": settings.KAFKA_PRODUCER_BATCH_SIZE,
+                    "compression_type": settings.KAFKA_PRODUCER_COMPRESSION_TYPE,
+                    "buffer_memory": settings.KAFKA_PRODUCER_BUFFER_MEMORY,
+                    "max_block_ms": settings.KAFKA_PRODUCER_MAX_BLOCK_MS,
+                }
                 if settings.KAFKA_AUTH:
-                    self.producer = KafkaProducer(**settings.KAFKA_AUTH)
+                    self.producer = KafkaProducer(**settings.KAFKA_AUTH, **producer_config)
                 elif not settings.KAFKA_SERVERS:
                     raise AttributeError("Empty servers list")
                 else:
-                    self.producer = KafkaProducer(bootstrap_servers=settings.KAFKA_SERVERS)
+                    self.producer = KafkaProducer(bootstrap_servers=settings.KAFKA_SERVERS, **producer_config)
+            _producers.add(self)
         return self.producer
 
     def send_kafka_message(self, topic, message, headers=None):
         """Send message to kafka server."""
         producer = self.get_producer()
-        json_data = json.dumps(message).encode("utf-8")
+        json_data = json.dumps(message, separators=(",", ":")).encode("utf-8")
         if headers and not isinstance(headers, list):
             headers = [headers]
-        producer.send(topic, value=json_data, headers=headers)
 
+        kafka_messages_pending.inc()
+        try:
+            future = producer.send(topic, value=json_data, headers=headers)
+        except Exception:
+            kafka_messages_pending.dec()
+            kafka_messages_failed_total.labels(topic).inc()
+            logger.exception("Failed to send message to kafka topic %s.", topic)
+            raise
+        if future is None:
+            # The fake producer does not deliver anything
+            kafka_messages_pending.dec()
+            return
+        start = time.perf_counter()
+        future.add_callback(_on_delivery, topic, start)
+        future.add_errback(_on_delivery_error, topic)
+
+    def flush(self, timeout=None):
+        """Block until the buffered messages are sent to the kafka server."""
+        self.get_producer().flush(timeout)
+
+
+def _on_delivery(topic, start, record_metadata):
+    """Record a message acknowledged by the kafka server."""
+    kafka_messages_pending.dec()
+    kafka_messages_sent_total.labels(topic).inc()
+    kafka_delivery_duration_seconds.labels(topic).observe(time.perf_counter() - start)
+
+
+def _on_delivery_error(topic, exception):
+    """Record a message the producer gave up on."""
+    kafka_messages_pending.dec()
+    kafka_messages_failed_total.labels(topic).inc()
+    logger.error("Failed to deliver message to kafka topic %s: %s", topic, exception)
+
+
+def flush_producers(timeout=None):
+    """Send the messages buffered by the producers of this process."""
+    for rbac_producer in list(_producers):
+        try:
+            rbac_producer.flush(timeout)
+        except Exception:
+            logger.exception("Failed to flush kafka producer.")
+
+
+atexit.register(flush_producers, settings.KAFKA_PRODUCER_SHUTDOWN_TIMEOUT)
 
 """
 This consumer could be used for local testing.
@@ -29,6 +29,7 @@ from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils.html import escape
 from management.cache import TenantCache
+from management.data_migration.model import DATA_MIGRATION_NAME, data_migration_progress
 from management.models import Group, Permission, Role
 from management.principal.proxy import (
     API_TOKEN_HEADER,
@@ -171,7 +172,12 @@ def migration_progress(request):
     """View method for checking migration progress.
 
     GET /_private/api/migrations/progress/?migration_name=<migration_name>&limit=<limit>&offset=<offset>
+
+    The progress of the v1 to v2 data migration, with its throughput and ETA, is returned for the migration name
+    `v1_to_v2_data`.
     """
+    if request.method == "GET" and request.GET.get("migration_name") == DATA_MIGRATION_NAME:
+        return HttpResponse(json.dumps(data_migration_progress()), content_type="application/json")
     if request.method == "GET":
         limit = int(request.GET.get("limit", 0))
         offset = int(request.GET.get("offset", 0))
@@ -484,6 +490,7 @@ def data_migration(request):
     """View method for running migrations from V1 to V2 spiceDB schema.
 
     POST /_private/api/utils/data_migration/?exclude_apps=cost_management,rbac&orgs=id_1,id_2&write_relationships=True
+        &workers=4&resume=true
     """
     if request.method != "POST":
         return HttpResponse('Invalid method, only "POST" is allowed.', status=405)
@@ -494,6 +501,10 @@ def data_migration(request):
         "orgs": get_param_list(request, "orgs"),
         "write_relationships": request.GET.get("write_relationships", "False"),
     }
+    if "workers" in request.GET:
+        args["workers"] = int(request.GET["workers"])
+    if "resume" in request.GET:
+        args["resume"] = request.GET["resume"].lower() == "true"
     migrate_data_in_worker.delay(args)
     return HttpResponse("Data migration from V1 to V2 are running in a background worker.", status=202)
 
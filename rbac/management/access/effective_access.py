@@ -0,0 +1,153 @@
+#
+# Copyright 2024 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Build, query and verify the materialized per-principal effective access."""
+import hashlib
+import json
+import logging
+
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from management.access.model import EffectiveAccess, EffectiveAccessStatus
+from management.models import Access, Principal
+from management.utils import access_for_principal
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# Number of times the rows of a principal are built before giving up on catching up with its invalidations
+REFRESH_ATTEMPTS = 3
+
+
+def resource_definitions_hash(access: Access) -> str:
+    """Return a stable hash of the attribute filters of the access' resource definitions."""
+    filters = sorted(json.dumps(rd.attributeFilter, sort_keys=True) for rd in access.resourceDefinitions.all())
+    return hashlib.sha256(json.dumps(filters).encode()).hexdigest()
+
+
+def _access_by_key(principal: Principal, tenant, is_org_admin: bool) -> dict:
+    """Resolve the principal's access through the group/policy/role chain, keyed by permission and definitions."""
+    queryset = (
+        access_for_principal(principal, tenant, is_org_admin=is_org_admin)
+        .select_related("permission")
+        .prefetch_related("resourceDefinitions")
+        .order_by("id")
+    )
+    by_key = {}
+    for item in queryset:
+        by_key.setdefault((item.permission_id, resource_definitions_hash(item)), item)
+    return by_key
+
+
+def build_effective_access(principal: Principal, tenant) -> list:
+    """Build the (unsaved) effective access rows for a principal."""
+    granted = _access_by_key(principal, tenant, is_org_admin=False)
+    admin_granted = {}
+    if principal.type == Principal.Types.USER:
+        admin_granted = _access_by_key(principal, tenant, is_org_admin=True)
+
+    rows = []
+    for admin_only, by_key in ((False, granted), (True, admin_granted)):
+        for key, access in by_key.items():
+            if admin_only and key in granted:
+                continue
+            rows.append(
+                EffectiveAccess(
+                    tenant_id=principal.tenant_id,
+                    principal=principal,
+                    access=access,
+                    permission_id=access.permission_id,
+                    application=access.permission.application,
+                    resource_definitions_hash=key[1],
+                    admin_only=admin_only,
+                )
+            )
+    return rows
+
+
+def refresh_effective_access(principal: Principal, tenant) -> int:
+    """Replace the principal's effective access rows and mark them as built from the current version.
+
+    The rows are built before taking the lock on the principal's status, so they are built again when an invalidation
+    bumped the version in the meantime. Refreshes of the same principal are serialized by that lock.
+    """
+    EffectiveAccessStatus.objects.get_or_create(principal=principal)
+    for attempt in range(1, REFRESH_ATTEMPTS + 1):
+        version = EffectiveAccessStatus.objects.values_list("version", flat=True).get(principal=principal)
+        rows = build_effective_access(principal, tenant)
+        with transaction.atomic():
+            status = EffectiveAccessStatus.objects.select_for_update().get(principal=principal)
+            if status.built_version == status.version:
+                # Another request refreshed the rows while these were built
+                return len(rows)
+            if status.version != version and attempt < REFRESH_ATTEMPTS:
+                continue
+            EffectiveAccess.objects.filter(principal=principal).delete()
+            EffectiveAccess.objects.bulk_create(rows)
+            if status.version == version:
+                status.built_version = version
+            else:
+                logger.warning(
+                    "Effective access of principal %s kept changing while refreshed, leaving it stale.", principal.uuid
+                )
+            status.refreshed = timezone.now()
+            status.save(update_fields=["built_version", "refreshed"])
+            return len(rows)
+
+
+def get_effective_access_queryset(principal: Principal, tenant, application=None, is_org_admin=False) -> QuerySet:
+    """Return the principal's access for the given application(s) from the materialized table.
+
+    Cross account principals get their roles from time bound requests, so they are always resolved directly.
+    """
+    if principal.cross_account:
+        return access_for_principal(principal, tenant, application=application).order_by("id")
+
+    if not EffectiveAccessStatus.fresh_set().filter(principal=principal).exists():
+        refresh_effective_access(principal, tenant)
+
+    lookup = {"effective_access__principal": principal}
+    if application:
+        lookup["effective_access__application__in"] = application.split(",")
+    if not is_org_admin:
+        lookup["effective_access__admin_only"] = False
+    return Access.objects.filter(**lookup).order_by("id")
+
+
+def check_effective_access(principal: Principal, tenant) -> dict:
+    """Compare the materialized rows of a principal against the access resolved through the group chain.
+
+    Returns the keys (permission, org admin flag and definitions hash) that are missing from, or unexpected in, the
+    table. Both are empty when the table is consistent.
+    """
+    include_admin = principal.type == Principal.Types.USER
+    expected = set()
+    for is_org_admin in (False, True) if include_admin else (False,):
+        for permission_id, rd_hash in _access_by_key(principal, tenant, is_org_admin):
+            expected.add((permission_id, is_org_admin, rd_hash))
+
+    actual = set()
+    rows = EffectiveAccess.objects.filter(principal=principal).values_list(
+        "permission_id", "admin_only", "resource_definitions_hash"
+    )
+    for permission_id, admin_only, rd_hash in rows:
+        if include_admin:
+            actual.add((permission_id, True, rd_hash))
+        if not admin_only:
+            actual.add((permission_id, False, rd_hash))
+
+    return {"missing": expected - actual, "unexpected": actual - expected}
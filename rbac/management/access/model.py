@@ -0,0 +1,187 @@
+#
+# Copyright 2024 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+"""Model for the materialized per-principal effective access."""
+import logging
+
+from django.db import models, transaction
+from django.db.models import F, Q, signals
+from django.utils import timezone
+from management.group.model import Group
+from management.permission.model import Permission
+from management.policy.model import Policy
+from management.principal.model import Principal
+from management.role.model import Access, ResourceDefinition, Role
+
+from api.models import Tenant, TenantAwareModel
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class EffectiveAccess(TenantAwareModel):
+    """An access a principal is granted through its groups, the default groups or cross account requests.
+
+    Rows are unique per principal, permission and set of resource definitions, which mirrors the de-duplication that
+    the access endpoint performs. Rows flagged as "admin_only" are only granted when the principal is an org admin.
+    """
+
+    principal = models.ForeignKey(Principal, on_delete=models.CASCADE, related_name="effective_access")
+    access = models.ForeignKey(Access, on_delete=models.CASCADE, related_name="effective_access")
+    permission = models.ForeignKey(Permission, on_delete=models.CASCADE, related_name="effective_access")
+    application = models.TextField(null=False)
+    resource_definitions_hash = models.CharField(max_length=64, null=False)
+    admin_only = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [models.Index(fields=["principal", "application"], name="effective_access_lookup")]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["principal", "permission", "resource_definitions_hash", "admin_only"],
+                name="unique effective access per principal",
+            )
+        ]
+
+
+class EffectiveAccessStatus(models.Model):
+    """Tracks whether the effective access rows of a principal are materialized and up to date.
+
+    Every invalidation bumps the version, and the rows are up to date when they were built from the current version.
+    """
+
+    principal = models.OneToOneField(
+        Principal, on_delete=models.CASCADE, primary_key=True, related_name="effective_access_status"
+    )
+    version = models.PositiveIntegerField(default=0)
+    built_version = models.PositiveIntegerField(null=True)
+    refreshed = models.DateTimeField(default=timezone.now)
+
+    @staticmethod
+    def fresh_set():
+        """Queryset for the statuses whose rows are up to date."""
+        return EffectiveAccessStatus.objects.filter(built_version=F("version"))
+
+
+def _invalidate_statuses(statuses):
+    """Bump the version of the given statuses, now and again once the current transaction commits.
+
+    The first bump locks the status rows until the change commits, so a refresh about to mark its rows as up to date
+    waits and then sees the new version. The second one catches the statuses created by refreshes which started
+    before the change was visible.
+    """
+    statuses.update(version=F("version") + 1)
+    transaction.on_commit(lambda: statuses.update(version=F("version") + 1))
+
+
+def invalidate_effective_access(principals):
+    """Mark the effective access of the given principals (a queryset or a list of ids) as stale.
+
+    The stale rows are replaced the next time the principal's access is looked up or rebuilt.
+    """
+    if isinstance(principals, models.QuerySet):
+        # Resolved now, as the memberships may be gone by the time the transaction commits
+        principals = list(principals.values_list("id", flat=True))
+    _invalidate_statuses(EffectiveAccessStatus.objects.filter(principal__in=principals))
+
+
+def invalidate_effective_access_for_tenant(tenant):
+    """Mark the effective access of every principal in the tenant as stale.
+
+    The public tenant owns the system default groups, which are used by every tenant without a custom default group,
+    so a change there invalidates every principal.
+    """
+    logger.info("Invalidating effective access for tenant %s", tenant)
+    if tenant.tenant_name == "public":
+        _invalidate_statuses(EffectiveAccessStatus.objects.all())
+    else:
+        _invalidate_statuses(EffectiveAccessStatus.objects.filter(principal__tenant=tenant))
+
+
+def _invalidate_for_groups(groups):
+    """Invalidate the effective access of the members of the given groups."""
+    default_group_tenants = Tenant.objects.filter(
+        Q(group__in=groups) & (Q(group__platform_default=True) | Q(group__admin_default=True))
+    ).distinct()
+    for tenant in default_group_tenants:
+        invalidate_effective_access_for_tenant(tenant)
+    invalidate_effective_access(Principal.objects.filter(group__in=groups).values("id"))
+
+
+def group_deleted_effective_access_handler(sender=None, instance=None, using=None, **kwargs):
+    """Signal handler to invalidate the effective access of the members of a deleted Group."""
+    logger.info("Handling signal for deleted group %s - invalidating effective access", instance)
+    _invalidate_for_groups(Group.objects.filter(pk=instance.pk))
+
+
+def principals_to_groups_effective_access_handler(
+    sender=None, instance=None, action=None, reverse=None, model=None, pk_set=None, using=None, **kwargs
+):
+    """Signal handler to invalidate effective access when Group membership changes."""
+    if action in ("post_add", "pre_remove"):
+        if isinstance(instance, Group):
+            invalidate_effective_access(list(pk_set))
+        elif isinstance(instance, Principal):
+            invalidate_effective_access([instance.pk])
+    elif action == "pre_clear":
+        if isinstance(instance, Group):
+            invalidate_effective_access(instance.principals.values("id"))
+        elif isinstance(instance, Principal):
+            invalidate_effective_access([instance.pk])
+
+
+def policy_changed_effective_access_handler(sender=None, instance=None, using=None, **kwargs):
+    """Signal handler to invalidate effective access when a Policy is saved or deleted."""
+    if instance.group_id:
+        _invalidate_for_groups(Group.objects.filter(pk=instance.group_id))
+
+
+def policy_to_roles_effective_access_handler(
+    sender=None, instance=None, action=None, reverse=None, model=None, pk_set=None, using=None, **kwargs
+):
+    """Signal handler to invalidate effective access on Policy/Role m2m change."""
+    if action not in ("post_add", "pre_remove", "pre_clear"):
+        return
+    if isinstance(instance, Policy):
+        if instance.group_id:
+            _invalidate_for_groups(Group.objects.filter(pk=instance.group_id))
+    elif isinstance(instance, Role):
+        if action == "pre_clear":
+            _invalidate_for_groups(Group.objects.filter(policies__roles=instance))
+        else:
+            _invalidate_for_groups(Group.objects.filter(policies__in=pk_set))
+
+
+def role_related_obj_change_effective_access_handler(sender=None, instance=None, using=None, **kwargs):
+    """Signal handler to invalidate effective access on Role, Access or ResourceDefinition change."""
+    role = instance.role
+    if role is not None:
+        _invalidate_for_groups(Group.objects.filter(policies__roles=role))
+
+
+# Connected even while the table is not read, so that rows built before it was disabled are not fresh once it is
+# enabled again.
+signals.pre_delete.connect(group_deleted_effective_access_handler, sender=Group)
+signals.m2m_changed.connect(principals_to_groups_effective_access_handler, sender=Group.principals.through)
+signals.post_save.connect(policy_changed_effective_access_handler, sender=Policy)
+signals.pre_delete.connect(policy_changed_effective_access_handler, sender=Policy)
+signals.m2m_changed.connect(policy_to_roles_effective_access_handler, sender=Policy.roles.through)
+signals.pre_delete.connect(role_related_obj_change_effective_access_handler, sender=Role)
+signals.pre_delete.connect(role_related_obj_change_effective_access_handler, sender=Access)
+signals.pre_delete.connect(role_related_obj_change_effective_access_handler, sender=ResourceDefinition)
+signals.post_save.connect(role_related_obj_change_effective_access_handler, sender=Role)
+signals.post_save.connect(role_related_obj_change_effective_access_handler, sender=Access)
+signals.post_save.connect(role_related_obj_change_effective_access_handler, sender=ResourceDefinition)
@@ -16,6 +16,7 @@
 #
 
 """View for principal access."""
+from django.conf import settings
 from management.cache import AccessCache
 from management.models import Access
 from management.querysets import get_access_queryset
@@ -98,8 +99,12 @@ class AccessView(APIView):
 
     def get_queryset(self, ordering):
         """Define the query set."""
-        unique_columns = ["permission_id", "resourceDefinitions__attributeFilter"]
-        access_queryset = Access.objects.filter(id__in=self.get_access_queryset_unique_by_column(*unique_columns))
+        if settings.EFFECTIVE_ACCESS_TABLE_ENABLED:
+            # The materialized rows are already unique per permission and resource definitions.
+            access_queryset = get_access_queryset(self.request).select_related("permission")
+        else:
+            unique_columns = ["permission_id", "resourceDefinitions__attributeFilter"]
+            access_queryset = Access.objects.filter(id__in=self.get_access_queryset_unique_by_column(*unique_columns))
 
         if ordering:
             if ordering[0] == "-":
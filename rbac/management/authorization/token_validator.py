@@ -16,16 +16,23 @@
 #
 
 """A token introspector class which validates that the given token is valid."""
+import base64
+import hashlib
+import json
 import logging
+import os
 import re
+import threading
+import time
 
 import requests
 from django.conf import settings
 from joserfc import jwt
 from joserfc.jwk import KeySet
 from joserfc.jwt import JWTClaimsRegistry, Token
-from management.cache import JWKSCache
+from management.cache import JWKSCache, LocalTokenCache
 from requests import Response
+from requests.adapters import HTTPAdapter
 from rest_framework import status
 from rest_framework.request import Request
 
@@ -36,6 +43,126 @@ from .unable_meet_prerequisites import UnableMeetPrerequisitesError
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def it_sso_session():
+    """Return the keep-alive session to IT's SSO of this process, which its threads share."""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session_pid != pid:
+        with _session_lock:
+            if _session_pid != pid:
+                # Connections are not shared with the parent of a forked process.
+                session = requests.Session()
+                # The OIDC configuration and the JWKS are only fetched by one thread at a time.
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=2)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session, _session_pid = session, pid
+    return _session
+
+
+def import_key_set(jwks_certificates: dict) -> KeySet:
+    """Import IT's public keys from the JSON Web Key Set contents."""
+    try:
+        return KeySet.import_key_set(jwks_certificates)
+    except Exception as e:
+        logger.error(f"Unable to import IT's public keys to validate the token: {e}")
+        raise UnableMeetPrerequisitesError("unable to import IT's public keys to validate the token")
+
+
+def token_key_id(token: str):
+    """Return the id of the key which signed the token, from its header, or None."""
+    try:
+        header = token.split(".")[0]
+        return json.loads(base64.urlsafe_b64decode(header + "=" * (-len(header) % 4))).get("kid")
+    except (ValueError, AttributeError):
+        return None
+
+
+class KeySetCache:
+    """Per process cache of IT's imported JSON Web Key Set.
+
+    The key set expires after IT_TOKEN_JWKS_LOCAL_CACHE_TTL seconds. It is refreshed in the background shortly before,
+    and right away once it has expired or when a token is signed by a key it doesn't have, which happens when IT rotates
+    its keys. Only one thread refreshes it at a time. The keys are only imported again when the contents of the JWKS
+    change.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        """Initialize the empty cache."""
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._key_set = None
+        self._key_ids = frozenset()
+        self._contents_hash = None
+        self._expires = 0.0
+        self._last_refresh = None
+
+    def _is_usable(self, now, kid):
+        """Whether the cached key set can be used for a token signed by the given key."""
+        if self._key_set is None or now >= self._expires:
+            return False
+        if kid is None or kid in self._key_ids:
+            return True
+        # Refreshes for unknown keys are rate limited, so that tokens with bogus key ids don't make us hammer IT.
+        return self._last_refresh is not None and now - self._last_refresh < settings.IT_TOKEN_JWKS_MIN_REFRESH_SECONDS
+
+    def _store(self, jwks_certificates):
+        """Store the key set of the JWKS contents, importing them only if they changed."""
+        contents_hash = hashlib.sha256(json.dumps(jwks_certificates, sort_keys=True).encode()).hexdigest()
+        if contents_hash != self._contents_hash:
+            self._key_set = import_key_set(jwks_certificates)
+            self._key_ids = frozenset(key.get("kid") for key in jwks_certificates.get("keys", []))
+            self._contents_hash = contents_hash
+            logger.info("Imported IT's JSON Web Key Set with the keys %s.", sorted(map(str, self._key_ids)))
+        self._expires = self._clock() + settings.IT_TOKEN_JWKS_LOCAL_CACHE_TTL
+
+    def _refresh_in_background(self, load):
+        """Refresh the key set from a new thread, unless a refresh is already in progress."""
+        if not self._lock.acquire(blocking=False):
+            return
+
+        def refresh():
+            try:
+                self._last_refresh = self._clock()
+                self._store(load(True))
+            except Exception:
+                logger.exception("Unable to refresh IT's JSON Web Key Set in the background.")
+            finally:
+                self._lock.release()
+
+        threading.Thread(target=refresh, name="jwks-refresh", daemon=True).start()
+
+    def get(self, load, kid=None) -> KeySet:
+        """Get the key set to verify a token signed by the given key.
+
+        The load function is called with whether Redis may be used, and returns the contents of the JWKS.
+        """
+        now = self._clock()
+        if self._is_usable(now, kid):
+            if now >= self._expires - settings.IT_TOKEN_JWKS_REFRESH_AHEAD_SECONDS:
+                self._refresh_in_background(load)
+            return self._key_set
+
+        with self._lock:
+            # Another thread may have refreshed the key set while this one was waiting.
+            now = self._clock()
+            if self._is_usable(now, kid):
+                return self._key_set
+            # Redis holds the same keys when one is missing, so they are fetched from IT.
+            use_cache = self._key_set is None or now >= self._expires
+            self._last_refresh = now
+            self._store(load(use_cache))
+            return self._key_set
+
+
+_key_set_cache = KeySetCache()
+_validated_tokens = LocalTokenCache(settings.IT_TOKEN_VALIDATION_CACHE_SIZE, settings.IT_TOKEN_VALIDATION_CACHE_TTL)
+
 
 class ITSSOTokenValidator:
     """JWT token  validator."""
@@ -67,22 +194,26 @@ class ITSSOTokenValidator:
         # Initialize the cache dependency.
         self.jwks_cache = JWKSCache()
 
-    def _get_json_web_keyset(self) -> KeySet:
-        try:
-            jwks_certificates = self.jwks_cache.get_jwks_response()
-        except Exception as e:
-            jwks_certificates = None
-            logger.debug(
-                "Fetching the JSON Web Key Set from Redis raised an exception, attempting to fetch the keys from the"
-                f" OIDC configuration instead. Raised error: {e}"
-            )
+    def _get_json_web_keyset_response(self, use_cache: bool = True) -> dict:
+        """Get IT's JSON Web Key Set contents from Redis, or from IT when they are not cached or use_cache is False."""
+        jwks_certificates = None
+        if use_cache:
+            try:
+                jwks_certificates = self.jwks_cache.get_jwks_response()
+            except Exception as e:
+                logger.debug(
+                    "Fetching the JSON Web Key Set from Redis raised an exception, attempting to fetch the keys from"
+                    f" the OIDC configuration instead. Raised error: {e}"
+                )
 
         if jwks_certificates:
             logger.debug("JWKS response loaded from cache. Skipped fetching the OIDC configuration.")
         else:
             # Attempt getting IT's OIDC configuration.
             try:
-                oidc_response: Response = requests.get(url=self.oidc_configuration_url)
+                oidc_response: Response = it_sso_session().get(
+                    url=self.oidc_configuration_url, timeout=self.it_request_timeout_seconds
+                )
             except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as ce:
                 logger.error("Unable to fetch the OIDC configuration to validate the token: %s", ce)
 
@@ -121,7 +252,9 @@ class ITSSOTokenValidator:
 
             # Attempt getting their public certificates.
             try:
-                jwks_certificates_response: Response = requests.get(url=jwks_uri)
+                jwks_certificates_response: Response = it_sso_session().get(
+                    url=jwks_uri, timeout=self.it_request_timeout_seconds
+                )
             except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as ce:
                 logger.error("unable to fetch the JWKS certificates to validate the token: %s", ce)
 
@@ -146,12 +279,11 @@ class ITSSOTokenValidator:
 
             jwks_certificates = jwks_certificates_response.json()
 
-        # Import the certificates.
-        try:
-            return KeySet.import_key_set(jwks_certificates)
-        except Exception as e:
-            logger.error(f"Unable to import IT's public keys to validate the token: {e}")
-            raise UnableMeetPrerequisitesError("unable to import IT's public keys to validate the token")
+        return jwks_certificates
+
+    def _get_json_web_keyset(self) -> KeySet:
+        """Get and import IT's JSON Web Key Set."""
+        return import_key_set(self._get_json_web_keyset_response())
 
     def validate_token(self, request: Request, additional_scopes_to_validate: set[ScopeClaims]) -> str:
         """Validate the JWT token issued by Red Hat's SSO.
@@ -174,15 +306,26 @@ class ITSSOTokenValidator:
         if bearer_token.startswith("Bearer"):
             bearer_token = re.sub("Bearer\\s+", "", bearer_token)
 
-        # Import the certificates.
-        key_set: KeySet = self._get_json_web_keyset()
-
-        # Decode the token.
-        try:
-            token: Token = jwt.decode(value=bearer_token, key=key_set)
-        except Exception as e:
-            logging.warning("[request_id: %s] Unable to decode token: %s", getattr(request, "req_id", None), str(e))
-            raise InvalidTokenError("Unable to decode token")
+        # Tokens validated recently are taken from the in-process cache, so only their scopes are checked again.
+        token_hash = hashlib.sha256(bearer_token.encode()).hexdigest()
+        claims = _validated_tokens.get(token_hash) if settings.IT_TOKEN_VALIDATION_CACHE_TTL else None
+        cached = claims is not None
+        if not cached:
+            # Import the certificates, or get them from the in-process cache.
+            if settings.IT_TOKEN_JWKS_LOCAL_CACHE_TTL:
+                key_set: KeySet = _key_set_cache.get(self._get_json_web_keyset_response, token_key_id(bearer_token))
+            else:
+                key_set = self._get_json_web_keyset()
+
+            # Decode the token.
+            try:
+                token: Token = jwt.decode(value=bearer_token, key=key_set)
+            except Exception as e:
+                logging.warning(
+                    "[request_id: %s] Unable to decode token: %s", getattr(request, "req_id", None), str(e)
+                )
+                raise InvalidTokenError("Unable to decode token")
+            claims = token.claims
 
         # Make sure that the token issuer matches the IT issuer and that the scope contains the "service accounts"
         # claim.
@@ -195,7 +338,7 @@ class ITSSOTokenValidator:
             # may have.
             if len(additional_scopes_to_validate) > 0:
                 # Make sure that the "scope" claim of the token is not empty.
-                scope_claim = token.claims.get("scope")
+                scope_claim = claims.get("scope")
                 if not scope_claim:
                     raise ValueError("the provided does not have any contents in the scope claim")
 
@@ -207,8 +350,9 @@ class ITSSOTokenValidator:
                         )
 
             # Validate the rest of the claims, including the token expiration which will be validated with the function
-            # below.
-            claim_requests.validate(token.claims)
+            # below. Cached claims were validated already, and are not kept past the expiration.
+            if not cached:
+                claim_requests.validate(claims)
         except Exception as e:
             logging.warning(
                 "[request_id: %s] Token rejected for having invalid claims: %s",
@@ -217,4 +361,11 @@ class ITSSOTokenValidator:
             )
             raise InvalidTokenError("The token's claims are invalid")
 
+        if not cached and settings.IT_TOKEN_VALIDATION_CACHE_TTL:
+            ttl = settings.IT_TOKEN_VALIDATION_CACHE_TTL
+            if claims.get("exp") is not None:
+                ttl = min(ttl, claims["exp"] - time.time())
+            if ttl > 0:
+                _validated_tokens.set(token_hash, claims, ttl=ttl)
+
         return bearer_token
@@ -1,15 +1,23 @@
 """Redis-based caching of per-Principal per-app access policy."""
 
 import contextlib
+import copy
 import json
 import logging
+import os
 import pickle
+import threading
+import time
+from collections import OrderedDict
 
 from django.conf import settings
-from prometheus_client import Counter
-from redis import BlockingConnectionPool, exceptions
+from django.db import transaction
+from prometheus_client import Counter, Gauge
+from redis import BlockingConnectionPool, ConnectionPool, exceptions
 from redis.client import Redis
 
+from rbac.instrumentation import record_redis_call
+
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 _connection_pool = BlockingConnectionPool(**settings.REDIS_CACHE_CONNECTION_PARAMS)  # should match gunicorn.threads
 
@@ -17,6 +25,147 @@ redis_enable_cache_get_total = Counter("redis_enable_cache_get_total", "Total am
 redis_disable_cache_get_total = Counter(
     "redis_disable_cache_get_total", "Total amount of times cache has been disabled"
 )
+redis_circuit_breaker_state = Gauge(
+    "redis_circuit_breaker_state", "State of the Redis circuit breaker (0 closed, 1 half-open, 2 open)"
+)
+tenant_local_cache_get_total = Counter(
+    "tenant_local_cache_get_total",
+    "Total amount of in-process tenant cache lookups by result",
+    ["result"],
+)
+tenant_local_cache_eviction_total = Counter(
+    "tenant_local_cache_eviction_total",
+    "Total amount of tenants evicted from the in-process cache",
+    ["reason"],
+)
+principal_local_cache_get_total = Counter(
+    "principal_local_cache_get_total",
+    "Total amount of in-process principal lookup cache lookups by result",
+    ["result"],
+)
+principal_local_cache_eviction_total = Counter(
+    "principal_local_cache_eviction_total",
+    "Total amount of principal lookups evicted from the in-process cache",
+    ["reason"],
+)
+token_local_cache_get_total = Counter(
+    "token_local_cache_get_total",
+    "Total amount of in-process validated token cache lookups by result",
+    ["result"],
+)
+token_local_cache_eviction_total = Counter(
+    "token_local_cache_eviction_total",
+    "Total amount of validated tokens evicted from the in-process cache",
+    ["reason"],
+)
+principal_cache_get_total = Counter(
+    "principal_cache_get_total", "Total amount of principal lookup cache lookups by result", ["result"]
+)
+principal_cache_bop_seconds_saved_total = Counter(
+    "principal_cache_bop_seconds_saved_total", "Total seconds of BOP requests saved by the principal lookup cache"
+)
+access_cache_get_total = Counter(
+    "access_cache_get_total",
+    "Total amount of access cache lookups by result (hit, miss, or stale when the tenant was invalidated)",
+    ["result"],
+)
+access_cache_tenant_invalidation_total = Counter(
+    "access_cache_tenant_invalidation_total", "Total amount of tenant-wide access cache invalidations"
+)
+
+
+class RedisCircuitBreaker:
+    """Track the health of Redis from the outcome of the cache commands.
+
+    closed: commands are sent. The breaker opens after `failure_threshold` consecutive failures.
+    open: commands are skipped for `open_seconds`, after which the breaker becomes half-open.
+    half-open: one trial command is let through every `half_open_seconds`. A success closes the breaker and a
+    failure opens it again.
+    """
+
+    CLOSED = "closed"
+    HALF_OPEN = "half_open"
+    OPEN = "open"
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold, open_seconds, half_open_seconds, clock=time.monotonic):
+        """Init the breaker in the closed state."""
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.half_open_seconds = half_open_seconds
+        self.state = self.CLOSED
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_at = None
+        redis_circuit_breaker_state.set(self.STATE_VALUES[self.CLOSED])
+
+    def allow_request(self):
+        """Return whether a command should be sent to Redis."""
+        if self.state == self.CLOSED:
+            return True
+        with self._lock:
+            now = self._clock()
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.open_seconds:
+                    return False
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN:
+                if self._trial_at is not None and now - self._trial_at < self.half_open_seconds:
+                    return False
+                self._trial_at = now
+            return True
+
+    def record_success(self):
+        """Record a successful command."""
+        if self.state == self.CLOSED and not self._failures:
+            return
+        with self._lock:
+            self._failures = 0
+            if self.state != self.CLOSED:
+                self._transition(self.CLOSED)
+
+    def record_failure(self):
+        """Record a failed command."""
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+                if self.state != self.OPEN:
+                    self._transition(self.OPEN)
+
+    def _transition(self, state):
+        """Move the breaker to the given state. Must be called with the lock held."""
+        logger.info("Redis circuit breaker moving from %s to %s.", self.state, state)
+        self.state = state
+        self._trial_at = None
+        redis_circuit_breaker_state.set(self.STATE_VALUES[state])
+        if state == self.CLOSED:
+            redis_enable_cache_get_total.inc()
+        elif state == self.OPEN:
+            redis_disable_cache_get_total.inc()
+
+
+circuit_breaker = RedisCircuitBreaker(
+    failure_threshold=settings.REDIS_CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    open_seconds=settings.REDIS_CIRCUIT_BREAKER_OPEN_SECONDS,
+    half_open_seconds=settings.REDIS_CIRCUIT_BREAKER_HALF_OPEN_SECONDS,
+)
+
+
+class InstrumentedRedis(Redis):
+    """Redis client counting its round trips in the stats of the current request."""
+
+    def execute_command(self, *args, **options):
+        """Count and execute a command."""
+        record_redis_call()
+        return super().execute_command(*args, **options)
+
+    def pipeline(self, *args, **kwargs):
+        """Count a pipeline as a single round trip."""
+        record_redis_call()
+        return super().pipeline(*args, **kwargs)
 
 
 class BasicCache:
@@ -25,76 +174,60 @@ class BasicCache:
     def __init__(self):
         """Init the class."""
         self._connection = None
-        self.use_caching = True
 
     @property
     def connection(self):
         """Get Redis connection from the pool."""
         if not self._connection:
-            self._connection = Redis(connection_pool=_connection_pool, ssl=settings.REDIS_SSL)
-            try:
-                self._connection.ping()
-            except exceptions.RedisError:
-                self._connection = None
-                raise
+            self._connection = InstrumentedRedis(connection_pool=_connection_pool, ssl=settings.REDIS_SSL)
         return self._connection
 
-    def enable_caching(self):
-        """Enable caching and increment prometheus metric that redis caching is enabled."""
-        self.use_caching = True
-        logger.info("Redis Cache Enabled")
-        redis_enable_cache_get_total.inc()
-        return self.use_caching
-
-    def disable_caching(self):
-        """Disable caching and increment prometheus metric that redis caching is disabled."""
-        self.use_caching = False
-        logger.info("Redis Cache Disabled")
-        redis_disable_cache_get_total.inc()
-        return self.use_caching
-
     def redis_health_check(self):
-        """Check whether redis cache is reachable. If it is not reachable, then disable caching."""
-        self._connection = Redis(connection_pool=_connection_pool, ssl=settings.REDIS_SSL)
+        """Ping redis and feed the outcome to the circuit breaker."""
         try:
-            response = self._connection.ping()
-            if response:
-                logger.info("Redis cache is reachable.")
-                self.enable_caching()
-                return True
-            else:
-                logger.info("Redis cache is not reachable.")
-                self.disable_caching()
-                return False
-        except Exception as e:
-            logger.exception("Error:", e)
+            response = self.connection.ping()
+        except exceptions.RedisError:
+            logger.exception("Redis cache is not reachable.")
+            response = False
+        if response:
+            circuit_breaker.record_success()
+            return True
+        circuit_breaker.record_failure()
+        return False
 
     @contextlib.contextmanager
     def delete_handler(self, err_msg):
-        """Handle delete events."""
+        """Handle delete events.
+
+        Deletes are attempted even when the circuit breaker is open, so that invalidations are not lost if Redis is
+        reachable again.
+        """
         try:
             yield
         except exceptions.RedisError:
+            circuit_breaker.record_failure()
             logger.exception(err_msg)
+        else:
+            circuit_breaker.record_success()
 
     def get_from_redis(self, key):
         """Get object from redis based on key."""
         raise NotImplementedError("Please override the get_from_redis method.")
 
     def get_cached(self, key, error_message):
-        """Get cached object from redis, throw error if there is any."""
+        """Get cached object from redis, returning None if Redis is unhealthy or fails."""
+        if not circuit_breaker.allow_request():
+            # Retrieve data directly
+            logger.debug("Not Retrieving Data from Redis Cache")
+            return None
         try:
-            if self.redis_health_check() is True:
-                if self.use_caching:
-                    return self.get_from_redis(key)
-            else:
-                # Retrieve data directly
-                logger.info("Not Retrieving Data from Redis Cache")
-                self.disable_caching()
-                pass
+            obj = self.get_from_redis(key)
         except exceptions.RedisError:
+            circuit_breaker.record_failure()
             logger.exception(error_message)
-        return None
+            return None
+        circuit_breaker.record_success()
+        return obj
 
     def delete_cached(self, key, obj_name):
         """Delete cache from redis."""
@@ -109,12 +242,17 @@ class BasicCache:
 
     def save(self, key, item, obj_name):
         """Save cache including exception handler."""
+        if not circuit_breaker.allow_request():
+            return
         try:
             logger.info(f"Caching {obj_name} for {key}")
             with self.connection.pipeline() as pipe:
                 self.set_cache(pipe, key, item)
         except exceptions.RedisError:
+            circuit_breaker.record_failure()
             logger.exception(f"Error writing {obj_name} for {key}")
+        else:
+            circuit_breaker.record_success()
         finally:
             try:
                 pipe.reset()
@@ -122,6 +260,145 @@ class BasicCache:
                 pass
 
 
+TENANT_INVALIDATION_CHANNEL = "rbac::tenant::invalidate"
+
+
+class LocalCache:
+    """Bounded, per-process LRU cache with a TTL.
+
+    Subclasses set the counters the lookups and evictions are recorded on.
+    """
+
+    get_total = None
+    eviction_total = None
+
+    def __init__(self, maxsize, ttl, clock=time.monotonic):
+        """Init the cache."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _copy(value):
+        """Return the instance of a cached value handed to, or taken from, callers."""
+        return value
+
+    def get(self, key):
+        """Return the cached value, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                self.eviction_total.labels(reason="expired").inc()
+                entry = None
+            if entry is None:
+                self.get_total.labels(result="miss").inc()
+                return None
+            self._entries.move_to_end(key)
+        self.get_total.labels(result="hit").inc()
+        return self._copy(entry[1])
+
+    def set(self, key, value, ttl=None):
+        """Cache the value for ttl seconds (the cache's TTL by default), evicting the least recently used when full."""
+        with self._lock:
+            self._entries[key] = (self._clock() + (self.ttl if ttl is None else ttl), self._copy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.eviction_total.labels(reason="size").inc()
+
+    def delete(self, key):
+        """Drop the value from the cache."""
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self.eviction_total.labels(reason="invalidated").inc()
+
+    def clear(self):
+        """Drop every value from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+
+class LocalTenantCache(LocalCache):
+    """Bounded, per-process LRU cache of tenants with a TTL, kept in front of the Redis TenantCache.
+
+    Every process subscribes to TENANT_INVALIDATION_CHANNEL, on which TenantCache.delete_tenant publishes the org id.
+    Entries are only served while that subscription is up; the TTL bounds staleness if a message is missed anyway.
+    """
+
+    get_total = tenant_local_cache_get_total
+    eviction_total = tenant_local_cache_eviction_total
+
+    @staticmethod
+    def _copy(value):
+        """Return a copy of the tenant: requests may modify their tenant, so they each get their own instance."""
+        return copy.copy(value)
+
+
+class TenantInvalidationListener:
+    """Background thread dropping tenants from the local cache when they are deleted in any process.
+
+    The thread is started lazily so that each forked worker gets its own. The local cache is cleared whenever the
+    subscription is (re)established, since messages may have been missed while it was down.
+    """
+
+    def __init__(self, local_cache):
+        """Init the listener."""
+        self.local_cache = local_cache
+        self.subscribed = False
+        self._lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+
+    def ensure_started(self):
+        """Start the listener thread in this process if it is not running."""
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self.subscribed = False
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="tenant-cache-invalidation", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """Listen for invalidations, reconnecting with a backoff."""
+        # A dedicated connection without a socket timeout, as the subscription holds it for the process' lifetime.
+        params = {
+            **settings.REDIS_CACHE_CONNECTION_PARAMS,
+            "max_connections": 1,
+            "socket_timeout": None,
+            "health_check_interval": 30,
+        }
+        connection = Redis(connection_pool=ConnectionPool(**params))
+        backoff = 1
+        while True:
+            try:
+                with connection.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    pubsub.subscribe(TENANT_INVALIDATION_CHANNEL)
+                    self.local_cache.clear()
+                    self.subscribed = True
+                    backoff = 1
+                    while True:
+                        # Polling lets the connection health check detect a silently dropped subscription.
+                        message = pubsub.get_message(timeout=30)
+                        if message and message["type"] == "message":
+                            self.local_cache.delete(message["data"].decode())
+            except exceptions.RedisError as err:
+                logger.warning("Tenant cache invalidation listener disconnected: %s", err)
+            self.subscribed = False
+            self.local_cache.clear()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+
+_local_tenants = LocalTenantCache(settings.TENANT_LOCAL_CACHE_SIZE, settings.TENANT_LOCAL_CACHE_TTL)
+_tenant_invalidation_listener = TenantInvalidationListener(_local_tenants)
+
+
 class TenantCache(BasicCache):
     """Redis-based caching of tenant."""
 
@@ -136,8 +413,19 @@ class TenantCache(BasicCache):
             return pickle.loads(obj)
 
     def get_tenant(self, key):
-        """Get the tenant by tenant_name."""
-        return super().get_cached(key, f"Error querying tenant {key}")
+        """Get the tenant by org_id, from the in-process cache when possible."""
+        use_local = settings.TENANT_LOCAL_CACHE_SIZE > 0
+        if use_local:
+            _tenant_invalidation_listener.ensure_started()
+            use_local = _tenant_invalidation_listener.subscribed
+        if use_local:
+            tenant = _local_tenants.get(key)
+            if tenant is not None:
+                return tenant
+        tenant = super().get_cached(key, f"Error querying tenant {key}")
+        if use_local and tenant is not None:
+            _local_tenants.set(key, tenant)
+        return tenant
 
     def set_cache(self, pipe, key, item):
         """Override the method to set tenant to cache."""
@@ -150,33 +438,78 @@ class TenantCache(BasicCache):
         super().save(tenant.org_id, tenant, "tenant")
 
     def delete_tenant(self, key):
-        """Purge the given tenant from the cache."""
+        """Purge the given tenant from the cache, and from the in-process cache of every process."""
+        _local_tenants.delete(key)
         super().delete_cached(key, "tenant")
+        with self.delete_handler(f"Error publishing the invalidation of tenant {key}"):
+            self.connection.publish(TENANT_INVALIDATION_CHANNEL, key)
 
 
 class AccessCache(BasicCache):
-    """Redis-based caching of per-Principal per-app access policy."""  # noqa: D204
+    """Redis-based caching of per-Principal per-app access policy.
+
+    Every cached policy records the tenant generation it was computed under. Invalidating the whole tenant only
+    increments the generation, which turns the existing entries stale until they expire. A missing generation, e.g.
+    evicted by Redis, turns every entry stale as well.
+    """  # noqa: D204
+
+    # Stored next to the user's policies so that it is invalidated together with them.
+    USER_ACCESS_SUB_KEY = "rbac::user_access"
 
     def __init__(self, tenant):
         """tenant: The name of the database schema for this tenant."""
         self.tenant = tenant
+        self._generation = None
         super().__init__()
 
     def key_for(self, uuid):
         """Redis key for a given user policy."""
         return f"rbac::policy::tenant={self.tenant}::user={uuid}"
 
+    def generation_key(self):
+        """Redis key for the tenant's policy generation."""
+        return f"rbac::policy::tenant={self.tenant}::generation"
+
+    def start_generation(self):
+        """Start the generation of a tenant which has none, returning the current one.
+
+        The generation may have been evicted while entries saved under it were not, so it starts from the current time
+        rather than from zero, which no existing entry was saved under.
+        """
+        self.connection.set(self.generation_key(), time.time_ns(), nx=True)
+        return int(self.connection.get(self.generation_key()) or 0)
+
     def set_cache(self, pipe, args, item):
         """Set cache to redis."""
-        pipe.hset(self.key_for(args[0]), args[1], json.dumps(item))
+        generation = self._generation
+        if generation is None:
+            generation = self.connection.get(self.generation_key())
+            generation = self.start_generation() if generation is None else int(generation)
+        entry = {"generation": generation, "policy": item}
+        pipe.hset(self.key_for(args[0]), args[1], json.dumps(entry))
         pipe.expire(self.key_for(args[0]), settings.ACCESS_CACHE_LIFETIME)
         pipe.execute()
 
     def get_from_redis(self, args):
-        """Get object from redis based on args."""
-        obj = self.connection.hget(*(self.key_for(args[0]), args[1]))
-        if obj:
-            return json.loads(obj)
+        """Get object from redis based on args, discarding entries from a previous tenant generation."""
+        with self.connection.pipeline(transaction=False) as pipe:
+            pipe.get(self.generation_key())
+            pipe.hget(self.key_for(args[0]), args[1])
+            generation, obj = pipe.execute()
+        # Remember the generation so that a policy computed after this miss is saved under it.
+        if generation is None:
+            self._generation = self.start_generation()
+        else:
+            self._generation = int(generation)
+        if not obj:
+            access_cache_get_total.labels(result="miss").inc()
+            return None
+        entry = json.loads(obj)
+        if generation is None or not isinstance(entry, dict) or entry.get("generation") != self._generation:
+            access_cache_get_total.labels(result="stale").inc()
+            return None
+        access_cache_get_total.labels(result="hit").inc()
+        return entry["policy"]
 
     def get_policy(self, uuid, sub_key):
         """Get the given user's policy for the given sub_key (application_offset_limit)."""
@@ -184,21 +517,39 @@ class AccessCache(BasicCache):
             return None
         return super().get_cached((uuid, sub_key), f"Error querying policy for uuid {uuid}")
 
+    def get_user_access(self, uuid):
+        """Get the given user's RBAC resource/operation access map."""
+        return self.get_policy(uuid, self.USER_ACCESS_SUB_KEY)
+
+    def save_user_access(self, uuid, access):
+        """Write the given user's RBAC resource/operation access map to Redis."""
+        self.save_policy(uuid, self.USER_ACCESS_SUB_KEY, access)
+
     def delete_policy(self, uuid):
         """Purge the given user's policy from the cache."""
         super().delete_cached(uuid, "policy")
 
+    def delete_policies(self, uuids):
+        """Purge the given users' policies from the cache in one round trip."""
+        keys = [self.key_for(uuid) for uuid in uuids]
+        with self.delete_handler(f"Error deleting policies for tenant {self.tenant}"):
+            logger.info("Deleting policy cache of %s users for tenant %s", len(keys), self.tenant)
+            with self.connection.pipeline(transaction=False) as pipe:
+                for i in range(0, len(keys), 1000):
+                    pipe.delete(*keys[i : i + 1000])  # noqa: E203
+                pipe.execute()
+
     def delete_all_policies_for_tenant(self):
-        """Purge users' policies for a given tenant from the cache."""
+        """Invalidate users' policies for a given tenant by moving the tenant to a new generation."""
         if not settings.ACCESS_CACHE_ENABLED:
             return
         err_msg = f"Error deleting all policies for tenant {self.tenant}"
         with self.delete_handler(err_msg):
-            logger.info("Deleting entire policy cache for tenant %s", self.tenant)
-            keys = self.connection.keys(self.key_for("*"))
-
-            if keys:
-                self.connection.delete(*keys)
+            logger.info("Invalidating entire policy cache for tenant %s", self.tenant)
+            # An evicted generation restarts from the current time, so that entries saved under it do not match again
+            self.connection.set(self.generation_key(), time.time_ns(), nx=True)
+            self.connection.incr(self.generation_key())
+            access_cache_tenant_invalidation_total.inc()
 
     def save_policy(self, uuid, sub_key, policy):
         """Write the policy for a given user for a given sub_key (application_offset_limit) to Redis."""
@@ -207,24 +558,194 @@ class AccessCache(BasicCache):
         super().save((uuid, sub_key), policy, "policy")
 
 
+class AccessCacheInvalidation:
+    """The access cache invalidations of a tenant collected during a transaction.
+
+    Principals are deduplicated and purged with a single multi-key delete once the transaction commits. Above
+    ACCESS_CACHE_INVALIDATION_TENANT_THRESHOLD principals the whole tenant is invalidated instead.
+    """
+
+    def __init__(self, tenant):
+        """tenant: The org_id of the tenant."""
+        self.tenant = tenant
+        self.principals = set()
+        self.roles = set()
+        self.tenant_wide = False
+
+    def add_principals(self, uuids):
+        """Invalidate the access of the given principals."""
+        if not self.tenant_wide:
+            self.principals.update(uuids)
+
+    def add_role(self, role_id):
+        """Record that the principals of a role are invalidated, returning False if they already were."""
+        if self.tenant_wide or role_id in self.roles:
+            return False
+        self.roles.add(role_id)
+        return True
+
+    def invalidate_tenant(self):
+        """Invalidate the access of every principal of the tenant."""
+        self.tenant_wide = True
+        self.principals.clear()
+
+    def apply(self):
+        """Purge the collected invalidations from the cache."""
+        cache = AccessCache(self.tenant)
+        if self.tenant_wide or len(self.principals) > settings.ACCESS_CACHE_INVALIDATION_TENANT_THRESHOLD:
+            cache.delete_all_policies_for_tenant()
+        elif self.principals:
+            cache.delete_policies(self.principals)
+
+
+class PendingAccessCacheInvalidations(dict):
+    """The access cache invalidations collected during a transaction, by tenant."""
+
+    applied = False
+
+    def apply(self):
+        """Purge the collected invalidations from the cache, once.
+
+        Every block collecting into these invalidations registers this as a commit hook, so only the first call purges.
+        """
+        if self.applied:
+            return
+        self.applied = True
+        for invalidation in self.values():
+            invalidation.apply()
+
+
+_pending_invalidations = threading.local()
+
+
+@contextlib.contextmanager
+def access_cache_invalidation(tenant):
+    """Collect invalidations for the tenant, to be applied when the current transaction commits.
+
+    Outside of a transaction they are applied when the block exits. A rolled back savepoint drops the hook registered
+    within it, while the hooks registered by the other blocks still apply whatever was collected.
+    """
+    pending = getattr(_pending_invalidations, "current", None)
+    if pending is None or pending.applied:
+        pending = _pending_invalidations.current = PendingAccessCacheInvalidations()
+    invalidation = pending.get(tenant)
+    if invalidation is None:
+        invalidation = pending[tenant] = AccessCacheInvalidation(tenant)
+    yield invalidation
+    transaction.on_commit(pending.apply)
+
+
+class LocalPrincipalCache(LocalCache):
+    """Bounded, per-process LRU cache of principal lookups with a TTL, kept in front of the Redis PrincipalCache."""
+
+    get_total = principal_local_cache_get_total
+    eviction_total = principal_local_cache_eviction_total
+
+    @staticmethod
+    def _copy(value):
+        """Return a copy of the lookup: callers may modify the principals, so they each get their own instance."""
+        return copy.deepcopy(value)
+
+
+_local_principals = LocalPrincipalCache(settings.PRINCIPAL_LOCAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL)
+
+
+class LocalTokenCache(LocalCache):
+    """Bounded, per-process LRU cache of the claims of validated bearer tokens, keyed by a hash of the token."""
+
+    get_total = token_local_cache_get_total
+    eviction_total = token_local_cache_eviction_total
+
+
+class PrincipalCache(BasicCache):
+    """Redis-based caching of the BOP lookups of single principals, with an in-process cache in front.
+
+    Entries are only invalidated by their TTL, so PRINCIPAL_CACHE_TTL bounds how long a change to a user in BOP (e.g.
+    to its org admin status) can go unnoticed. Each entry records how long its BOP request took, which is counted as
+    saved on every hit.
+    """
+
+    def key_for(self, key):
+        """Redis key for a given principal lookup."""
+        return f"rbac::principal::{key}"
+
+    def get_from_redis(self, key):
+        """Override the method to get the principal lookup based on key."""
+        obj = self.connection.get(self.key_for(key))
+        if obj:
+            return pickle.loads(obj)
+
+    def set_cache(self, pipe, key, item):
+        """Override the method to set the principal lookup to cache."""
+        pipe.set(self.key_for(key), pickle.dumps(item), ex=settings.PRINCIPAL_CACHE_TTL)
+        pipe.execute()
+
+    def get_principal(self, key):
+        """Get the looked up principals and the duration of their BOP request, or None."""
+        entry = _local_principals.get(key)
+        if entry is None:
+            entry = super().get_cached(key, f"Error querying principal {key}")
+            if entry is not None:
+                # Not cached past the expiry of the Redis entry.
+                _local_principals.set(key, entry, ttl=max(entry["expires"] - time.time(), 0))
+        if entry is None:
+            principal_cache_get_total.labels(result="miss").inc()
+            return None
+        principal_cache_get_total.labels(result="hit").inc()
+        principal_cache_bop_seconds_saved_total.inc(entry["duration"])
+        return entry
+
+    def save_principal(self, key, data, duration):
+        """Cache the principals looked up in BOP, and the duration of the request."""
+        entry = {"data": data, "duration": duration, "expires": time.time() + settings.PRINCIPAL_CACHE_TTL}
+        _local_principals.set(key, entry)
+        super().save(key, entry, "principal")
+
+
+class ServiceAccountCache(BasicCache):
+    """Redis-based caching of the service account directory of a tenant, as returned by IT."""
+
+    def key_for(self, key):
+        """Redis key for the service accounts of a given tenant."""
+        return f"rbac::service_accounts::org_id={key}"
+
+    def get_from_redis(self, key):
+        """Override the method to get the service accounts based on key."""
+        obj = self.connection.get(self.key_for(key))
+        if obj:
+            return pickle.loads(obj)
+
+    def set_cache(self, pipe, key, item):
+        """Override the method to set the service accounts to cache."""
+        pipe.set(self.key_for(key), pickle.dumps(item), ex=settings.IT_SERVICE_ACCOUNTS_CACHE_TTL)
+        pipe.execute()
+
+    def get_service_accounts(self, org_id):
+        """Get the service accounts of the tenant and the time they were fetched at, or None."""
+        return super().get_cached(org_id, f"Error querying service accounts for {org_id}")
+
+    def save_service_accounts(self, org_id, service_accounts):
+        """Write the service accounts of the tenant to Redis."""
+        super().save(org_id, {"service_accounts": service_accounts, "fetched": time.time()}, "service accounts")
+
+
 class JWKSCache(BasicCache):
     """Redis-based caching for the storage of JKWS certificates."""
 
     JWKS_CACHE_KEY = "rbac::jwks:response"
 
-    def key_for(self):
+    def key_for(self, key):
         """Redis key for the JWKS certificate response."""
-        return "rbac::jwks::response"
+        return key
 
     def set_cache(self, pipe, key, item):
         """Set cache to redis."""
-        pipe.hset(key=key, value=json.dumps(item), name="hi")
-        pipe.expire(name=key, time=settings.IT_TOKEN_JKWS_CACHE_LIFETIME)
+        pipe.set(self.key_for(key), json.dumps(item), ex=settings.IT_TOKEN_JKWS_CACHE_LIFETIME)
         pipe.execute()
 
-    def get_from_redis(self, args):
-        """Get object from redis based on args."""
-        obj = self.connection.hget(*(self.JWKS_CACHE_KEY, args[1]))
+    def get_from_redis(self, key):
+        """Get object from redis based on key."""
+        obj = self.connection.get(self.key_for(key))
         if obj:
             return json.loads(obj)
 
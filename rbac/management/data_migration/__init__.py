@@ -0,0 +1 @@
+"""Data migration model."""
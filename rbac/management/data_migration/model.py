@@ -0,0 +1,83 @@
+#
+# Copyright 2024 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Checkpoints of the v1 to v2 data migration."""
+
+import logging
+from datetime import timedelta
+
+from django.db import models
+from django.db.models import Min
+from django.utils import timezone
+
+from api.models import Tenant
+
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+# Name to request the progress of the data migration from the migration progress endpoint.
+DATA_MIGRATION_NAME = "v1_to_v2_data"
+
+
+class TenantMigrationCheckpoint(models.Model):
+    """Progress of the v1 to v2 data migration of a tenant, so that an interrupted migration can be resumed."""
+
+    class Status(models.TextChoices):
+        """Migration status of a tenant."""
+
+        RUNNING = "running"
+        COMPLETED = "completed"
+        FAILED = "failed"
+
+    tenant = models.OneToOneField(Tenant, on_delete=models.CASCADE, related_name="migration_checkpoint")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.RUNNING)
+    attempts = models.PositiveIntegerField(default=0)
+    started = models.DateTimeField(default=timezone.now)
+    completed = models.DateTimeField(null=True)
+    error = models.TextField(null=True)
+
+
+def data_migration_progress(window=timedelta(minutes=10)) -> dict:
+    """Summarize the data migration checkpoints, with the throughput over the last window and the resulting ETA."""
+    now = timezone.now()
+    total = Tenant.objects.exclude(tenant_name="public").count()
+    counts = dict(
+        TenantMigrationCheckpoint.objects.values_list("status").annotate(count=models.Count("id")).order_by()
+    )
+    completed = counts.get(TenantMigrationCheckpoint.Status.COMPLETED, 0)
+
+    tenants_per_second = 0.0
+    window_start = now - window
+    recent = TenantMigrationCheckpoint.objects.filter(
+        status=TenantMigrationCheckpoint.Status.COMPLETED, completed__gte=window_start
+    )
+    first_started = recent.aggregate(first_started=Min("started"))["first_started"]
+    if first_started is not None:
+        elapsed = (now - max(first_started, window_start)).total_seconds()
+        if elapsed > 0:
+            tenants_per_second = recent.count() / elapsed
+
+    remaining = max(total - completed, 0)
+    return {
+        "migration_name": DATA_MIGRATION_NAME,
+        "tenants_completed_count": completed,
+        "tenants_running_count": counts.get(TenantMigrationCheckpoint.Status.RUNNING, 0),
+        "tenants_failed_count": counts.get(TenantMigrationCheckpoint.Status.FAILED, 0),
+        "total_tenants_count": total,
+        "percent_completed": int((completed / total) * 100) if total else 100,
+        "tenants_per_second": round(tenants_per_second, 3),
+        "eta_seconds": int(remaining / tenants_per_second) if tenants_per_second else None,
+    }
@@ -27,7 +27,7 @@ from django.utils import timezone
 from internal.integration import chrome_handlers
 from internal.integration import sync_handlers
 from kessel.relations.v1beta1.common_pb2 import Relationship
-from management.cache import AccessCache
+from management.cache import access_cache_invalidation
 from management.principal.model import Principal
 from management.rbac_fields import AutoDateTimeField
 from management.role.model import Role
@@ -109,34 +109,33 @@ class Group(TenantAwareModel):
 def group_deleted_cache_handler(sender=None, instance=None, using=None, **kwargs):
     """Signal handler to purge principal caches when a Group is deleted."""
     logger.info("Handling signal for deleted group %s - invalidating policy cache for users in group", instance)
-    cache = AccessCache(instance.tenant.org_id)
-    for principal in instance.principals.all():
-        cache.delete_policy(principal.uuid)
+    with access_cache_invalidation(instance.tenant.org_id) as invalidation:
+        invalidation.add_principals(instance.principals.values_list("uuid", flat=True))
 
 
 def principals_to_groups_cache_handler(
     sender=None, instance=None, action=None, reverse=None, model=None, pk_set=None, using=None, **kwargs
 ):
     """Signal handler to purge caches when Group membership changes."""
-    cache = AccessCache(instance.tenant.org_id)
-    if action in ("post_add", "pre_remove"):
-        logger.info("Handling signal for %s group membership change - invalidating policy cache", instance)
-        if isinstance(instance, Group):
-            # One or more principals was added to/removed from the group
-            for principal in Principal.objects.filter(pk__in=pk_set):
-                cache.delete_policy(principal.uuid)
-        elif isinstance(instance, Principal):
-            # One or more groups was added to/removed from the principal
-            cache.delete_policy(instance.uuid)
-    elif action == "pre_clear":
-        logger.info("Handling signal for %s group membership clearing - invalidating policy cache", instance)
-        if isinstance(instance, Group):
-            # All principals are being removed from this group
-            for principal in instance.principals.all():
-                cache.delete_policy(principal.uuid)
-        elif isinstance(instance, Principal):
-            # All groups are being removed from this principal
-            cache.delete_policy(instance.uuid)
+    if action not in ("post_add", "pre_remove", "pre_clear"):
+        return
+    with access_cache_invalidation(instance.tenant.org_id) as invalidation:
+        if action in ("post_add", "pre_remove"):
+            logger.info("Handling signal for %s group membership change - invalidating policy cache", instance)
+            if isinstance(instance, Group):
+                # One or more principals was added to/removed from the group
+                invalidation.add_principals(Principal.objects.filter(pk__in=pk_set).values_list("uuid", flat=True))
+            elif isinstance(instance, Principal):
+                # One or more groups was added to/removed from the principal
+                invalidation.add_principals([instance.uuid])
+        else:
+            logger.info("Handling signal for %s group membership clearing - invalidating policy cache", instance)
+            if isinstance(instance, Group):
+                # All principals are being removed from this group
+                invalidation.add_principals(instance.principals.values_list("uuid", flat=True))
+            elif isinstance(instance, Principal):
+                # All groups are being removed from this principal
+                invalidation.add_principals([instance.uuid])
 
 
 def group_deleted_chrome_handler(sender=None, instance=None, using=None, **kwargs):
@@ -139,14 +139,6 @@ class GroupPrincipalInputSerializer(serializers.Serializer):
         fields = ("principals",)
 
 
-class GroupRoleSerializerOut(serializers.Serializer):
-    """Serializer for getting roles for a group."""
-
-    def to_representation(self, obj):
-        """Return the collection to be serialized."""
-        return obj
-
-
 class GroupRoleSerializerIn(serializers.Serializer):
     """Serializer for managing roles for a group."""
 
@@ -43,7 +43,6 @@ from management.group.serializer import (
     GroupInputSerializer,
     GroupPrincipalInputSerializer,
     GroupRoleSerializerIn,
-    GroupRoleSerializerOut,
     GroupSerializer,
     RoleMinimumSerializer,
 )
@@ -189,7 +188,7 @@ class GroupViewSet(
         if "principals" in self.request.path:
             return GroupPrincipalInputSerializer
         if ROLES_KEY in self.request.path and self.request.method == "GET":
-            return GroupRoleSerializerOut
+            return RoleMinimumSerializer
         if ROLES_KEY in self.request.path:
             return GroupRoleSerializerIn
         if self.request.method in ("POST", "PUT"):
@@ -468,7 +467,9 @@ class GroupViewSet(
         # want to skip calling IT
         it_service = ITService()
         if not settings.IT_BYPASS_IT_CALLS:
-            it_service_accounts = it_service.request_service_accounts(bearer_token=user.bearer_token)
+            it_service_accounts = it_service.request_service_accounts_directory(
+                user=user, client_ids=[specified_sa["clientId"] for specified_sa in service_accounts]
+            )
 
             # Organize them by their client ID.
             it_service_accounts_by_client_ids: dict[str, dict] = {}
@@ -882,19 +883,34 @@ class GroupViewSet(
                 return self.get_paginated_response(serializer.data)
 
             principals_from_params = self.filtered_principals(group, request)
-            username_list = [principal.username for principal in principals_from_params]
+            proxy = PrincipalProxy()
 
             admin_only = validate_and_get_key(request.query_params, ADMIN_ONLY_KEY, VALID_BOOLEAN_VALUE, False, False)
             if admin_only == "true":
+                # Only BOP knows which principals are org admins, so all the usernames are sent to it and its
+                # response is paginated.
                 options[ADMIN_ONLY_KEY] = True
+                username_list = [principal.username for principal in principals_from_params]
+                resp = proxy.request_filtered_principals(username_list, org_id=org_id, options=options)
+                if isinstance(resp, dict) and "errors" in resp:
+                    return Response(status=resp.get("status_code"), data=resp.get("errors"))
+
+                page = self.paginate_queryset(resp.get("data"))
+                return self.get_paginated_response(page)
+
+            # Otherwise the principals are paginated in the database, and only the page is looked up in BOP.
+            ordering = "-username" if sort_order == "des" else "username"
+            usernames = self.paginate_queryset(
+                principals_from_params.order_by(ordering).values_list("username", flat=True)
+            )
+            if username_only == "true":
+                return self.get_paginated_response([{"username": username} for username in usernames])
 
-            proxy = PrincipalProxy()
-            resp = proxy.request_filtered_principals(username_list, org_id=org_id, options=options)
+            resp = proxy.request_cached_filtered_principals(usernames, org_id=org_id, options=options)
             if isinstance(resp, dict) and "errors" in resp:
                 return Response(status=resp.get("status_code"), data=resp.get("errors"))
 
-            page = self.paginate_queryset(resp.get("data"))
-            response = self.get_paginated_response(page)
+            response = self.get_paginated_response(resp.get("data"))
         else:
             self.protect_system_groups("remove principals")
 
@@ -1044,8 +1060,7 @@ class GroupViewSet(
             add_roles(group, roles, request.tenant, user=request.user)
             response_data = GroupRoleSerializerIn(group)
         elif request.method == "GET":
-            serialized_roles = self.obtain_roles(request, group)
-            page = self.paginate_queryset(serialized_roles)
+            page = self.paginate_queryset(self.obtain_roles(request, group))
             serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
         else:
@@ -1108,16 +1123,20 @@ class GroupViewSet(
         return filters
 
     def obtain_roles(self, request, group):
-        """Obtain roles based on request, supports exclusion."""
+        """Obtain the ordered queryset of roles based on request, supports exclusion.
+
+        The queryset is paginated in the database, so the serialized relations are only prefetched for the page.
+        """
         exclude = validate_and_get_key(request.query_params, EXCLUDE_KEY, VALID_EXCLUDE_VALUES, "false")
 
         roles = group.roles_with_access() if exclude == "false" else self.obtain_roles_with_exclusion(request, group)
         filtered_roles = self.filtered_roles(roles, request)
-        annotated_roles = filtered_roles.annotate(policyCount=Count("policies", distinct=True))
+        annotated_roles = filtered_roles.annotate(policyCount=Count("policies", distinct=True)).prefetch_related(
+            "access__permission", "ext_relation__ext_tenant"
+        )
 
         order_field = request.query_params.get(ORDERING_PARAM, NAME_KEY)
-        ordered_roles = self.order_queryset(annotated_roles, VALID_ROLE_ORDER_FIELDS, order_field)
-        return [RoleMinimumSerializer(role).data for role in ordered_roles]
+        return self.order_queryset(annotated_roles, VALID_ROLE_ORDER_FIELDS, order_field)
 
     def obtain_roles_with_exclusion(self, request, group):
         """Obtain the queryset for roles based on scope."""
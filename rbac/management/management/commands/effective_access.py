@@ -0,0 +1,71 @@
+#
+# Copyright 2024 Red Hat, Inc.
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU Affero General Public License as
+#    published by the Free Software Foundation, either version 3 of the
+#    License, or (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU Affero General Public License for more details.
+#
+#    You should have received a copy of the GNU Affero General Public License
+#    along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Effective access command."""
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+from management.access.effective_access import check_effective_access, refresh_effective_access
+from management.models import Principal
+
+from api.models import Tenant
+
+logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
+
+
+class Command(BaseCommand):
+    """Command class for rebuilding or checking the materialized effective access."""
+
+    help = "Rebuilds the effective access table, or checks it against the access resolved through groups"
+
+    def add_arguments(self, parser):
+        """Add arguments to command."""
+        parser.add_argument("mode", nargs="?", default="rebuild", choices=["rebuild", "check"])
+        parser.add_argument("--org-list", nargs="+", default=[])
+
+    def handle(self, *args, **options):
+        """Handle method for command."""
+        tenants = Tenant.objects.exclude(tenant_name="public")
+        if options["org_list"]:
+            tenants = tenants.filter(org_id__in=options["org_list"])
+
+        inconsistent = 0
+        for tenant in tenants.iterator():
+            principals = Principal.objects.filter(tenant=tenant, cross_account=False)
+            if options["mode"] == "check":
+                # Principals which were never looked up or are stale are rebuilt lazily, so there is nothing to compare.
+                principals = principals.filter(
+                    effective_access_status__built_version=F("effective_access_status__version")
+                )
+            for principal in principals.iterator():
+                if options["mode"] == "rebuild":
+                    refresh_effective_access(principal, tenant)
+                    continue
+                diff = check_effective_access(principal, tenant)
+                if diff["missing"] or diff["unexpected"]:
+                    inconsistent += 1
+                    logger.warning(
+                        "Effective access of principal %s in tenant %s is inconsistent: %s missing, %s unexpected.",
+                        principal.uuid,
+                        tenant.org_id,
+                        len(diff["missing"]),
+                        len(diff["unexpected"]),
+                    )
+            logger.info("Processed effective access for tenant %s.", tenant.org_id)
+
+        if options["mode"] == "check":
+            logger.info("*** Found %s principals with inconsistent effective access. ***", inconsistent)
@@ -29,6 +29,12 @@ class Command(BaseCommand):
             choices=["True", "False", "relations-api", "outbox"],
             help="Whether to replicate relationships and how. True is == 'relations-api' for compatibility.",
         )
+        parser.add_argument(
+            "--workers", type=int, default=1, help="Number of processes migrating tenants in parallel."
+        )
+        parser.add_argument(
+            "--resume", action="store_true", help="Skip the tenants which a previous migration completed."
+        )
 
     def handle(self, *args, **options):
         """Handle method for command."""
@@ -37,6 +43,8 @@ class Command(BaseCommand):
             "exclude_apps": options["exclude_apps"],
             "orgs": options["org_list"],
             "write_relationships": options["write_relationships"],
+            "workers": options["workers"],
+            "resume": options["resume"],
         }
         migrate_data(**kwargs)
         logger.info("*** Migration completed. ***\n")
@@ -10,15 +10,16 @@
 
 
 from django.core.management.base import BaseCommand
-from tests.performance.test_performance_concurrent import (
-    test_full_sync,
-    test_group_roles,
-    test_principals_groups,
-    test_principals_roles,
-    test_tenant_groups,
-    test_tenant_roles,
+from tests.performance.benchmark import (
+    INTEGRATION_SCENARIOS,
+    MAX_REQUESTS,
+    SCENARIOS,
+    THREADS,
+    compare_results,
+    run_benchmark,
 )
-from tests.performance.test_performance_util import setUp, tearDown
+from tests.performance.test_performance_outbox import test_outbox_replication
+from tests.performance.test_performance_util import Scale, setUp, tearDown
 
 
 class Command(BaseCommand):
@@ -29,27 +30,55 @@ class Command(BaseCommand):
     run the setup command first to populate the database.
 
     Usage:
-        python manage.py command ocm_performance [setup|test|teardown]
+        python manage.py ocm_performance [setup|test|benchmark|compare|teardown|outbox]
+
+    The test mode runs the OCM integration scenarios and the benchmark mode runs every scenario (or those given with
+    --scenarios). Both report latency percentiles and queries per request, and write them as JSON to --output. The
+    compare mode compares the --output file of a run against a --baseline file.
     """
 
     def add_arguments(self, parser):
         """Parse command arguments."""
-        parser.add_argument("mode", type=str, nargs="?", default="test", help="Choice of setup, test, or teardown")
+        parser.add_argument(
+            "mode",
+            type=str,
+            nargs="?",
+            default="test",
+            help="Choice of setup, test, benchmark, compare, teardown, or outbox",
+        )
+        for field, default in Scale().as_dict().items():
+            parser.add_argument(f"--{field.replace('_', '-')}", type=int, default=default, dest=field)
+        parser.add_argument("--scenarios", type=str, default="", help=f"Comma separated: {', '.join(SCENARIOS)}")
+        parser.add_argument("--threads", type=int, default=THREADS)
+        parser.add_argument("--requests", type=int, default=MAX_REQUESTS, help="Maximum requests per scenario")
+        parser.add_argument("--output", type=str, default=None, help="JSON file the results are written to")
+        parser.add_argument("--baseline", type=str, default=None, help="JSON results to compare the output to")
+        parser.add_argument("--threshold", type=float, default=0.1, help="Relative growth reported as regression")
 
     def handle(self, **options):
         """Run the command."""
         mode = options["mode"]
         if mode == "setup":
-            setUp()
+            setUp(Scale(**{field: options[field] for field in Scale().as_dict()}))
         elif mode == "teardown":
             tearDown()
-        elif mode == "test":
-            # run the ocm performance tests
-            test_full_sync()
-            test_tenant_groups()
-            test_tenant_roles()
-            test_group_roles()
-            test_principals_roles()
-            test_principals_groups()
+        elif mode in ("test", "benchmark"):
+            scenarios = options["scenarios"].split(",") if options["scenarios"] else None
+            unknown = set(scenarios or []) - set(SCENARIOS)
+            if unknown:
+                print(f"Unknown scenarios {', '.join(sorted(unknown))}. Please choose from {', '.join(SCENARIOS)}.")
+                return
+            if mode == "test":
+                # run the ocm performance tests
+                scenarios = scenarios or INTEGRATION_SCENARIOS
+            run_benchmark(scenarios, options["threads"], options["requests"], options["output"])
+        elif mode == "compare":
+            if not options["baseline"] or not options["output"]:
+                print("The compare mode needs the results to compare with --baseline and --output.")
+                return
+            regressions = compare_results(options["baseline"], options["output"], options["threshold"])
+            print(f"Regressed scenarios: {', '.join(regressions) or 'none'}")
+        elif mode == "outbox":
+            test_outbox_replication()
         else:
-            print("Invalid mode. Please choose from setup, test, or teardown.")
+            print("Invalid mode. Please choose from setup, test, benchmark, compare, teardown, or outbox.")
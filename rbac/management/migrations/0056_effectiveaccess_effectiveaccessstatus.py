@@ -0,0 +1,76 @@
+# Generated by Django 4.2.16 on 2024-10-21 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_auto_20220726_1743"),
+        ("management", "0055_tenantmapping"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EffectiveAccessStatus",
+            fields=[
+                (
+                    "principal",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="effective_access_status",
+                        serialize=False,
+                        to="management.principal",
+                    ),
+                ),
+                ("refreshed", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="EffectiveAccess",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("application", models.TextField()),
+                ("resource_definitions_hash", models.CharField(max_length=64)),
+                ("admin_only", models.BooleanField(default=False)),
+                (
+                    "access",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="effective_access",
+                        to="management.access",
+                    ),
+                ),
+                (
+                    "permission",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="effective_access",
+                        to="management.permission",
+                    ),
+                ),
+                (
+                    "principal",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="effective_access",
+                        to="management.principal",
+                    ),
+                ),
+                ("tenant", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="api.tenant")),
+            ],
+            options={
+                "indexes": [models.Index(fields=["principal", "application"], name="effective_access_lookup")],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="effectiveaccess",
+            constraint=models.UniqueConstraint(
+                fields=("principal", "permission", "resource_definitions_hash", "admin_only"),
+                name="unique effective access per principal",
+            ),
+        ),
+    ]
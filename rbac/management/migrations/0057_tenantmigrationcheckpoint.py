@@ -0,0 +1,42 @@
+# Generated by Django 4.2.16 on 2024-10-23 14:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_auto_20220726_1743"),
+        ("management", "0056_effectiveaccess_effectiveaccessstatus"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TenantMigrationCheckpoint",
+            fields=[
+                ("id", models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("running", "Running"), ("completed", "Completed"), ("failed", "Failed")],
+                        default="running",
+                        max_length=20,
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("started", models.DateTimeField(default=django.utils.timezone.now)),
+                ("completed", models.DateTimeField(null=True)),
+                ("error", models.TextField(null=True)),
+                (
+                    "tenant",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="migration_checkpoint",
+                        to="api.tenant",
+                    ),
+                ),
+            ],
+        ),
+    ]
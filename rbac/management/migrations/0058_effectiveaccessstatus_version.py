@@ -0,0 +1,23 @@
+# Generated by Django 4.2.16 on 2024-11-04 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("management", "0057_tenantmigrationcheckpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="effectiveaccessstatus",
+            name="version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="effectiveaccessstatus",
+            name="built_version",
+            field=models.PositiveIntegerField(null=True),
+        ),
+    ]
@@ -16,14 +16,18 @@
 #
 
 """Notification handlers of object change."""
+import copy
 import json
 import logging
 import os
+import time
 from datetime import datetime
 from uuid import uuid4
 
 from core.kafka import RBACProducer
 from django.conf import settings
+from django.db import transaction
+from prometheus_client import Counter, Histogram
 
 from api.models import Tenant
 
@@ -35,10 +39,19 @@ noto_topic = settings.NOTIFICATIONS_TOPIC
 with open(os.path.join(settings.BASE_DIR, "management", "notifications", "message_template.json")) as template:
     message_template = json.load(template)
 
+notifications_fan_out_messages_total = Counter(
+    "rbac_notifications_fan_out_messages_total", "Total number of notification messages sent to all tenants"
+)
+notifications_fan_out_duration_seconds = Histogram(
+    "rbac_notifications_fan_out_duration_seconds",
+    "Time taken to send a notification to all tenants",
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800),
+)
+
 
 def build_notifications_message(event_type, payload, org_id=None):
     """Create message based on template."""
-    message = message_template
+    message = copy.deepcopy(message_template)
     message["org_id"] = org_id
     message["event_type"] = event_type
     message["timestamp"] = datetime.now().isoformat()
@@ -53,13 +66,50 @@ def notify(event_type, payload, org_id=None):
     noto_producer.send_kafka_message(noto_topic, noto_message, noto_headers)
 
 
-def notify_all(event_type, payload):
-    """Notify all tenants."""
+def fan_out_notifications(event_type, payload):
+    """Send the notification to every tenant and return the number of messages sent.
+
+    The org ids are streamed from the database in chunks, and every message is a shallow copy of a single message
+    built for the event, so only the org id differs between them. The producer batches the messages, they are
+    flushed once all of them are queued.
+    """
+    start = time.perf_counter()
+    base_message = build_notifications_message(event_type, payload)
+    org_ids = Tenant.objects.exclude(tenant_name="public").values_list("org_id", flat=True)
+    sent = 0
     # To avoid memory overloaded, use iterator:
     # https://docs.djangoproject.com/en/4.0/ref/models/querysets/#django.db.models.query.QuerySet.iterator
-    for tenant in Tenant.objects.exclude(tenant_name="public").iterator():
-        # Tenant name pattern is acct12345
-        notify(event_type, payload, tenant.org_id)
+    for org_id in org_ids.iterator(chunk_size=settings.NOTIFICATIONS_FAN_OUT_CHUNK_SIZE):
+        noto_headers = [("rh-message-id", str(uuid4()).encode("utf-8"))]
+        noto_producer.send_kafka_message(noto_topic, {**base_message, "org_id": org_id}, noto_headers)
+        sent += 1
+    noto_producer.flush()
+
+    elapsed = time.perf_counter() - start
+    notifications_fan_out_messages_total.inc(sent)
+    notifications_fan_out_duration_seconds.observe(elapsed)
+    logger.info(
+        "Sent %s notification to %s tenants in %.2fs (%.0f messages/s).",
+        event_type,
+        sent,
+        elapsed,
+        sent / elapsed if elapsed else sent,
+    )
+    return sent
+
+
+def notify_all(event_type, payload):
+    """Notify all tenants.
+
+    When NOTIFICATIONS_FAN_OUT_ASYNC is enabled the messages are sent by a celery worker once the current
+    transaction commits, so that the caller (e.g. seeding) does not wait for every tenant to be notified.
+    """
+    if settings.NOTIFICATIONS_FAN_OUT_ASYNC:
+        from management.tasks import fan_out_notifications_in_worker
+
+        transaction.on_commit(lambda: fan_out_notifications_in_worker.delay(event_type, payload))
+        return
+    fan_out_notifications(event_type, payload)
 
 
 def handle_system_role_change_notification(role_obj, operation):
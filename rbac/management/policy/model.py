@@ -24,7 +24,7 @@ from django.db import models
 from django.db.models import signals
 from django.utils import timezone
 from internal.integration import sync_handlers
-from management.cache import AccessCache
+from management.cache import access_cache_invalidation
 from management.group.model import Group
 from management.principal.model import Principal
 from management.rbac_fields import AutoDateTimeField
@@ -52,53 +52,50 @@ class Policy(TenantAwareModel):
         constraints = [models.UniqueConstraint(fields=["name", "tenant"], name="unique policy name per tenant")]
 
 
+def _invalidate_group(invalidation, group):
+    """Invalidate the access of the group's members, or of the whole tenant for the platform default group."""
+    if group.platform_default:
+        invalidation.invalidate_tenant()
+    else:
+        invalidation.add_principals(group.principals.values_list("uuid", flat=True))
+
+
 def policy_changed_cache_handler(sender=None, instance=None, using=None, **kwargs):
     """Signal handler for Principal cache expiry on Policy deletion."""
     logger.info("Handling signal for deleted policy %s - invalidating associated user cache keys", instance)
-    cache = AccessCache(instance.tenant.org_id)
     if instance.group:
-        principals = instance.group.principals.all()
-        if instance.group.platform_default:
-            cache.delete_all_policies_for_tenant()
-        for principal in principals:
-            cache.delete_policy(principal.uuid)
+        with access_cache_invalidation(instance.tenant.org_id) as invalidation:
+            _invalidate_group(invalidation, instance.group)
 
 
 def policy_to_roles_cache_handler(
     sender=None, instance=None, action=None, reverse=None, model=None, pk_set=None, using=None, **kwargs  # noqa: C901
 ):
     """Signal handler for Principal cache expiry on Policy/Role m2m change."""
-    cache = AccessCache(instance.tenant.org_id)
-    if action in ("post_add", "pre_remove"):
-        logger.info("Handling signal for %s roles change - invalidating policy cache", instance)
-        if isinstance(instance, Policy):
-            # One or more roles was added to/removed from the policy
-            if instance.group:
-                if instance.group.platform_default:
-                    cache.delete_all_policies_for_tenant()
-                for principal in instance.group.principals.all():
-                    cache.delete_policy(principal.uuid)
-        elif isinstance(instance, Role):
-            # One or more policies was added to/removed from the role
-            for policy in Policy.objects.filter(pk__in=pk_set):
-                if policy.group:
-                    if policy.group.platform_default:
-                        cache.delete_all_policies_for_tenant()
-                    for principal in policy.group.principals.all():
-                        cache.delete_policy(principal.uuid)
-    elif action == "pre_clear":
-        logger.info("Handling signal for %s policy-roles clearing - invalidating policy cache", instance)
-        if isinstance(instance, Policy):
-            # All roles are being removed from this policy
-            if instance.group:
-                if instance.group.platform_default:
-                    cache.delete_all_policies_for_tenant()
-                for principal in instance.group.principals.all():
-                    cache.delete_policy(principal.uuid)
-        elif isinstance(instance, Role):
-            # All policies are being removed from this role
-            for principal in Principal.objects.filter(group__policies__roles__pk=instance.pk):
-                cache.delete_policy(principal.uuid)
+    if action not in ("post_add", "pre_remove", "pre_clear"):
+        return
+    with access_cache_invalidation(instance.tenant.org_id) as invalidation:
+        if action in ("post_add", "pre_remove"):
+            logger.info("Handling signal for %s roles change - invalidating policy cache", instance)
+            if isinstance(instance, Policy):
+                # One or more roles was added to/removed from the policy
+                if instance.group:
+                    _invalidate_group(invalidation, instance.group)
+            elif isinstance(instance, Role):
+                # One or more policies was added to/removed from the role
+                for policy in Policy.objects.filter(pk__in=pk_set, group__isnull=False).select_related("group"):
+                    _invalidate_group(invalidation, policy.group)
+        else:
+            logger.info("Handling signal for %s policy-roles clearing - invalidating policy cache", instance)
+            if isinstance(instance, Policy):
+                # All roles are being removed from this policy
+                if instance.group:
+                    _invalidate_group(invalidation, instance.group)
+            elif isinstance(instance, Role):
+                # All policies are being removed from this role
+                invalidation.add_principals(
+                    Principal.objects.filter(group__policies__roles__pk=instance.pk).values_list("uuid", flat=True)
+                )
 
 
 def policy_changed_sync_handler(sender=None, instance=None, using=None, **kwargs):
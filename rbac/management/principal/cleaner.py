@@ -19,15 +19,20 @@
 import logging
 import os
 import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
 import xmltodict
 from django.conf import settings
+from django.db import connections
 from management.principal.model import Principal
 from management.principal.proxy import PrincipalProxy, external_principal_to_user
 from management.relation_replicator.outbox_replicator import OutboxReplicator
 from management.tenant_service import get_tenant_bootstrap_service
 from management.tenant_service.tenant_service import TenantBootstrapService
+from prometheus_client import Counter
 from rest_framework import status
 from stompest.config import StompConfig
 from stompest.error import StompConnectionError
@@ -44,68 +49,134 @@ CERT_LOC = "/opt/rbac/rbac/management/principal/umb_certs/cert.pem"
 KEY_LOC = "/opt/rbac/rbac/management/principal/umb_certs/key.pem"
 
 
-def clean_tenant_principals(tenant):
-    """Check if all the principals in the tenant exist, remove non-existent principals."""
-    removed_principals = []
-    principals = list(Principal.objects.filter(type="user").filter(tenant=tenant))
+principal_cleanup_checked_total = Counter(
+    "rbac_principal_cleanup_checked_total", "Number of principals checked against BOP by the principal clean up"
+)
+principal_cleanup_bop_requests_total = Counter(
+    "rbac_principal_cleanup_bop_requests_total", "Number of BOP requests made by the principal clean up", ["status"]
+)
+principal_cleanup_removed_total = Counter(
+    "rbac_principal_cleanup_removed_total", "Number of principals removed by the principal clean up"
+)
+
+
+class PrincipalCleanupStats:
+    """Counters of a principal clean up run, shared by the threads cleaning up tenants."""
+
+    def __init__(self):
+        """Start the run."""
+        self.started = time.monotonic()
+        self.tenants = 0
+        self.checked = 0
+        self.bop_requests = 0
+        self.removed = 0
+        self._lock = threading.Lock()
+
+    def add(self, checked=0, bop_requests=0, removed=0, tenants=0):
+        """Add to the counters of the run."""
+        with self._lock:
+            self.checked += checked
+            self.bop_requests += bop_requests
+            self.removed += removed
+            self.tenants += tenants
+
+    def log(self):
+        """Log the counters of the run."""
+        elapsed = time.monotonic() - self.started
+        logger.info(
+            "clean_tenant_principals: %d principals of %d tenants checked in %.1fs (%.1f principals/s), "
+            "%d BOP requests, %d principals removed.",
+            self.checked,
+            self.tenants,
+            elapsed,
+            self.checked / elapsed if elapsed else 0,
+            self.bop_requests,
+            self.removed,
+        )
+
+
+def clean_tenant_principals(tenant, stats=None):
+    """Check if all the principals in the tenant exist, remove non-existent principals.
+
+    The usernames are looked up in BOP in batches of PRINCIPAL_CLEANUP_BATCH_SIZE, and the principals which were not
+    found are removed at once.
+    """
+    principals = dict(
+        Principal.objects.filter(type="user", tenant=tenant, cross_account=False).values_list("username", "id")
+    )
     tenant_id = tenant.org_id
     logger.info(
         "clean_tenant_principals: Running clean up on %d principals for tenant %s.", len(principals), tenant_id
     )
-    for principal in principals:
-        if principal.cross_account:
-            continue
-        logger.debug("clean_tenant_principals: Checking for username %s for tenant %s.", principal.username, tenant_id)
-        org_id = tenant.org_id
-        resp = PROXY.request_filtered_principals([principal.username], org_id=org_id)
+    usernames = list(principals)
+    removed_principals = []
+    bop_requests = 0
+    batch_size = settings.PRINCIPAL_CLEANUP_BATCH_SIZE
+    for i in range(0, len(usernames), batch_size):
+        batch = usernames[i : i + batch_size]  # noqa: E203
+        resp = PROXY.request_filtered_principals(batch, org_id=tenant_id)
+        bop_requests += 1
         status_code = resp.get("status_code")
-        data = resp.get("data")
-        logger.info("clean_tenant_principals: Response code: %s Data: %s", str(status_code), str(data))
-        if status_code == status.HTTP_200_OK and data:
-            logger.debug(
-                "clean_tenant_principals: Username %s found for tenant %s, no change needed.",
-                principal.username,
-                tenant_id,
-            )
-        elif status_code == status.HTTP_200_OK and not data:
-            removed_principals.append(principal.username)
-            logger.info(
-                "clean_tenant_principals: Username %s not found for tenant %s, principal eligible for removal.",
-                principal.username,
-                tenant_id,
-            )
-            principal.delete()
-            logger.info(
-                "clean_tenant_principals: Username %s removed.",
-                principal.username,
-            )
-        else:
+        principal_cleanup_bop_requests_total.labels(status=status_code).inc()
+        if status_code != status.HTTP_200_OK:
             logger.warning(
-                "clean_tenant_principals: Unknown status %d when checking username %s"
-                " for tenant %s, no change needed.",
+                "clean_tenant_principals: Unknown status %s when checking %d usernames for tenant %s,"
+                " no change needed.",
                 status_code,
-                principal.username,
+                len(batch),
                 tenant_id,
             )
+            continue
+        found = {user["username"].lower() for user in resp.get("data") or [] if user.get("username")}
+        missing = [username for username in batch if username.lower() not in found]
+        logger.debug(
+            "clean_tenant_principals: %d of %d usernames not found for tenant %s, principals eligible for removal: %s",
+            len(missing),
+            len(batch),
+            tenant_id,
+            missing,
+        )
+        removed_principals.extend(missing)
+
+    if removed_principals:
+        Principal.objects.filter(id__in=[principals[username] for username in removed_principals]).delete()
+    principal_cleanup_checked_total.inc(len(usernames))
+    principal_cleanup_removed_total.inc(len(removed_principals))
+    if stats is not None:
+        stats.add(checked=len(usernames), bop_requests=bop_requests, removed=len(removed_principals), tenants=1)
     removal_message = "clean_tenant_principals: Completed clean up of %d principals for tenant %s, %d removed: %s."
     logger.info(
         removal_message,
-        len(principals),
+        len(usernames),
         tenant_id,
         len(removed_principals),
         str(removed_principals),
     )
 
 
+def _clean_tenant_principals_in_thread(tenant, stats):
+    """Clean up the principals of a tenant on a worker thread, closing the thread's database connection after."""
+    try:
+        clean_tenant_principals(tenant, stats)
+    except Exception:
+        logger.exception("clean_tenant_principals: Failed principal clean up for tenant %s.", tenant.org_id)
+    finally:
+        connections.close_all()
+
+
 def clean_tenants_principals():
-    """Check which principals are eligible for clean up."""
+    """Check which principals are eligible for clean up.
+
+    Tenants are cleaned up concurrently by PRINCIPAL_CLEANUP_THREADS threads.
+    """
     logger.info("clean_tenant_principals: Start principal clean up.")
+    stats = PrincipalCleanupStats()
 
-    for tenant in list(Tenant.objects.all()):
-        logger.info("clean_tenant_principals: Running principal clean up for tenant %s.", tenant.tenant_name)
-        clean_tenant_principals(tenant)
-        logger.info("clean_tenant_principals: Completed principal clean up for tenant %s.", tenant.tenant_name)
+    with ThreadPoolExecutor(max_workers=settings.PRINCIPAL_CLEANUP_THREADS) as executor:
+        for tenant in Tenant.objects.all().iterator():
+            executor.submit(_clean_tenant_principals_in_thread, tenant, stats)
 
+    stats.log()
     logger.info("clean_tenant_principals: Principal cleanup complete for all tenants.")
 
 
@@ -18,17 +18,20 @@
 import logging
 import time
 import uuid
-from typing import Any, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterable, Optional, Tuple, Union
 
 import requests
 from django.conf import settings
 from django.db.models import Q
 from management.authorization.missing_authorization import MissingAuthorizationError
+from management.cache import ServiceAccountCache
 from management.models import Group, Principal
 from prometheus_client import Counter, Histogram
 from rest_framework import serializers, status
 
 from api.models import User
+from rbac.instrumentation import track_external_call
 from .unexpected_status_code_from_it import UnexpectedStatusCodeFromITError
 
 # Constants or global variables.
@@ -51,6 +54,12 @@ it_request_status_count = Counter(
     ["method", "status"],
 )
 
+it_service_accounts_cache_total = Counter(
+    "it_service_accounts_cache_total",
+    "Number of lookups of the cached service account directory of a tenant by result (hit, miss or stale)",
+    ["result"],
+)
+
 it_request_error = Counter(
     "it_request_error",
     "Number of requests from RBAC to IT's SSO that failed and the reason why they failed",
@@ -93,7 +102,40 @@ class ITService:
         self.it_request_timeout = settings.IT_SERVICE_TIMEOUT_SECONDS
         self.it_url = f"{self.protocol}://{self.host}:{self.port}{self.base_path}{IT_PATH_GET_SERVICE_ACCOUNTS}"
 
+    def _request_service_accounts_page(
+        self, bearer_token: str, offset: int, limit: int, client_ids: Optional[list[str]] = None
+    ) -> list[dict]:
+        """Request a page of the service accounts for a tenant from IT."""
+        parameters: dict[str, Union[int, list[str]]] = {"first": offset, "max": limit}
+        # If we were given client IDs to filter the collection with, do it!
+        if client_ids:
+            parameters["clientId"] = client_ids
+
+        # Call IT.
+        response = requests.get(
+            url=self.it_url,
+            headers={"Authorization": f"Bearer {bearer_token}"},
+            params=parameters,
+            timeout=self.it_request_timeout,
+        )
+
+        # Save the metrics for the successful call. Successful does not mean that we received an OK response,
+        # but that we were able to reach IT's SSO instead and get a response from them.
+        it_request_status_count.labels(method=requests.get.__name__.upper(), status=response.status_code).inc()
+
+        if not status.is_success(response.status_code):
+            LOGGER.error(
+                "Unexpected status code '%s' received from IT when fetching service accounts. Response body: %s",
+                response.status_code,
+                response.content,
+            )
+
+            raise UnexpectedStatusCodeFromITError()
+
+        return response.json()
+
     @it_request_all_service_accounts_time_tracking.time()
+    @track_external_call("it")
     def request_service_accounts(self, bearer_token: str, client_ids: Optional[list[str]] = None) -> list[dict]:
         """Request the service accounts for a tenant and returns the entire list that IT has."""
         # We cannot talk to IT if we don't have a bearer token.
@@ -104,58 +146,29 @@ class ITService:
 
         # Attempt fetching all the service accounts for the tenant.
         try:
-            # Define some sane initial values.
-            offset = 0
             limit = 100
-
-            # If the offset is zero, that means that we need to call the service at least once to get the first
-            # service accounts. If it equals the limit, that means that there are more pages to fetch.
-            parameters: dict[str, Union[int, list[str]]] = {"first": offset, "max": limit}
-            # If we were given client IDs to filter the collection with, do it!
-            if client_ids:
-                parameters["clientId"] = client_ids
-
-            continue_fetching: bool = True
-            while continue_fetching:
-                # Recreate the parameters dictionary every time since otherwise the "assert_has_calls" statement of the
-                # tests only sees the last value for the offset when attempting to fetch multiple pages.
-                parameters = {"first": offset, "max": limit}
-                if client_ids:
-                    parameters["clientId"] = client_ids
-
-                # Call IT.
-                response = requests.get(
-                    url=self.it_url,
-                    headers={"Authorization": f"Bearer {bearer_token}"},
-                    params=parameters,
-                    timeout=self.it_request_timeout,
-                )
-
-                # Save the metrics for the successful call. Successful does not mean that we received an OK response,
-                # but that we were able to reach IT's SSO instead and get a response from them.
-                it_request_status_count.labels(method=requests.get.__name__.upper(), status=response.status_code)
-
-                if not status.is_success(response.status_code):
-                    LOGGER.error(
-                        "Unexpected status code '%s' received from IT when fetching service accounts. "
-                        "Response body: %s",
-                        response.status_code,
-                        response.content,
-                    )
-
-                    raise UnexpectedStatusCodeFromITError()
-
-                # Extract the body contents.
-                body_contents = response.json()
-
-                # Merge the previously received service accounts with the new ones.
-                received_service_accounts = received_service_accounts + body_contents
-
-                # Reassess if we need to keep fetching pages from IT. They don't return page metadata, so we need to
-                # keep looping until the incoming body is an empty array.
-                continue_fetching = limit == len(body_contents)
-                if continue_fetching:
-                    offset = offset + len(body_contents)
+            page = self._request_service_accounts_page(bearer_token, 0, limit, client_ids)
+            received_service_accounts.extend(page)
+
+            # IT does not return page metadata, so a full page means that there might be more. The following pages
+            # are then fetched IT_SERVICE_PAGE_CONCURRENCY at a time, until one of them comes back short.
+            concurrency = settings.IT_SERVICE_PAGE_CONCURRENCY
+            offset = limit
+            if len(page) == limit:
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    while len(page) == limit:
+                        offsets = range(offset, offset + concurrency * limit, limit)
+                        pages = executor.map(
+                            lambda page_offset: self._request_service_accounts_page(
+                                bearer_token, page_offset, limit, client_ids
+                            ),
+                            offsets,
+                        )
+                        for page in pages:
+                            received_service_accounts.extend(page)
+                            if len(page) < limit:
+                                break
+                        offset += concurrency * limit
 
         except requests.exceptions.ConnectionError as exception:
             LOGGER.error(
@@ -183,10 +196,34 @@ class ITService:
             raise exception
 
         # Transform the incoming payload into our model's service accounts.
-        service_accounts: list[dict] = []
-        for incoming_service_account in received_service_accounts:
-            service_accounts.append(self._transform_incoming_payload(incoming_service_account))
+        return [self._transform_incoming_payload(incoming_sa) for incoming_sa in received_service_accounts]
+
+    def request_service_accounts_directory(self, user: User, client_ids: Iterable[str] = ()) -> list[dict]:
+        """Request the service accounts of the user's tenant, from the cached directory when it is enabled.
 
+        IT only returns the service accounts the caller's token may see, so the directory is only cached for, and served
+        to, org admins, who see all of them. It is fetched again from IT when it expired, or when it misses any of the
+        given client IDs, since those service accounts might have been created after it was cached. The latter only
+        happens once the directory is IT_SERVICE_ACCOUNTS_CACHE_REFRESH_INTERVAL seconds old, so that client IDs IT
+        does not know about (e.g. deleted service accounts) do not cause a request to IT every time.
+        """
+        if not settings.IT_SERVICE_ACCOUNTS_CACHE_TTL or not user.org_id or not user.admin:
+            return self.request_service_accounts(bearer_token=user.bearer_token)
+
+        cache = ServiceAccountCache()
+        directory = cache.get_service_accounts(user.org_id)
+        if directory is None:
+            it_service_accounts_cache_total.labels(result="miss").inc()
+        else:
+            service_accounts = directory["service_accounts"]
+            recent = time.time() - directory["fetched"] < settings.IT_SERVICE_ACCOUNTS_CACHE_REFRESH_INTERVAL
+            if recent or {sa.get("clientId") for sa in service_accounts}.issuperset(client_ids):
+                it_service_accounts_cache_total.labels(result="hit").inc()
+                return service_accounts
+            it_service_accounts_cache_total.labels(result="stale").inc()
+
+        service_accounts = self.request_service_accounts(bearer_token=user.bearer_token)
+        cache.save_service_accounts(user.org_id, service_accounts)
         return service_accounts
 
     def is_service_account_valid_by_client_id(self, user: User, service_account_client_id: str) -> bool:
@@ -217,7 +254,8 @@ class ITService:
         else:
             # In theory, we should be able to pass the client ID to the function below to just get the specified
             # service account and check if it is present or not. However, due to a bug, we need to fetch the whole
-            # collection for now. More details in https://issues.redhat.com/browse/RHCLOUD-31265 .
+            # collection for now. More details in https://issues.redhat.com/browse/RHCLOUD-31265 . The cached directory
+            # is not used, so that service accounts deleted in IT are not validated.
             service_accounts: list[dict] = self.request_service_accounts(bearer_token=user.bearer_token)
 
             for sa in service_accounts:
@@ -228,11 +266,6 @@ class ITService:
 
     def get_service_accounts(self, user: User, options: dict[str, Any] = {}) -> Tuple[list[dict], int]:
         """Request and returns the service accounts for the given tenant."""
-        # We might want to bypass calls to the IT service on ephemeral or test environments.
-        it_service_accounts: list[dict] = []
-        if not settings.IT_BYPASS_IT_CALLS:
-            it_service_accounts = self.request_service_accounts(bearer_token=user.bearer_token)
-
         # Get the service accounts from the database. The weird filter is to fetch the service accounts depending on
         # the account number or the organization ID the user gave.
         service_account_principals = Principal.objects.filter(type=Principal.Types.SERVICE_ACCOUNT).filter(
@@ -278,6 +311,11 @@ class ITService:
         else:
             service_account_principals = service_account_principals.order_by("-username")
 
+        # Put the service accounts in a dict by for a quicker search.
+        sap_dict: dict[str, Principal] = {}
+        for sap in service_account_principals:
+            sap_dict[sap.service_account_id] = sap
+
         # If we are in an ephemeral or test environment, we will take all the service accounts of the user that are
         # stored in the database and generate a mocked response for them, simulating that IT has the corresponding
         # service account to complement the information.
@@ -285,11 +323,8 @@ class ITService:
             it_service_accounts = self._get_mock_service_accounts(
                 service_account_principals=service_account_principals
             )
-
-        # Put the service accounts in a dict by for a quicker search.
-        sap_dict: dict[str, Principal] = {}
-        for sap in service_account_principals:
-            sap_dict[sap.service_account_id] = sap
+        else:
+            it_service_accounts = self.request_service_accounts_directory(user=user, client_ids=sap_dict.keys())
 
         # Filter the incoming service accounts. Also, transform them to the payload we will
         # be returning.
@@ -312,12 +347,6 @@ class ITService:
     def get_service_accounts_group(self, group: Group, user: User, options: dict[str, Any] = {}) -> list[dict]:
         """Get the service accounts for the given group."""
         username_only: str = options.get("username_only", "false")
-        # We might want to bypass calls to the IT service
-        #        - on ephemeral or test environments
-        #        - when query param username_only == 'true'
-        it_service_accounts: list[dict[str, Union[str, int]]] = []
-        if not settings.IT_BYPASS_IT_CALLS and username_only == "false":
-            it_service_accounts = self.request_service_accounts(bearer_token=user.bearer_token)
 
         # Fetch the service accounts from the group.
         group_service_account_principals = group.principals.filter(type=Principal.Types.SERVICE_ACCOUNT)
@@ -346,18 +375,22 @@ class ITService:
                     service_account_id__contains=principal_username
                 )
 
+        # Put the service accounts in a dict by for a quicker search.
+        sap_dict: dict[str, Principal] = {}
+        for sap in group_service_account_principals:
+            sap_dict[sap.service_account_id] = sap
+
         # If we are in an ephemeral or test environment, we will take all the service accounts of the user that are
         # stored in the database and generate a mocked response for them, simulating that IT has the corresponding
-        # service account to complement the information.
+        # service account to complement the information. IT is not called either when query param
+        # username_only == 'true'.
+        it_service_accounts: list[dict[str, Union[str, int]]] = []
         if settings.IT_BYPASS_IT_CALLS:
             it_service_accounts = self._get_mock_service_accounts(
                 service_account_principals=group_service_account_principals
             )
-
-        # Put the service accounts in a dict by for a quicker search.
-        sap_dict: dict[str, Principal] = {}
-        for sap in group_service_account_principals:
-            sap_dict[sap.service_account_id] = sap
+        elif username_only == "false":
+            it_service_accounts = self.request_service_accounts_directory(user=user, client_ids=sap_dict.keys())
 
         service_accounts: list[dict] = []
         if username_only == "true":
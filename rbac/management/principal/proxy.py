@@ -16,16 +16,24 @@
 #
 
 """Proxy for principal management."""
+import hashlib
+import json
 import logging
+import os
+import threading
+import time
 
 import requests
 from django.conf import settings
+from management.cache import PrincipalCache
 from management.models import Principal
 from prometheus_client import Counter, Histogram
+from requests.adapters import HTTPAdapter
 from rest_framework import status
 
 from api.models import User
 from rbac.env import ENVIRONMENT
+from rbac.instrumentation import track_external_call
 
 LOGGER = logging.getLogger(__name__)
 PROTOCOL = "protocol"
@@ -49,6 +57,26 @@ bop_request_status_count = Counter(
     "bop_request_status_total", "Number of requests from RBAC to BOP and resulting status", ["method", "status"]
 )
 
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+def bop_session():
+    """Return the keep-alive session to BOP of this process, which its threads share."""
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session_pid != pid:
+        with _session_lock:
+            if _session_pid != pid:
+                # Connections are not shared with the parent of a forked process.
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.BOP_CONNECTION_POOL_SIZE)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session, _session_pid = session, pid
+    return _session
+
 
 class PrincipalProxy:  # pylint: disable=too-few-public-methods
     """A class to handle interactions with the Principal proxy service."""
@@ -141,17 +169,20 @@ class PrincipalProxy:  # pylint: disable=too-few-public-methods
         return proxy_conn_info
 
     @bop_request_time_tracking.time()
+    @track_external_call("bop")
     def _request_principals(
         self,
         url,
         org_id=None,
         org_id_filter=False,
-        method=requests.get,
+        method=None,
         params=None,
         data=None,
         return_id=False,  # noqa: C901
     ):
-        """Send request to proxy service."""
+        """Send request to proxy service, with a GET of the BOP session by default."""
+        if method is None:
+            method = bop_session().get
         metrics_method = method.__name__.upper()
         if params and params.get("username_only") == "true":
             principals = Principal.objects.filter(type="user")
@@ -252,10 +283,10 @@ class PrincipalProxy:  # pylint: disable=too-few-public-methods
         if input:
             payload = input
             account_principals_path = f"/v3/accounts/{org_id}/usersBy"
-            method = requests.post
+            method = bop_session().post
         else:
             account_principals_path = f"/v3/accounts/{org_id}/users"
-            method = requests.get
+            method = bop_session().get
             payload = None
 
         params = self._create_params(limit, offset, options)
@@ -281,12 +312,74 @@ class PrincipalProxy:  # pylint: disable=too-few-public-methods
             url,
             org_id=org_id,
             org_id_filter=org_id_filter,
-            method=requests.post,
+            method=bop_session().post,
             params=params,
             data=payload,
             return_id=return_id,
         )
 
+    def _principal_cache_key(self, username, org_id, options):
+        """Return the principal cache key of the lookup of a principal with the given options."""
+        params = self._create_params(options=options)
+        params["return_id"] = options.get("return_id") is not None
+        params_hash = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()
+        return f"{org_id}::{username.lower()}::{params_hash}"
+
+    def request_cached_filtered_principals(self, principals, org_id=None, options={}):
+        """Request specific principals for an account, through the principal cache when it is enabled.
+
+        Only the principals missing from the cache are requested from BOP, in a single request. The principals are
+        returned in the order of the given usernames.
+        """
+        if not settings.PRINCIPAL_CACHE_TTL or not principals:
+            return self.request_filtered_principals(principals, org_id=org_id, options=options)
+
+        cache = PrincipalCache()
+        keys = {username.lower(): self._principal_cache_key(username, org_id, options) for username in principals}
+        found = {}
+        missing = []
+        for username in principals:
+            entry = cache.get_principal(keys[username.lower()])
+            if entry is None:
+                missing.append(username)
+            else:
+                found.update((item["username"].lower(), item) for item in entry["data"])
+
+        if missing:
+            start = time.monotonic()
+            resp = self.request_filtered_principals(missing, org_id=org_id, options=options)
+            if resp.get("status_code") != status.HTTP_200_OK:
+                return resp
+            duration = (time.monotonic() - start) / len(missing)
+            for item in resp.get("data") or []:
+                username = item["username"].lower()
+                found[username] = item
+                if username in keys:
+                    cache.save_principal(keys[username], [item], duration)
+
+        data = [found[username.lower()] for username in principals if username.lower() in found]
+        return {"status_code": status.HTTP_200_OK, "data": data}
+
+    def request_principal(self, username, org_id=None, options={}):
+        """Request a single principal of an account, through the principal cache when it is enabled.
+
+        Only the lookups which found the principal are cached.
+        """
+        if not settings.PRINCIPAL_CACHE_TTL:
+            return self.request_filtered_principals([username], org_id=org_id, options=options)
+
+        key = self._principal_cache_key(username, org_id, options)
+        cache = PrincipalCache()
+        entry = cache.get_principal(key)
+        if entry is not None:
+            return {"status_code": status.HTTP_200_OK, "data": entry["data"]}
+
+        start = time.monotonic()
+        resp = self.request_filtered_principals([username], org_id=org_id, options=options)
+        if resp.get("status_code") == status.HTTP_200_OK and resp.get("data"):
+            cache.save_principal(key, resp["data"], time.monotonic() - start)
+        return resp
+
 
 def external_principal_to_user(principal: dict) -> User:
     """Convert external principal to the common User object."""
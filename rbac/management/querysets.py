@@ -20,6 +20,7 @@ from django.db.models import Q, QuerySet
 from django.db.models.aggregates import Count
 from django.urls import reverse
 from django.utils.translation import gettext as _
+from management.access.effective_access import get_effective_access_queryset
 from management.group.model import Group
 from management.permissions.role_access import RoleAccessPermission
 from management.policy.model import Policy
@@ -34,7 +35,6 @@ from management.utils import (
     get_principal_from_request,
     groups_for_principal,
     policies_for_principal,
-    queryset_by_id,
     roles_for_principal,
     validate_and_get_key,
 )
@@ -163,7 +163,6 @@ def get_role_queryset(request) -> QuerySet:
             Role,
             **{
                 "prefetch_lookups_for_ids": "access",
-                "prefetch_lookups_for_groups": "policies__roles",
                 "is_org_admin": request.user.admin,
             },
         )
@@ -191,7 +190,6 @@ def get_role_queryset(request) -> QuerySet:
                 Role,
                 **{
                     "prefetch_lookups_for_ids": "access",
-                    "prefetch_lookups_for_groups": "policies__roles",
                     "is_org_admin": is_org_admin,
                 },
             )
@@ -247,6 +245,12 @@ def get_access_queryset(request: Request) -> QuerySet:
     else:
         is_org_admin = _check_user_username_is_org_admin(request=request, username=username)
 
+    if settings.EFFECTIVE_ACCESS_TABLE_ENABLED:
+        principal = get_principal_from_request(request)
+        return get_effective_access_queryset(principal, request.tenant, app, is_org_admin).prefetch_related(
+            "resourceDefinitions"
+        )
+
     return get_object_principal_queryset(
         request,
         PRINCIPAL_SCOPE,
@@ -254,7 +258,6 @@ def get_access_queryset(request: Request) -> QuerySet:
         **{
             APPLICATION_KEY: app,
             "prefetch_lookups_for_ids": "resourceDefinitions",
-            "prefetch_lookups_for_groups": "policies__roles__access",
             "is_org_admin": is_org_admin,
         },
     )
@@ -274,8 +277,11 @@ def get_object_principal_queryset(request, scope, clazz, **kwargs):
 
     object_principal_func = PRINCIPAL_QUERYSET_MAP.get(clazz.__name__)
     principal = get_principal_from_request(request)
-    objects = object_principal_func(principal, request.tenant, **kwargs)
-    return queryset_by_id(objects, clazz, **kwargs)
+    queryset = object_principal_func(principal, request.tenant, **kwargs).order_by("id")
+    prefetch_lookups = kwargs.get("prefetch_lookups_for_ids")
+    if prefetch_lookups:
+        queryset = queryset.prefetch_related(prefetch_lookups)
+    return queryset
 
 
 def _filter_admin_default(request: Request, queryset: QuerySet):
@@ -17,8 +17,10 @@
 
 """RelationReplicator which writes to the outbox table."""
 
+import contextlib
 import logging
 
+from django.db import transaction
 from google.protobuf import json_format
 from management.models import Outbox
 from management.relation_replicator.relation_replicator import RelationReplicator, ReplicationEvent
@@ -57,10 +59,82 @@ class OutboxReplicator(RelationReplicator):
             " ".join([f"info.{key}='{str(value)}'" for key, value in event_info.items()]),
         )
         # https://debezium.io/documentation/reference/stable/transformations/outbox-event-router.html#basic-outbox-table
-        outbox_record = Outbox.objects.create(
+        self._write_records([self._build_outbox_record(payload, event_type, aggregateid)])
+
+    def _build_outbox_record(self, payload, event_type, aggregateid) -> Outbox:
+        """Build an (unsaved) outbox record."""
+        return Outbox(
             aggregatetype="relations-replication-event",
             aggregateid=aggregateid,
             event_type=event_type,
             payload=payload,
         )
-        outbox_record.delete()
+
+    def _write_records(self, records: list[Outbox]):
+        """Write the records to the outbox and delete them straight away.
+
+        Debezium reads the inserts from the write-ahead log, so the rows never need to be kept.
+        """
+        if len(records) == 1:
+            records[0].save(force_insert=True)
+            records[0].delete()
+            return
+        # Rows are inserted in list order, which keeps the order of the events of each aggregate.
+        Outbox.objects.bulk_create(records)
+        Outbox.objects.filter(id__in=[record.id for record in records]).delete()
+
+
+class BufferedOutboxReplicator(OutboxReplicator):
+    """Replicates relations via the outbox table, writing the events of a transaction in batches.
+
+    Events replicated within `atomic()` are buffered and written with one multi-row insert and one delete per
+    `batch_size` events, just before the transaction commits. They are not deferred to `transaction.on_commit`, as
+    that would write them after the data they describe has committed, losing the atomicity the outbox provides.
+    Outside of `atomic()` every event is written straight away, like OutboxReplicator does.
+    """
+
+    def __init__(self, batch_size: int = 500):
+        """Initialize the replicator."""
+        self.batch_size = batch_size
+        self._buffer = None
+
+    @contextlib.contextmanager
+    def atomic(self):
+        """Run the block in a transaction, writing its buffered events to the outbox before it commits."""
+        if self._buffer is not None:
+            # Nested blocks share the buffer of the outermost one. Events buffered before the savepoint are written
+            # first, so that rolling back the savepoint only drops the events of the nested block.
+            self.flush()
+            try:
+                with transaction.atomic():
+                    yield self
+            except BaseException:
+                self._buffer = []
+                raise
+            return
+        self._buffer = []
+        try:
+            with transaction.atomic():
+                yield self
+                self.flush()
+        finally:
+            self._buffer = None
+
+    def flush(self):
+        """Write the buffered events to the outbox."""
+        if self._buffer:
+            records, self._buffer = self._buffer, []
+            self._write_records(records)
+
+    def _save_replication_event(self, payload, event_type, event_info: dict[str, object], aggregateid):
+        """Buffer the replication event, or save it straight away outside of `atomic()`."""
+        if self._buffer is None:
+            return super()._save_replication_event(payload, event_type, event_info, aggregateid)
+        logger.info(
+            "[Dual Write] Buffering replication event. event_type='%s' %s",
+            event_type,
+            " ".join([f"info.{key}='{str(value)}'" for key, value in event_info.items()]),
+        )
+        self._buffer.append(self._build_outbox_record(payload, event_type, aggregateid))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
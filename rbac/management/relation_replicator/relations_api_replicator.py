@@ -17,9 +17,14 @@
 
 """RelationReplicator which writes to the Relations API."""
 
+import itertools
 import json
 import logging
-
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import grpc
 from django.conf import settings
@@ -32,6 +37,61 @@ from management.relation_replicator.relation_replicator import RelationReplicato
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
+RETRYABLE_STATUS_CODES = {
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.ABORTED,
+}
+
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 30000),
+    ("grpc.keepalive_timeout_ms", 10000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+
+
+class ChannelPool:
+    """Long-lived gRPC channels to the Relations API, shared by the replicators of a process.
+
+    Each channel multiplexes concurrent requests over one connection; stubs are handed out round robin. The pool is
+    rebuilt after a fork, since gRPC channels cannot be shared with a child process.
+    """
+
+    def __init__(self):
+        """Initialize the pool."""
+        self._lock = threading.Lock()
+        self._pid = None
+        self._channels = []
+        self._stubs = None
+
+    def stub(self) -> relation_tuples_pb2_grpc.KesselTupleServiceStub:
+        """Return a stub on one of the pooled channels."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._channels = [
+                        grpc.insecure_channel(settings.RELATION_API_SERVER, options=CHANNEL_OPTIONS)
+                        for _ in range(max(settings.RELATION_API_CHANNEL_POOL_SIZE, 1))
+                    ]
+                    stubs = [relation_tuples_pb2_grpc.KesselTupleServiceStub(channel) for channel in self._channels]
+                    self._stubs = itertools.cycle(stubs)
+                    self._pid = os.getpid()
+        return next(self._stubs)
+
+    def close(self):
+        """Close the channels of this process."""
+        with self._lock:
+            if self._pid == os.getpid():
+                for channel in self._channels:
+                    channel.close()
+            self._pid = None
+            self._channels = []
+
+
+channel_pool = ChannelPool()
+
 
 class RelationsApiReplicator(RelationReplicator):
     """Replicates relations via the Relations API over gRPC."""
@@ -41,22 +101,46 @@ class RelationsApiReplicator(RelationReplicator):
         self._write_relationships(event.add)
 
     def _write_relationships(self, relationships):
-        with grpc.insecure_channel(settings.RELATION_API_SERVER) as channel:
-            stub = relation_tuples_pb2_grpc.KesselTupleServiceStub(channel)
-
-            request = relation_tuples_pb2.CreateTuplesRequest(
-                upsert=True,
-                tuples=relationships,
-            )
+        """Write the relationships in chunks, with a bounded number of requests in flight."""
+        size = max(settings.RELATION_API_MAX_TUPLES_PER_REQUEST, 1)
+        chunks = [relationships[i : i + size] for i in range(0, len(relationships), size)]  # noqa: E203
+        if len(chunks) <= 1 or settings.RELATION_API_MAX_IN_FLIGHT <= 1:
+            for chunk in chunks:
+                self._create_tuples(chunk)
+            return
+        with ThreadPoolExecutor(max_workers=min(settings.RELATION_API_MAX_IN_FLIGHT, len(chunks))) as executor:
+            list(executor.map(self._create_tuples, chunks))
+
+    def _create_tuples(self, relationships):
+        """Create the tuples, retrying transient errors with an exponential backoff."""
+        request = relation_tuples_pb2.CreateTuplesRequest(
+            upsert=True,
+            tuples=relationships,
+        )
+        attempt = 0
+        while True:
             try:
-                stub.CreateTuples(request)
+                channel_pool.stub().CreateTuples(request, timeout=settings.RELATION_API_TIMEOUT)
+                return
             except grpc.RpcError as err:
-                error = GRPCError(err.value)
+                if err.code() in RETRYABLE_STATUS_CODES and attempt < settings.RELATION_API_MAX_RETRIES:
+                    delay = settings.RELATION_API_RETRY_BACKOFF * (2**attempt) * random.uniform(0.5, 1.5)
+                    attempt += 1
+                    logger.warning(
+                        "Retrying write of relationships to the relation API server in %.2fs after %s (attempt %s).",
+                        delay,
+                        err.code(),
+                        attempt,
+                    )
+                    time.sleep(delay)
+                    continue
+                error = GRPCError(err)
                 logger.error(
                     "Failed to write relationships to the relation API server: "
                     f"error code {error.code}, reason {error.reason}"
                     f"relationships: {relationships}"
                 )
+                return
 
 
 class GRPCError:
@@ -71,9 +155,11 @@ class GRPCError:
         """Initialize the error."""
         self.code = error.code()
         self.message = error.details()
+        self.reason = ""
+        self.metadata = {}
 
         status = rpc_status.from_call(error)
-        if status is not None:
+        if status is not None and status.details:
             detail = status.details[0]
             info = error_details_pb2.ErrorInfo()
             detail.Unpack(info)
@@ -19,10 +19,14 @@
 import json
 import logging
 import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from core.utils import destructive_ok
 from django.conf import settings
-from django.db import transaction
+from django.db import connections, transaction
+from django.db.models import prefetch_related_objects, signals
 from django.utils import timezone
 from management.notifications.notification_handlers import role_obj_change_notification_handler
 from management.permission.model import Permission
@@ -64,88 +68,266 @@ def _add_ext_relation_if_it_exists(external_relation, role):
     )
 
 
-def _make_role(data, dual_write_handler):
-    """Create the role object in the database."""
-    public_tenant = Tenant.objects.get(tenant_name="public")
-    name = data.pop("name")
-    display_name = data.get("display_name", name)
-    access_list = data.get("access")
-    defaults = dict(
+def _new_permission(permission, tenant, **kwargs):
+    """Build an unsaved permission, populating the fields which Permission.save would."""
+    context = permission.split(":")
+    return Permission(
+        permission=permission,
+        application=context[0],
+        resource_type=context[1],
+        verb=context[2],
+        tenant=tenant,
+        **kwargs,
+    )
+
+
+def _get_or_create_permissions(permissions, tenant):
+    """Return the given permissions by name, creating the missing ones in bulk."""
+    existing = {
+        permission.permission: permission for permission in Permission.objects.filter(permission__in=permissions)
+    }
+    missing = [_new_permission(permission, tenant) for permission in permissions if permission not in existing]
+    for permission in Permission.objects.bulk_create(missing):
+        existing[permission.permission] = permission
+    return existing
+
+
+def _access_key(permission, resource_definitions):
+    """Return a key identifying an access by its permission and resource definitions."""
+    return permission, json.dumps(sorted(json.dumps(rd, sort_keys=True) for rd in resource_definitions))
+
+
+def _role_fields(data):
+    """Return the field values of a system role defined by the given data."""
+    return dict(
         description=data.get("description", None),
         system=True,
         version=data.get("version", 1),
         platform_default=data.get("platform_default", False),
         admin_default=data.get("admin_default", False),
+        display_name=data.get("display_name", data["name"]),
     )
-    role, created = Role.objects.get_or_create(name=name, defaults=defaults, tenant=public_tenant)
 
-    if created:
-        if role.display_name != display_name:
-            role.display_name = display_name
-            role.save()
-        logger.info("Created system role %s.", name)
-        role_obj_change_notification_handler(role, "created")
-    else:
-        if role.version != defaults["version"]:
+
+def _sync_role_access(roles, definitions, tenant):
+    """Bring the access of the given roles in line with their definitions.
+
+    Access which is both defined and in the database is kept, only the access missing from either side is created or
+    deleted.
+    """
+    prefetch_related_objects(roles, "access__permission", "access__resourceDefinitions")
+    permission_names = {
+        access_item["permission"] for role in roles for access_item in definitions[role.name].get("access") or []
+    }
+    permissions = _get_or_create_permissions(permission_names, tenant)
+
+    access_ids_to_delete = []
+    access_to_create = []
+    for role in roles:
+        current_access = defaultdict(list)
+        for access in role.access.all():
+            rds = [{"attributeFilter": rd.attributeFilter} for rd in access.resourceDefinitions.all()]
+            permission = access.permission.permission if access.permission else None
+            current_access[_access_key(permission, rds)].append(access.id)
+
+        # Allow external roles to have none access object
+        for access_item in definitions[role.name].get("access") or []:
+            rds = access_item.get("resourceDefinitions", [])
+            matching = current_access[_access_key(access_item["permission"], rds)]
+            if matching:
+                matching.pop()
+                continue
+            access = Access(permission=permissions[access_item["permission"]], role=role, tenant=tenant)
+            access_to_create.append((access, rds))
+        for access_ids in current_access.values():
+            access_ids_to_delete.extend(access_ids)
+
+    if access_ids_to_delete:
+        Access.objects.filter(id__in=access_ids_to_delete).delete()
+    Access.objects.bulk_create([access for access, _ in access_to_create])
+    ResourceDefinition.objects.bulk_create(
+        [ResourceDefinition(**rd, access=access, tenant=tenant) for access, rds in access_to_create for rd in rds]
+    )
+
+
+def _seed_system_roles(role_list, dual_write_handler):
+    """Create or update the given system roles in bulk and return the ids of their roles.
+
+    The definitions are compared with the roles in the database in a few queries. Only the roles whose version
+    changed are updated, and only their access which differs from the definition is replaced, so the replicated
+    relations, notifications and signals are limited to what actually changed.
+    """
+    public_tenant = Tenant.objects.get(tenant_name="public")
+    definitions = {data["name"]: data for data in role_list}
+
+    existing_roles = {
+        role.name: role
+        for role in Role.objects.filter(tenant=public_tenant, name__in=definitions).prefetch_related(
+            "access__permission", "access__resourceDefinitions"
+        )
+    }
+    role_ids = set()
+    new_roles = []
+    updated_roles = []
+    for name, data in definitions.items():
+        role = existing_roles.get(name)
+        if role is None:
+            new_roles.append(Role(name=name, tenant=public_tenant, **_role_fields(data)))
+        elif role.version != data.get("version", 1):
             dual_write_handler.prepare_for_update(role)
-            Role.objects.filter(name=name).update(**defaults, display_name=display_name, modified=timezone.now())
-            logger.info("Updated system role %s.", name)
-            role.access.all().delete()
-            role_obj_change_notification_handler(role, "updated")
+            for field, value in _role_fields(data).items():
+                setattr(role, field, value)
+            role.modified = timezone.now()
+            updated_roles.append(role)
         else:
             logger.info("No change in system role %s", name)
-            return role
-
-    if access_list:  # Allow external roles to have none access object
-        for access_item in access_list:
-            resource_def_list = access_item.pop("resourceDefinitions", [])
-            permission, _ = Permission.objects.get_or_create(**access_item, tenant=public_tenant)
+            role_ids.add(role.id)
 
-            access_obj = Access.objects.create(permission=permission, role=role, tenant=public_tenant)
-            for resource_def_item in resource_def_list:
-                ResourceDefinition.objects.create(**resource_def_item, access=access_obj, tenant=public_tenant)
-
-    _add_ext_relation_if_it_exists(data.get("external"), role)
+    Role.objects.bulk_create(new_roles)
+    Role.objects.bulk_update(
+        updated_roles,
+        ["description", "system", "version", "platform_default", "admin_default", "display_name", "modified"],
+    )
+    _sync_role_access(new_roles + updated_roles, definitions, public_tenant)
 
-    if created:
-        dual_write_handler.replicate_new_system_role(role)
-    else:
-        if role.version != defaults["version"]:
+    new_role_ids = {role.id for role in new_roles}
+    changed_roles = (
+        Role.objects.filter(id__in=[role.id for role in new_roles + updated_roles])
+        .select_related("ext_relation__ext_tenant")
+        .prefetch_related("access__permission")
+    )
+    for role in changed_roles:
+        created = role.id in new_role_ids
+        _add_ext_relation_if_it_exists(definitions[role.name].get("external"), role)
+        # The access was written in bulk, so the role-related signal handlers are notified once per role instead.
+        signals.post_save.send(sender=Role, instance=role, created=created, raw=False, using=role._state.db)
+        if created:
+            logger.info("Created system role %s.", role.name)
+            role_obj_change_notification_handler(role, "created")
+            dual_write_handler.replicate_new_system_role(role)
+        else:
+            logger.info("Updated system role %s.", role.name)
+            role_obj_change_notification_handler(role, "updated")
             dual_write_handler.replicate_update_system_role(role)
+        role_ids.add(role.id)
+    return role_ids
 
-    return role
 
+def _load_role_file(role_file_path):
+    """Return the system roles defined in a role definition file."""
+    with open(role_file_path) as json_file:
+        data = json.load(json_file)
+        return data.get("roles") or []
 
-def _update_or_create_roles(roles, dual_write_handler):
-    """Update or create roles from list."""
-    current_role_ids = set()
-    for role_json in roles:
-        try:
-            role = _make_role(role_json, dual_write_handler)
-            current_role_ids.add(role.id)
-        except Exception as e:
-            logger.error(f"Failed to update or create system role: {role_json.get('name')} " f"with error: {e}")
-    return current_role_ids
 
+def _load_role_definitions():
+    """Return the system roles of every role definition file by file name, parsing the files concurrently.
 
-def seed_roles():
-    """Update or create system defined roles."""
+    A role defined in more than one file is only seeded from the first one.
+    """
     roles_directory = os.path.join(settings.BASE_DIR, "management", "role", "definitions")
     role_files = [
         f
         for f in os.listdir(roles_directory)
         if os.path.isfile(os.path.join(roles_directory, f)) and f.endswith(".json")
     ]
+    with ThreadPoolExecutor(max_workers=settings.MAX_SEED_THREADS) as executor:
+        role_lists = executor.map(_load_role_file, [os.path.join(roles_directory, f) for f in role_files])
+
+    definitions = {}
+    role_names = set()
+    for role_file_name, role_list in zip(role_files, role_lists):
+        definitions[role_file_name] = []
+        for data in role_list:
+            if data["name"] in role_names:
+                logger.warning("System role %s is defined more than once, the first definition is used.", data["name"])
+                continue
+            role_names.add(data["name"])
+            definitions[role_file_name].append(data)
+    return definitions
+
+
+def _seed_role_file(role_file_name, role_list, dual_write_handler):
+    """Seed the system roles of a role definition file and return the ids of its roles."""
+    start = time.perf_counter()
+    role_ids = _seed_system_roles(role_list, dual_write_handler)
+    logger.info(
+        "Seeded %s system roles from %s in %.2fs.", len(role_list), role_file_name, time.perf_counter() - start
+    )
+    return role_ids
+
+
+def _seed_role_file_in_thread(role_file_name, role_list):
+    """Seed a role definition file in its own transaction, closing the connections of the thread afterwards."""
+    try:
+        with transaction.atomic():
+            return _seed_role_file(role_file_name, role_list, SeedingRelationApiDualWriteHandler())
+    finally:
+        connections.close_all()
+
+
+def _seed_role_files(definitions):
+    """Seed the role definition files one after another in a single transaction.
+
+    Returns the ids of the seeded roles, or None when seeding failed.
+    """
     dual_write_handler = SeedingRelationApiDualWriteHandler()
     current_role_ids = set()
-    with transaction.atomic():
-        for role_file_name in role_files:
-            role_file_path = os.path.join(roles_directory, role_file_name)
-            with open(role_file_path) as json_file:
-                data = json.load(json_file)
-                role_list = data.get("roles")
-                file_role_ids = _update_or_create_roles(role_list, dual_write_handler)
-                current_role_ids.update(file_role_ids)
+    try:
+        with transaction.atomic():
+            for role_file_name, role_list in definitions.items():
+                current_role_ids.update(_seed_role_file(role_file_name, role_list, dual_write_handler))
+    except Exception as e:
+        logger.error(f"Failed to update or create system roles with error: {e}")
+        return None
+    return current_role_ids
+
+
+def _seed_role_files_in_parallel(definitions):
+    """Seed the role definition files concurrently in MAX_SEED_THREADS threads, each file in its own transaction.
+
+    The permissions the roles use are created up front, so that files using the same permissions don't race to create
+    them. Returns the ids of the seeded roles, or None when seeding any of the files failed.
+    """
+    public_tenant = Tenant.objects.get(tenant_name="public")
+    _get_or_create_permissions(
+        {
+            access_item["permission"]
+            for role_list in definitions.values()
+            for data in role_list
+            for access_item in data.get("access") or []
+        },
+        public_tenant,
+    )
+
+    current_role_ids = set()
+    failed = False
+    with ThreadPoolExecutor(max_workers=settings.MAX_SEED_THREADS) as executor:
+        futures = {
+            executor.submit(_seed_role_file_in_thread, role_file_name, role_list): role_file_name
+            for role_file_name, role_list in definitions.items()
+        }
+        for future in as_completed(futures):
+            try:
+                current_role_ids.update(future.result())
+            except Exception as e:
+                failed = True
+                logger.error(f"Failed to update or create system roles from {futures[future]} with error: {e}")
+    return None if failed else current_role_ids
+
+
+def seed_roles():
+    """Update or create system defined roles."""
+    start = time.perf_counter()
+    definitions = _load_role_definitions()
+    if settings.PARALLEL_ROLE_SEEDING_ENABLED:
+        current_role_ids = _seed_role_files_in_parallel(definitions)
+    else:
+        current_role_ids = _seed_role_files(definitions)
+    if current_role_ids is None:
+        # Without the seeded roles, every system role would be eligible for removal
+        return
+    logger.info("Seeded %s role definition files in %.2fs.", len(definitions), time.perf_counter() - start)
 
     # Find roles in DB but not in config
     roles_to_delete = Role.objects.filter(system=True).exclude(id__in=current_role_ids)
@@ -153,65 +335,101 @@ def seed_roles():
     if destructive_ok("seeding"):
         logger.info(f"Removing the following role(s): {roles_to_delete.values()}")
         # Actually remove roles no longer in config
+        dual_write_handler = SeedingRelationApiDualWriteHandler()
         with transaction.atomic():
-            for role in roles_to_delete:
+            for role in roles_to_delete.prefetch_related("access__permission"):
                 dual_write_handler.replicate_deleted_system_role(role)
             roles_to_delete.delete()
 
 
-def seed_permissions():
-    """Update or create defined permissions."""
-    public_tenant = Tenant.objects.get(tenant_name="public")
+def _load_permission_definitions():
+    """Return the permissions defined in all of the permission files, by permission string.
 
+    Each definition holds the description and required verbs, permissions configured as plain strings have none.
+    """
     permission_directory = os.path.join(settings.BASE_DIR, "management", "role", "permissions")
     permission_files = [
         f
         for f in os.listdir(permission_directory)
         if os.path.isfile(os.path.join(permission_directory, f)) and f.endswith(".json")
     ]
-    current_permission_ids = set()
-
+    definitions = {}
     for permission_file_name in permission_files:
         permission_file_path = os.path.join(permission_directory, permission_file_name)
         app_name = os.path.splitext(permission_file_name)[0]
         with open(permission_file_path) as json_file:
             data = json.load(json_file)
             for resource, operation_objects in data.items():
-                try:
-                    with transaction.atomic():
-                        for operation_object in operation_objects:
-                            # There are some old configs, e.g., cost-management still stay in CI
-                            if not isinstance(operation_object, str):
-                                permission_description = operation_object.get("description", "")
-                                operation = operation_object.get("verb")
-                                permission, created = Permission.objects.update_or_create(
-                                    permission=f"{app_name}:{resource}:{operation}",
-                                    defaults={"description": permission_description},
-                                    tenant=public_tenant,
-                                )
-                            else:
-                                permission, created = Permission.objects.update_or_create(
-                                    permission=f"{app_name}:{resource}:{operation_object}", tenant=public_tenant
-                                )
-                            if created:
-                                logger.info(f"Created permission {permission.permission}.")
-                            current_permission_ids.add(permission.id)
-
-                        # need to iterate over the objects with requirements AFTER all perms are created
-                        operation_objects_with_requires = [obj for obj in operation_objects if "requires" in obj]
-                        for operation_object in operation_objects_with_requires:
-                            if not isinstance(operation_object, str):
-                                required_verbs = operation_object.get("requires")
-                                verb = operation_object.get("verb")
-                                permission = Permission.objects.get(permission=f"{app_name}:{resource}:{verb}")
-                                required_permissions = Permission.objects.filter(
-                                    application=app_name, resource_type=resource, verb__in=required_verbs
-                                ).exclude(id=permission.id)
-                                permission.permissions.add(*required_permissions)
-                except Exception as e:
-                    logger.error(
-                        f"Failed to update or create permissions for: " f"{app_name}:{resource} with error: {e}"
-                    )
+                for operation_object in operation_objects:
+                    # There are some old configs, e.g., cost-management still stay in CI
+                    if isinstance(operation_object, str):
+                        definitions[f"{app_name}:{resource}:{operation_object}"] = {}
+                        continue
+                    required_verbs = operation_object.get("requires", [])
+                    definitions[f"{app_name}:{resource}:{operation_object.get('verb')}"] = {
+                        "description": operation_object.get("description", ""),
+                        "requires": [f"{app_name}:{resource}:{verb}" for verb in required_verbs],
+                    }
+    return definitions
+
+
+def _seed_permissions(definitions, tenant):
+    """Create or update the given permissions in bulk and return their ids."""
+    required_names = {name for definition in definitions.values() for name in definition.get("requires", [])}
+    permissions = {
+        permission.permission: permission
+        for permission in Permission.objects.filter(permission__in=set(definitions) | required_names)
+    }
+
+    new_permissions = []
+    updated_permissions = []
+    for name, definition in definitions.items():
+        permission = permissions.get(name)
+        if permission is None:
+            new_permissions.append(_new_permission(name, tenant, description=definition.get("description", "")))
+        elif "description" in definition and permission.description != definition["description"]:
+            permission.description = definition["description"]
+            updated_permissions.append(permission)
+    for permission in Permission.objects.bulk_create(new_permissions):
+        logger.info(f"Created permission {permission.permission}.")
+        permissions[permission.permission] = permission
+    Permission.objects.bulk_update(updated_permissions, ["description"])
+
+    # Required permissions are only ever added, the same as when they were added one permission at a time
+    through = Permission.permissions.through
+    permission_ids = [permissions[name].id for name in definitions]
+    current_links = set(
+        through.objects.filter(from_permission_id__in=permission_ids).values_list(
+            "from_permission_id", "to_permission_id"
+        )
+    )
+    links = {
+        (permissions[name].id, permissions[required_name].id)
+        for name, definition in definitions.items()
+        for required_name in definition.get("requires", [])
+        if required_name in permissions and required_name != name
+    }
+    through.objects.bulk_create(
+        [
+            through(from_permission_id=from_id, to_permission_id=to_id)
+            for from_id, to_id in links
+            if (from_id, to_id) not in current_links
+        ]
+    )
+    return set(permission_ids)
+
+
+def seed_permissions():
+    """Update or create defined permissions."""
+    public_tenant = Tenant.objects.get(tenant_name="public")
+    try:
+        with transaction.atomic():
+            current_permission_ids = _seed_permissions(_load_permission_definitions(), public_tenant)
+    except Exception as e:
+        # Without the seeded permissions, every permission would be eligible for removal
+        logger.error(f"Failed to update or create permissions with error: {e}")
+        return
+
     # Find perms in DB but not in config
     perms_to_delete = Permission.objects.exclude(id__in=current_permission_ids)
     logger.info(
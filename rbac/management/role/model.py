@@ -26,7 +26,7 @@ from django.db.models import signals
 from django.utils import timezone
 from internal.integration import sync_handlers
 from kessel.relations.v1beta1.common_pb2 import Relationship
-from management.cache import AccessCache
+from management.cache import access_cache_invalidation
 from management.models import Permission, Principal
 from management.rbac_fields import AutoDateTimeField
 from migration_tool.models import V2boundresource, V2role, V2rolebinding, role_binding_group_subject_tuple
@@ -208,10 +208,16 @@ def role_related_obj_change_cache_handler(sender=None, instance=None, using=None
         "invalidating associated user cache keys",
         instance,
     )
-    cache = AccessCache(instance.tenant.org_id)
     if instance.role:
-        for principal in Principal.objects.filter(group__policies__roles__pk=instance.role.pk):
-            cache.delete_policy(principal.uuid)
+        with access_cache_invalidation(instance.tenant.org_id) as invalidation:
+            # The members of a role's groups are only resolved once per transaction, however many of its accesses
+            # and resource definitions change.
+            if invalidation.add_role(instance.role.pk):
+                invalidation.add_principals(
+                    Principal.objects.filter(group__policies__roles__pk=instance.role.pk).values_list(
+                        "uuid", flat=True
+                    )
+                )
 
 
 def role_related_obj_change_sync_handler(sender=None, instance=None, using=None, **kwargs):
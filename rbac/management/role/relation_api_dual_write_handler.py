@@ -42,6 +42,11 @@ from api.models import Tenant
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
 
 
+def _relationship_key(relationship: common_pb2.Relationship) -> bytes:
+    """Return a hashable key identifying a relationship."""
+    return relationship.SerializeToString(deterministic=True)
+
+
 class BaseRelationApiDualWriteHandler(ABC):
     """Base class to handle Dual Write API related operations on roles."""
 
@@ -65,28 +70,42 @@ class SeedingRelationApiDualWriteHandler(BaseRelationApiDualWriteHandler):
     """Class to handle Dual Write API related operations specific to the seeding process."""
 
     _replicator: RelationReplicator
-    _current_role_relations: list[common_pb2.Relationship]
+    _current_role_relations: dict[str, list[common_pb2.Relationship]]
 
     _public_tenant: Optional[Tenant] = None
     _platform_default_policy_uuid: Optional[str] = None
     _admin_default_policy_uuid: Optional[str] = None
 
+    def __init__(self, replicator: Optional[RelationReplicator] = None):
+        """Initialize SeedingRelationApiDualWriteHandler."""
+        super().__init__(replicator)
+        self._current_role_relations = {}
+
     def prepare_for_update(self, role: Role):
         """Generate & store role's current relations."""
         if not self.replication_enabled():
             return
-        self._current_role_relations = self._generate_relations_for_role(role)
+        self._current_role_relations[str(role.uuid)] = self._generate_relations_for_role(role)
 
     def replicate_update_system_role(self, role: Role):
-        """Replicate update of system role."""
+        """Replicate update of system role, only the relations which changed are replicated."""
         if not self.replication_enabled():
             return
 
+        current_relations = self._current_role_relations.pop(str(role.uuid), [])
+        relations = self._generate_relations_for_role(role)
+        current_keys = {_relationship_key(relation) for relation in current_relations}
+        keys = {_relationship_key(relation) for relation in relations}
+        remove = [relation for relation in current_relations if _relationship_key(relation) not in keys]
+        add = [relation for relation in relations if _relationship_key(relation) not in current_keys]
+        if not remove and not add:
+            return
+
         self._replicate(
             ReplicationEventType.UPDATE_SYSTEM_ROLE,
             self._create_metadata_from_role(role),
-            self._current_role_relations,
-            self._generate_relations_for_role(role),
+            remove,
+            add,
         )
 
     def replicate_new_system_role(self, role: Role):
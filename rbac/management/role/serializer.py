@@ -16,6 +16,10 @@
 #
 
 """Serializer for role management."""
+from collections import defaultdict
+
+from django.db.models import prefetch_related_objects
+from django.db.models.manager import BaseManager
 from django.utils.translation import gettext as _
 from management.group.model import Group
 from management.serializer_override_mixin import SerializerCreateOverrideMixin
@@ -232,9 +236,22 @@ class DynamicFieldsModelSerializer(SerializerCreateOverrideMixin, serializers.Mo
                 self.fields.pop(field_name)
 
 
+class RoleDynamicListSerializer(serializers.ListSerializer):
+    """List serializer which loads the fields needing other tables for all the roles at once."""
+
+    def to_representation(self, data):
+        """Load the page of roles before serializing each of them."""
+        roles = list(data.all() if isinstance(data, BaseManager) else data)
+        self.child.load_roles(roles)
+        return super().to_representation(roles)
+
+
 class RoleDynamicSerializer(DynamicFieldsModelSerializer):
     """Serializer for the Role model that could dynamically return required field."""
 
+    # The groups of each role by role id, when loaded for a page of roles
+    _groups_in = None
+
     uuid = serializers.UUIDField(read_only=True)
     name = serializers.CharField(required=True, max_length=150)
     display_name = serializers.CharField(required=False, max_length=150, allow_blank=True)
@@ -276,6 +293,19 @@ class RoleDynamicSerializer(DynamicFieldsModelSerializer):
             "external_role_id",
             "external_tenant",
         )
+        list_serializer_class = RoleDynamicListSerializer
+
+    def load_roles(self, roles):
+        """Load the displayed fields which need other tables for the roles in a constant number of queries."""
+        fields = set(self.fields)
+        if "access" in fields:
+            prefetch_related_objects(roles, "access__permission", "access__resourceDefinitions")
+        elif "applications" in fields:
+            prefetch_related_objects(roles, "access__permission")
+        if fields & {"external_role_id", "external_tenant"}:
+            prefetch_related_objects(roles, "ext_relation__ext_tenant")
+        if fields & {"groups_in", "groups_in_count"}:
+            self._groups_in = obtain_groups_in_for_roles(roles, self.context.get("request"))
 
     def get_applications(self, obj):
         """Get the list of applications in the role."""
@@ -283,11 +313,15 @@ class RoleDynamicSerializer(DynamicFieldsModelSerializer):
 
     def get_groups_in_count(self, obj):
         """Get the total count of groups where the role is in."""
+        if self._groups_in is not None:
+            return len(self._groups_in[obj.id])
         request = self.context.get("request")
         return obtain_groups_in(obj, request).count()
 
     def get_groups_in(self, obj):
         """Get the groups where the role is in."""
+        if self._groups_in is not None:
+            return self._groups_in[obj.id]
         request = self.context.get("request")
         return obtain_groups_in(obj, request).values("name", "uuid", "description")
 
@@ -360,6 +394,57 @@ def obtain_groups_in(obj, request):
     return qs.distinct()
 
 
+def obtain_groups_in_for_roles(roles, request):
+    """Get the groups each of the roles is in by role id, the same as obtain_groups_in but in one pass."""
+    scope_param = validate_and_get_key(request.query_params, SCOPE_KEY, VALID_SCOPES, ORG_ID_SCOPE)
+    username_param = request.query_params.get("username")
+
+    principal_group_ids = None
+    if scope_param == PRINCIPAL_SCOPE or username_param:
+        principal = get_principal(username_param or request.user.username, request)
+        principal_group_ids = set(Group.objects.filter(principals=principal).values_list("id", flat=True))
+
+    if username_param and scope_param != PRINCIPAL_SCOPE:
+        is_org_admin = request.user_from_query.admin
+    else:
+        is_org_admin = request.user.admin
+    default_flags = ["platform_default", "admin_default"] if is_org_admin else ["platform_default"]
+
+    public_tenant = Tenant.objects.get(tenant_name="public")
+    rows = (
+        Group.objects.filter(policies__roles__in=roles, tenant__in=[request.tenant, public_tenant])
+        .order_by()
+        .values("policies__roles", "id", "name", "uuid", "description", "modified", "tenant_id", *default_flags)
+    )
+    groups_by_role = defaultdict(dict)
+    for row in rows:
+        groups_by_role[row["policies__roles"]][row["id"]] = row
+
+    groups_in = {}
+    for role in roles:
+        groups = groups_by_role[role.id].values()
+        tenant_groups = [group for group in groups if group["tenant_id"] == request.tenant.id]
+        public_groups = [group for group in groups if group["tenant_id"] == public_tenant.id]
+
+        selected = {
+            group["id"]: group
+            for group in tenant_groups
+            if principal_group_ids is None or group["id"] in principal_group_ids
+        }
+        for flag in default_flags:
+            # The tenant's own default group takes the place of the public one
+            default_groups = [group for group in tenant_groups if group[flag]] or [
+                group for group in public_groups if group[flag]
+            ]
+            selected.update((group["id"], group) for group in default_groups)
+
+        groups_in[role.id] = [
+            {"name": group["name"], "uuid": group["uuid"], "description": group["description"]}
+            for group in sorted(selected.values(), key=lambda group: (group["name"], group["modified"]))
+        ]
+    return groups_in
+
+
 def create_access_for_role(role, access_list, tenant):
     """Create access objects and relate it to role."""
     for access_item in access_list:
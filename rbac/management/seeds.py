@@ -29,6 +29,9 @@ def on_complete(progress, tenant):
     logger.info(f"Purging policy cache for tenant {tenant.org_id} [{progress}].")
     cache = AccessCache(tenant.org_id)
     cache.delete_all_policies_for_tenant()
+    from management.access.model import invalidate_effective_access_for_tenant
+
+    invalidate_effective_access_for_tenant(tenant)
     connections.close_all()
     logger.info(f"Finished purging policy cache for tenant {tenant.org_id} [{progress}].")
 
@@ -20,6 +20,7 @@ from __future__ import absolute_import, unicode_literals
 from celery import shared_task
 from django.core.management import call_command
 from management.health.healthcheck import redis_health
+from management.notifications.notification_handlers import fan_out_notifications
 from management.principal.cleaner import (
     clean_tenants_principals,
     process_principal_events_from_umb,
@@ -39,6 +40,12 @@ def principal_cleanup_via_umb():
     process_principal_events_from_umb()
 
 
+@shared_task
+def fan_out_notifications_in_worker(event_type, payload):
+    """Celery task to send a notification to all tenants."""
+    fan_out_notifications(event_type, payload)
+
+
 @shared_task
 def run_migrations_in_worker():
     """Celery task to run migrations."""
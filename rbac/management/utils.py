@@ -21,6 +21,7 @@ import uuid
 from uuid import UUID
 
 from django.core.exceptions import PermissionDenied
+from django.db.models import Exists, Q
 from django.utils.translation import gettext as _
 from management.models import Access, Group, Policy, Principal, Role
 from management.permissions.principal_access import PrincipalAccessPermission
@@ -124,7 +125,7 @@ def verify_principal_with_proxy(username, request, verify_principal=True):
     org_id = request.user.org_id
     proxy = PrincipalProxy()
     if verify_principal:
-        resp = proxy.request_filtered_principals([username], org_id=org_id, options=request.query_params)
+        resp = proxy.request_principal(username, org_id=org_id, options=request.query_params)
 
         if isinstance(resp, dict) and "errors" in resp:
             raise Exception("Dependency error: request to get users from dependent service failed.")
@@ -139,58 +140,49 @@ def verify_principal_with_proxy(username, request, verify_principal=True):
 
 def policies_for_groups(groups):
     """Gathers all policies for the given groups."""
-    policies = Policy.objects.filter(group__in=set(groups))
-    return set(policies)
+    return Policy.objects.filter(group__in=groups)
 
 
 def roles_for_policies(policies):
     """Gathers all roles for the given policies."""
-    roles = Role.objects.filter(policies__in=set(policies))
-    return set(roles)
+    role_ids = Policy.roles.through.objects.filter(policy__in=policies).values("role_id")
+    return Role.objects.filter(id__in=role_ids)
 
 
 def access_for_roles(roles, param_applications):
     """Gathers all access for the given roles and application(s)."""
+    access = Access.objects.filter(role__in=roles)
     if param_applications:
         param_applications_list = param_applications.split(",")
-        access = Access.objects.filter(role__in=roles).filter(permission__application__in=param_applications_list)
-    else:
-        access = Access.objects.filter(role__in=roles)
-    return set(access)
+        access = access.filter(permission__application__in=param_applications_list)
+    return access
+
+
+def _default_groups_filter(tenant, **default_flag):
+    """Filter default groups of the tenant, falling back to the public tenant's when there are no custom ones."""
+    custom_default_groups = Group.objects.filter(tenant=tenant, **default_flag)
+    return Q(**default_flag) & (Q(tenant=tenant) | (Q(tenant__tenant_name="public") & ~Exists(custom_default_groups)))
 
 
 def groups_for_principal(principal: Principal, tenant, **kwargs):
-    """Gathers all groups for a principal, including the default."""
+    """Gathers all groups for a principal, including the default.
+
+    The result is a lazy queryset, so the policy, role and access helpers below resolve the whole chain in a single
+    query with nested subqueries instead of sending lists of ids back to the database.
+    """
     if principal.cross_account:
-        return set()
-    assigned_group_set = principal.group.all()
-    public_tenant = Tenant.objects.get(tenant_name="public")
+        return Group.objects.none()
+    assigned_group_ids = Group.principals.through.objects.filter(principal=principal).values("group_id")
+    groups_filter = Q(id__in=assigned_group_ids)
 
     # Only user principals should be able to get permissions from the default groups. For service accounts, customers
     # need to explicitly add the service accounts to a group.
     if principal.type == "user":
-        admin_default_group_set = Group.admin_default_set().filter(tenant=tenant) or Group.admin_default_set().filter(
-            tenant=public_tenant
-        )
-        platform_default_group_set = Group.platform_default_set().filter(
-            tenant=tenant
-        ) or Group.platform_default_set().filter(tenant=public_tenant)
-    else:
-        admin_default_group_set = Group.objects.none()
-        platform_default_group_set = Group.objects.none()
-
-    prefetch_lookups = kwargs.get("prefetch_lookups_for_groups")
-
-    if prefetch_lookups:
-        assigned_group_set = assigned_group_set.prefetch_related(prefetch_lookups)
+        groups_filter |= _default_groups_filter(tenant, platform_default=True)
+        if kwargs.get("is_org_admin"):
+            groups_filter |= _default_groups_filter(tenant, admin_default=True)
 
-        if principal.type == "user":
-            platform_default_group_set = platform_default_group_set.prefetch_related(prefetch_lookups)
-
-    if kwargs.get("is_org_admin"):
-        return set(assigned_group_set | platform_default_group_set | admin_default_group_set)
-
-    return set(assigned_group_set | platform_default_group_set)
+    return Group.objects.filter(groups_filter)
 
 
 def policies_for_principal(principal, tenant, **kwargs):
@@ -215,17 +207,6 @@ def access_for_principal(principal, tenant, **kwargs):
     return access
 
 
-def queryset_by_id(objects, clazz, **kwargs):
-    """Return a queryset of from the class ordered by id."""
-    wanted_ids = [obj.id for obj in objects]
-    prefetch_lookups = kwargs.get("prefetch_lookups_for_ids")
-    query = clazz.objects.filter(id__in=wanted_ids).order_by("id")
-    if prefetch_lookups:
-        query = query.prefetch_related(prefetch_lookups)
-
-    return query
-
-
 def filter_queryset_by_tenant(queryset, tenant):
     """Limit queryset by appropriate tenant when serving from public schema."""
     return queryset.filter(tenant=tenant)
@@ -294,14 +275,10 @@ def roles_for_cross_account_principal(principal):
     """Return roles for cross account principals."""
     _, user_id = principal.username.split("-")
     target_org = principal.tenant.org_id
-    role_names = (
-        CrossAccountRequest.objects.filter(target_org=target_org, user_id=user_id, status="approved")
-        .values_list("roles__name", flat=True)
-        .distinct()
-    )
-
-    role_names_list = list(role_names)
-    return Role.objects.filter(name__in=role_names_list)
+    role_names = CrossAccountRequest.objects.filter(
+        target_org=target_org, user_id=user_id, status="approved"
+    ).values_list("roles__name", flat=True)
+    return Role.objects.filter(name__in=role_names)
 
 
 def clear_pk(entry):
@@ -8,7 +8,7 @@ from kessel.relations.v1beta1.common_pb2 import Relationship
 from management.relation_replicator.relation_replicator import RelationReplicator
 
 
-_OBJECT_ID_REGEX = r"^(([a-zA-Z0-9/_|\-=+]{1,})|\*)$"
+_OBJECT_ID_REGEX = re.compile(r"^(([a-zA-Z0-9/_|\-=+]{1,})|\*)$")
 
 
 class RelationTuple(NamedTuple):
@@ -33,13 +33,35 @@ class RelationTuple(NamedTuple):
 
 T = TypeVar("T", bound=Hashable)
 
+# Secondary indexes of the store, and the key of a tuple in each of them.
+_INDEXES: dict[str, Callable[[RelationTuple], Hashable]] = {
+    "resource": lambda rel: (rel.resource_type_namespace, rel.resource_type_name, rel.resource_id),
+    "subject": lambda rel: (rel.subject_type_namespace, rel.subject_type_name, rel.subject_id),
+    "relation": lambda rel: rel.relation,
+}
+
 
 class InMemoryTuples:
     """In-memory store for relation tuples."""
 
     def __init__(self, tuples=None):
         """Initialize the store."""
-        self._tuples: Set[RelationTuple] = set(tuples) if tuples is not None else set()
+        self._tuples: Set[RelationTuple] = set()
+        self._indexes: dict[str, dict[Hashable, Set[RelationTuple]]] = {name: defaultdict(set) for name in _INDEXES}
+        for rel in tuples or ():
+            self._add(rel)
+
+    def _add(self, key: RelationTuple):
+        self._tuples.add(key)
+        for name, index_key in _INDEXES.items():
+            self._indexes[name][index_key(key)].add(key)
+
+    def _candidates(self, predicate: Callable[[RelationTuple], bool]) -> Set[RelationTuple]:
+        """Return the smallest indexed set of tuples which contains all the tuples matching the predicate."""
+        lookups = getattr(predicate, "index_lookups", ())
+        if not lookups:
+            return self._tuples
+        return min((self._indexes[name].get(key, set()) for name, key in lookups), key=len)
 
     def _relationship_key(self, relationship: Relationship):
         return RelationTuple(
@@ -56,9 +78,11 @@ class InMemoryTuples:
     def add(self, tuple: Relationship):
         """Add a tuple to the store."""
         key = self._relationship_key(tuple)
+        if key in self._tuples:
+            return
 
-        invalid_resource_id = not re.match(_OBJECT_ID_REGEX, key.resource_id)
-        invalid_subject_id = not re.match(_OBJECT_ID_REGEX, key.subject_id)
+        invalid_resource_id = not _OBJECT_ID_REGEX.match(key.resource_id)
+        invalid_subject_id = not _OBJECT_ID_REGEX.match(key.subject_id)
 
         if invalid_resource_id or invalid_subject_id:
             invalid_fields = []
@@ -68,12 +92,19 @@ class InMemoryTuples:
                 invalid_fields.append(f"subject_id: {key.subject_id}")
             raise ValueError(f"Invalid format for: {', '.join(invalid_fields)}.")
 
-        self._tuples.add(key)
+        self._add(key)
 
     def remove(self, tuple: Relationship):
         """Remove a tuple from the store."""
         key = self._relationship_key(tuple)
-        self._tuples.discard(key)
+        if key not in self._tuples:
+            return
+        self._tuples.remove(key)
+        for name, index_key in _INDEXES.items():
+            bucket = self._indexes[name][index_key(key)]
+            bucket.discard(key)
+            if not bucket:
+                del self._indexes[name][index_key(key)]
 
     def write(self, add: Iterable[Relationship], remove: Iterable[Relationship]):
         """Add / remove tuples."""
@@ -85,21 +116,23 @@ class InMemoryTuples:
     def clear(self):
         """Clear all tuples from the store."""
         self._tuples.clear()
+        for index in self._indexes.values():
+            index.clear()
 
     def count_tuples(self, predicate: Callable[[RelationTuple], bool] = lambda _: True) -> int:
         """Count tuples matching the given predicate."""
         return len(self.find_tuples(predicate))
 
     def find_tuples(self, predicate: Callable[[RelationTuple], bool] = lambda _: True) -> List[RelationTuple]:
-        """Find tuples matching the given predicate."""
-        return [rel for rel in self._tuples if predicate(rel)]
+        """Find tuples matching the given predicate, using the indexes for resource, subject and relation predicates."""
+        return [rel for rel in self._candidates(predicate) if predicate(rel)]
 
     def find_tuples_grouped(
         self, predicate: Callable[[RelationTuple], bool], group_by: Callable[[RelationTuple], T]
     ) -> dict[T, List[RelationTuple]]:
         """Filter tuples and group them by a key."""
         grouped_tuples: dict[T, List[RelationTuple]] = defaultdict(list)
-        for rel in self._tuples:
+        for rel in self._candidates(predicate):
             if predicate(rel):
                 key = group_by(rel)
                 grouped_tuples[key].append(rel)
@@ -203,12 +236,17 @@ class InMemoryTuples:
 
 
 class TuplePredicate:
-    """A predicate that can be used to filter relation tuples."""
+    """A predicate that can be used to filter relation tuples.
+
+    `index_lookups` lists (index, key) pairs of the store's secondary indexes. Every tuple matching the predicate is
+    in each of the looked up index entries, so the store only needs to test the tuples of the smallest one.
+    """
 
-    def __init__(self, func, repr):
+    def __init__(self, func, repr, index_lookups=()):
         """Initialize the predicate."""
         self.func = func
         self.repr = repr
+        self.index_lookups = tuple(index_lookups)
 
     def __call__(self, *args, **kwargs):
         """Call the predicate."""
@@ -225,7 +263,8 @@ def all_of(*predicates: Callable[[RelationTuple], bool]) -> Callable[[RelationTu
     def predicate(rel: RelationTuple) -> bool:
         return all(p(rel) for p in predicates)
 
-    return TuplePredicate(predicate, f"all_of({', '.join([str(p) for p in predicates])})")
+    index_lookups = [lookup for p in predicates for lookup in getattr(p, "index_lookups", ())]
+    return TuplePredicate(predicate, f"all_of({', '.join([str(p) for p in predicates])})", index_lookups)
 
 
 def one_of(*predicates: Callable[[RelationTuple], bool]) -> Callable[[RelationTuple], bool]:
@@ -259,7 +298,9 @@ def resource_id(id: str) -> Callable[[RelationTuple], bool]:
 
 def resource(namespace: str, name: str, id: object) -> Callable[[RelationTuple], bool]:
     """Return a predicate that is true if the resource matches the given namespace and name."""
-    return all_of(resource_type(namespace, name), resource_id(str(id)))
+    predicate = all_of(resource_type(namespace, name), resource_id(str(id)))
+    predicate.index_lookups = (("resource", (namespace, name, str(id))),)
+    return predicate
 
 
 def relation(relation: str) -> Callable[[RelationTuple], bool]:
@@ -268,7 +309,7 @@ def relation(relation: str) -> Callable[[RelationTuple], bool]:
     def predicate(rel: RelationTuple) -> bool:
         return rel.relation == relation
 
-    return TuplePredicate(predicate, f'relation("{relation}")')
+    return TuplePredicate(predicate, f'relation("{relation}")', [("relation", relation)])
 
 
 def subject_type(namespace: str, name: str, relation: str = "") -> Callable[[RelationTuple], bool]:
@@ -295,7 +336,9 @@ def subject_id(id: str) -> Callable[[RelationTuple], bool]:
 
 def subject(namespace: str, name: str, id: object, relation: str = "") -> Callable[[RelationTuple], bool]:
     """Return a predicate that is true if the subject matches the given namespace and name."""
-    return all_of(subject_type(namespace, name, relation), subject_id(str(id)))
+    predicate = all_of(subject_type(namespace, name, relation), subject_id(str(id)))
+    predicate.index_lookups = (("subject", (namespace, name, str(id))),)
+    return predicate
 
 
 class InMemoryRelationReplicator(RelationReplicator):
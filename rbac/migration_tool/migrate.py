@@ -15,14 +15,21 @@ You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import contextlib
+import itertools
 import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
 from typing import Iterable
 
+from django.db import connections, transaction
+from django.utils import timezone
 from kessel.relations.v1beta1 import common_pb2
-from management.models import Workspace
+from management.models import TenantMigrationCheckpoint, Workspace
 from management.principal.model import Principal
 from management.relation_replicator.logging_replicator import LoggingReplicator
-from management.relation_replicator.outbox_replicator import OutboxReplicator
+from management.relation_replicator.outbox_replicator import BufferedOutboxReplicator
 from management.relation_replicator.relation_replicator import (
     RelationReplicator,
     ReplicationEvent,
@@ -152,26 +159,103 @@ def migrate_data_for_tenant(tenant: Tenant, exclude_apps: list, replicator: Rela
     logger.info(f"Migrated {roles.count()} roles for tenant: {tenant.org_id}")
 
 
-def migrate_data(exclude_apps: list = [], orgs: list = [], write_relationships: str = "False"):
-    """Migrate all data for all tenants."""
-    count = 0
+def migrate_data(
+    exclude_apps: list = [],
+    orgs: list = [],
+    write_relationships: str = "False",
+    workers: int = 1,
+    resume: bool = False,
+):
+    """Migrate all data for all tenants.
+
+    Tenants are sharded across `workers` processes, each with its own database connection and replicator. The outcome
+    of every tenant is checkpointed, so a failed tenant does not stop the others and, with `resume`, a rerun skips the
+    tenants a previous run completed.
+    """
     tenants = Tenant.objects.exclude(tenant_name="public")
-    replicator = _get_replicator(write_relationships)
     if orgs:
         tenants = tenants.filter(org_id__in=orgs)
-    total = tenants.count()
-    for tenant in tenants.iterator():
-        logger.info(f"Migrating data for tenant: {tenant.org_id}")
-        try:
-            migrate_data_for_tenant(tenant, exclude_apps, replicator)
-        except Exception as e:
-            logger.error(f"Failed to migrate data for tenant: {tenant.org_id}. Error: {e}")
-            raise e
-        count += 1
-        logger.info(f"Finished migrating data for tenant: {tenant.org_id}. {count} of {total} tenants completed")
+    if resume:
+        tenants = tenants.exclude(migration_checkpoint__status=TenantMigrationCheckpoint.Status.COMPLETED)
+    tenant_ids = list(tenants.order_by("id").values_list("id", flat=True))
+    total = len(tenant_ids)
+
+    if workers > 1 and multiprocessing.current_process().daemon:
+        logger.warning("Worker processes cannot be started from a daemon process, migrating tenants sequentially.")
+        workers = 1
+
+    if workers > 1:
+        # The forked workers must open their own database connections rather than share the inherited ones.
+        connections.close_all()
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(write_relationships,),
+        )
+        results = pool.map(_migrate_tenant_in_worker, tenant_ids, itertools.repeat(exclude_apps))
+    else:
+        pool = contextlib.nullcontext()
+        replicator = _get_replicator(write_relationships)
+        results = (_migrate_tenant(tenant_id, exclude_apps, replicator) for tenant_id in tenant_ids)
+
+    count = failed = 0
+    start = time.monotonic()
+    with pool:
+        for org_id, succeeded in results:
+            count += 1
+            failed += not succeeded
+            rate = count / max(time.monotonic() - start, 1e-6)
+            logger.info(
+                f"Finished migrating data for tenant: {org_id}. {count} of {total} tenants completed "
+                f"({rate:.2f} tenants/s, ETA {(total - count) / rate:.0f}s)"
+            )
+    if failed:
+        logger.error(f"Failed to migrate data for {failed} of {total} tenants. Rerun with resume to retry them.")
     logger.info("Finished migrating data for all tenants")
 
 
+def _migrate_tenant(tenant_id: int, exclude_apps: list, replicator: RelationReplicator) -> tuple[str, bool]:
+    """Migrate a tenant in its own transaction, checkpointing the outcome."""
+    tenant = Tenant.objects.get(id=tenant_id)
+    checkpoint, _ = TenantMigrationCheckpoint.objects.get_or_create(tenant=tenant)
+    checkpoint.status = TenantMigrationCheckpoint.Status.RUNNING
+    checkpoint.attempts += 1
+    checkpoint.started = timezone.now()
+    checkpoint.completed = None
+    checkpoint.error = None
+    checkpoint.save()
+
+    logger.info(f"Migrating data for tenant: {tenant.org_id}")
+    try:
+        with _tenant_transaction(replicator):
+            migrate_data_for_tenant(tenant, exclude_apps, replicator)
+    except Exception as e:
+        logger.exception(f"Failed to migrate data for tenant: {tenant.org_id}. Error: {e}")
+        checkpoint.status = TenantMigrationCheckpoint.Status.FAILED
+        checkpoint.error = str(e)
+        checkpoint.save()
+        return tenant.org_id, False
+
+    checkpoint.status = TenantMigrationCheckpoint.Status.COMPLETED
+    checkpoint.completed = timezone.now()
+    checkpoint.save()
+    return tenant.org_id, True
+
+
+_worker_replicator = None
+
+
+def _init_worker(write_relationships: str):
+    """Create the replicator of a worker process."""
+    global _worker_replicator
+    _worker_replicator = _get_replicator(write_relationships)
+
+
+def _migrate_tenant_in_worker(tenant_id: int, exclude_apps: list) -> tuple[str, bool]:
+    return _migrate_tenant(tenant_id, exclude_apps, _worker_replicator)
+
+
 def _get_replicator(write_relationships: str) -> RelationReplicator:
     option = write_relationships.lower()
 
@@ -179,6 +263,13 @@ def _get_replicator(write_relationships: str) -> RelationReplicator:
         return RelationsApiReplicator()
 
     if option == "outbox":
-        return OutboxReplicator()
+        return BufferedOutboxReplicator()
 
     return LoggingReplicator()
+
+
+def _tenant_transaction(replicator: RelationReplicator):
+    """Run the migration of a tenant in a transaction, batching its outbox writes into it if replicating via outbox."""
+    if isinstance(replicator, BufferedOutboxReplicator):
+        return replicator.atomic()
+    return transaction.atomic()
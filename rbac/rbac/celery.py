@@ -21,6 +21,7 @@ import os
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_shutdown, worker_shutdown
 from django.conf import settings
 
 # set the default Django settings module for the 'celery' program.
@@ -61,5 +62,18 @@ else:
         "args": [],
     }
 
+
+@worker_shutdown.connect
+@worker_process_shutdown.connect
+def flush_kafka_producers(**kwargs):
+    """Send the buffered kafka messages before the worker exits.
+
+    Prefork worker processes exit without running the atexit handlers, so the producers are flushed here.
+    """
+    from core.kafka import flush_producers
+
+    flush_producers(settings.KAFKA_PRODUCER_SHUTDOWN_TIMEOUT)
+
+
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
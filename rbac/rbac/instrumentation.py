@@ -0,0 +1,86 @@
+#
+# Copyright 2024 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Per request counters of the database, Redis and external service work."""
+import contextlib
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+_current_stats: ContextVar[Optional["RequestStats"]] = ContextVar("rbac_request_stats", default=None)
+
+
+@dataclass
+class RequestStats:
+    """Work done while handling a request."""
+
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    redis_calls: int = 0
+    external_seconds: dict = field(default_factory=lambda: defaultdict(float))
+    slowest_sql: Optional[str] = None
+    slowest_sql_seconds: float = 0.0
+
+    def db_execute_wrapper(self, execute, sql, params, many, context):
+        """Time a query, to be installed with connection.execute_wrapper."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.db_queries += 1
+            self.db_seconds += elapsed
+            if elapsed > self.slowest_sql_seconds:
+                self.slowest_sql = sql
+                self.slowest_sql_seconds = elapsed
+
+
+@contextlib.contextmanager
+def collect_request_stats():
+    """Collect the stats of the work done in the block, yielding the RequestStats."""
+    stats = RequestStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def record_redis_call():
+    """Count a Redis round trip for the current request, if any."""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.redis_calls += 1
+
+
+@contextlib.contextmanager
+def track_external_call(service):
+    """Add the time spent in the block to the current request's calls to the given service.
+
+    Can also be used as a decorator. Work done in other threads is not collected, so it should wrap the call made
+    from the request thread.
+    """
+    stats = _current_stats.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.external_seconds[service] += time.perf_counter() - start
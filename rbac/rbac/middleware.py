@@ -19,21 +19,24 @@
 import binascii
 import json
 import logging
+import time
+from contextlib import ExitStack
 from json.decoder import JSONDecodeError
 
 from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
 from django.core.handlers.wsgi import WSGIRequest
-from django.db import IntegrityError
+from django.db import IntegrityError, connections
 from django.http import Http404, HttpResponse, QueryDict
 from django.urls import resolve
 from django.utils.deprecation import MiddlewareMixin
-from management.cache import TenantCache
+from management.cache import AccessCache, TenantCache
 from management.models import Principal
 from management.relation_replicator.outbox_replicator import OutboxReplicator
 from management.tenant_service import get_tenant_bootstrap_service
 from management.tenant_service.tenant_service import TenantBootstrapService
 from management.utils import APPLICATION_KEY, access_for_principal, validate_psk
-from prometheus_client import Counter
+from prometheus_client import Counter, Histogram
 from rest_framework import status
 
 from api.common import (
@@ -46,6 +49,7 @@ from api.common import (
 )
 from api.models import Tenant, User
 from api.serializers import extract_header
+from rbac.instrumentation import collect_request_stats
 
 
 logger = logging.getLogger(__name__)  # pylint: disable=invalid-name
@@ -54,6 +58,28 @@ req_sys_counter = Counter(
     "Tracks a count of requests to RBAC tracking those made on behalf of the system or a principal.",
     ["behalf", "method", "view", "status"],
 )
+req_db_queries = Histogram(
+    "rbac_request_db_queries",
+    "Number of database queries made while handling a request.",
+    ["behalf", "method", "view", "status"],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float("inf")),
+)
+req_db_seconds = Histogram(
+    "rbac_request_db_seconds",
+    "Time spent in database queries while handling a request.",
+    ["behalf", "method", "view", "status"],
+)
+req_redis_calls = Histogram(
+    "rbac_request_redis_calls",
+    "Number of Redis round trips made while handling a request.",
+    ["behalf", "method", "view", "status"],
+    buckets=(0, 1, 2, 5, 10, 20, 50, float("inf")),
+)
+req_external_seconds = Histogram(
+    "rbac_request_external_seconds",
+    "Time spent calling an external service (BOP, IT) while handling a request.",
+    ["behalf", "method", "view", "status", "service"],
+)
 TENANTS = TenantCache()
 
 
@@ -133,15 +159,12 @@ class IdentityHeaderMiddleware(MiddlewareMixin):
             TENANTS.save_tenant(tenant)
         return tenant
 
-    @staticmethod  # noqa: C901
-    def _get_access_for_user(username, tenant):  # pylint: disable=too-many-locals,too-many-branches
+    @staticmethod
+    def _get_access_for_user(username, tenant):
         """Obtain access data for given username.
 
         Stubbed out to begin removal of RBAC on RBAC, with minimal disruption
         """
-        principal = None
-        access_list = None
-
         access = {
             "group": {"read": [], "write": []},
             "role": {"read": [], "write": []},
@@ -150,41 +173,29 @@ class IdentityHeaderMiddleware(MiddlewareMixin):
             "permission": {"read": [], "write": []},
         }
 
-        try:  # pylint: disable=R1702
+        try:
             principal = Principal.objects.get(username__iexact=username, tenant=tenant)
-            kwargs = {APPLICATION_KEY: "rbac"}
-            access_list = access_for_principal(principal, tenant, **kwargs)
-            for access_item in access_list:  # pylint: disable=too-many-nested-blocks
-                resource_type = access_item.permission.resource_type
-                operation = access_item.permission.verb
-                if operation == "*":
-                    operation = "write"
-                res_list = ["*"]
-                if resource_type == "*":
-                    for resource in ("group", "role", "policy", "principal", "permission"):
-                        if (
-                            resource in access.keys()
-                            and operation in access.get(resource, {}).keys()  # noqa: W504
-                            and isinstance(access.get(resource, {}).get(operation), list)  # noqa: W504
-                        ):  # noqa: E127
-                            access[resource][operation] += res_list
-                            if operation == "write":
-                                access[resource]["read"] += res_list
-                elif (
-                    resource_type in access.keys()
-                    and operation in access.get(resource_type, {}).keys()  # noqa: W504
-                    and isinstance(access.get(resource_type, {}).get(operation), list)  # noqa: W504
-                ):
-                    access[resource_type][operation] += res_list
-                    if operation == "write":
-                        access[resource_type]["read"] += res_list
-                for res_type, res_ops_obj in access.items():
-                    for op_type, op_list in res_ops_obj.items():
-                        if "*" in op_list:
-                            access[res_type][op_type] = ["*"]
         except Principal.DoesNotExist:
             return access
 
+        # The map is invalidated together with the principal's cached access policies.
+        cache = AccessCache(tenant.org_id)
+        cached_access = cache.get_user_access(principal.uuid)
+        if cached_access is not None:
+            return cached_access
+
+        kwargs = {APPLICATION_KEY: "rbac"}
+        access_list = access_for_principal(principal, tenant, **kwargs).values_list(
+            "permission__resource_type", "permission__verb"
+        )
+        for resource_type, verb in access_list:
+            operations = ("write", "read") if verb in ("*", "write") else (verb,)
+            for resource in access if resource_type == "*" else (resource_type,):
+                for operation in operations:
+                    if operation in access.get(resource, {}):
+                        access[resource][operation] = ["*"]
+
+        cache.save_user_access(principal.uuid, access)
         return access
 
     @catch_integrity_error
@@ -472,3 +483,67 @@ class ReadOnlyApiMiddleware(MiddlewareMixin):  # pylint: disable=too-few-public-
         """Process request ReadOnlyApiMiddleware."""
         if self._should_deny_all_writes(request) or self._should_deny_v2_writes(request):
             return self._read_only_response()
+
+
+class RequestInstrumentationMiddleware:  # pylint: disable=too-few-public-methods
+    """Middleware recording the database, Redis and external service work of each request per view.
+
+    Queries are counted with a database execute wrapper, so DEBUG cursors are not needed. Requests going over the
+    configured query or duration budgets are logged with their slowest query.
+    """
+
+    def __init__(self, get_response):
+        """Initialize the middleware, unless the instrumentation is disabled."""
+        if not settings.REQUEST_INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        """Handle the request while collecting its stats."""
+        start = time.perf_counter()
+        with collect_request_stats() as stats, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats.db_execute_wrapper))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        user = getattr(request, "user", None)
+        resolver_match = getattr(request, "resolver_match", None)
+        labels = {
+            "behalf": "system" if getattr(user, "system", False) else "principal",
+            "method": request.method,
+            "view": resolver_match.url_name if resolver_match else None,
+            "status": response.status_code,
+        }
+        req_db_queries.labels(**labels).observe(stats.db_queries)
+        req_db_seconds.labels(**labels).observe(stats.db_seconds)
+        req_redis_calls.labels(**labels).observe(stats.redis_calls)
+        for service, seconds in stats.external_seconds.items():
+            req_external_seconds.labels(service=service, **labels).observe(seconds)
+
+        self.log_over_budget(request, labels["view"], stats, duration)
+        return response
+
+    @staticmethod
+    def log_over_budget(request, view, stats, duration):
+        """Log the request if it went over the query count or duration budget."""
+        query_budget = settings.REQUEST_QUERY_BUDGET
+        duration_budget = settings.REQUEST_DURATION_BUDGET_MS
+        over_queries = query_budget and stats.db_queries > query_budget
+        over_duration = duration_budget and duration * 1000 > duration_budget
+        if not (over_queries or over_duration):
+            return
+        logger.warning(
+            "Request over budget: %s %s (view %s) took %.1fms with %s queries in %.1fms, %s Redis calls and "
+            "external calls %s. Slowest query (%.1fms): %s",
+            request.method,
+            request.path,
+            view,
+            duration * 1000,
+            stats.db_queries,
+            stats.db_seconds * 1000,
+            stats.redis_calls,
+            {service: round(seconds * 1000, 1) for service, seconds in stats.external_seconds.items()},
+            stats.slowest_sql_seconds * 1000,
+            (stats.slowest_sql or "")[: settings.REQUEST_BUDGET_SQL_MAX_LENGTH],
+        )
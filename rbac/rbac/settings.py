@@ -120,6 +120,7 @@ SHARED_APPS = (
 
 MIDDLEWARE = [
     "django_prometheus.middleware.PrometheusBeforeMiddleware",
+    "rbac.middleware.RequestInstrumentationMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "rbac.middleware.DisableCSRF",
     "django.middleware.security.SecurityMiddleware",
@@ -134,7 +135,10 @@ MIDDLEWARE = [
 
 DEVELOPMENT = ENVIRONMENT.bool("DEVELOPMENT", default=False)
 if DEVELOPMENT:
-    MIDDLEWARE.insert(5, "rbac.dev_middleware.DevelopmentIdentityHeaderMiddleware")
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("rbac.middleware.IdentityHeaderMiddleware"),
+        "rbac.dev_middleware.DevelopmentIdentityHeaderMiddleware",
+    )
 # Don't try to go verify Principals against the BOP user service
 BYPASS_BOP_VERIFICATION = ENVIRONMENT.bool("BYPASS_BOP_VERIFICATION", default=False)
 
@@ -323,10 +327,34 @@ ACCESS_CACHE_DB = 1
 ACCESS_CACHE_LIFETIME = 10 * 60
 ACCESS_CACHE_ENABLED = ENVIRONMENT.bool("ACCESS_CACHE_ENABLED", default=True)
 ACCESS_CACHE_CONNECT_SIGNALS = ENVIRONMENT.bool("ACCESS_CACHE_CONNECT_SIGNALS", default=True)
+# Principals invalidated by one transaction above which the whole tenant's access cache is invalidated instead
+ACCESS_CACHE_INVALIDATION_TENANT_THRESHOLD = ENVIRONMENT.int(
+    "ACCESS_CACHE_INVALIDATION_TENANT_THRESHOLD", default=1000
+)
+# Serve /access/ from the materialized per-principal effective access table
+EFFECTIVE_ACCESS_TABLE_ENABLED = ENVIRONMENT.bool("EFFECTIVE_ACCESS_TABLE_ENABLED", default=False)
 
 REDIS_MAX_CONNECTIONS = ENVIRONMENT.get_value("REDIS_MAX_CONNECTIONS", default=10)
 REDIS_SOCKET_CONNECT_TIMEOUT = ENVIRONMENT.get_value("REDIS_SOCKET_CONNECT_TIMEOUT", default=0.1)
 REDIS_SOCKET_TIMEOUT = ENVIRONMENT.get_value("REDIS_SOCKET_TIMEOUT", default=0.1)
+# Consecutive Redis failures before skipping the cache, and how long to skip it before trying it again
+REDIS_CIRCUIT_BREAKER_FAILURE_THRESHOLD = ENVIRONMENT.int("REDIS_CIRCUIT_BREAKER_FAILURE_THRESHOLD", default=3)
+REDIS_CIRCUIT_BREAKER_OPEN_SECONDS = ENVIRONMENT.int("REDIS_CIRCUIT_BREAKER_OPEN_SECONDS", default=30)
+REDIS_CIRCUIT_BREAKER_HALF_OPEN_SECONDS = ENVIRONMENT.int("REDIS_CIRCUIT_BREAKER_HALF_OPEN_SECONDS", default=5)
+# In-process cache of tenants in front of Redis; a size of 0 disables it
+TENANT_LOCAL_CACHE_SIZE = ENVIRONMENT.int("TENANT_LOCAL_CACHE_SIZE", default=1000)
+TENANT_LOCAL_CACHE_TTL = ENVIRONMENT.int("TENANT_LOCAL_CACHE_TTL", default=60)
+# Seconds the BOP lookups of single principals are cached in Redis and in each process, 0 disables the cache
+PRINCIPAL_CACHE_TTL = ENVIRONMENT.int("PRINCIPAL_CACHE_TTL", default=0)
+PRINCIPAL_LOCAL_CACHE_SIZE = ENVIRONMENT.int("PRINCIPAL_LOCAL_CACHE_SIZE", default=1000)
+# Connections kept alive to BOP by each process
+BOP_CONNECTION_POOL_SIZE = ENVIRONMENT.int("BOP_CONNECTION_POOL_SIZE", default=10)
+# Per view histograms of the queries, Redis calls and external calls of each request
+REQUEST_INSTRUMENTATION_ENABLED = ENVIRONMENT.bool("REQUEST_INSTRUMENTATION_ENABLED", default=True)
+# Requests over these budgets are logged with their slowest query, 0 disables the budget
+REQUEST_QUERY_BUDGET = ENVIRONMENT.int("REQUEST_QUERY_BUDGET", default=0)
+REQUEST_DURATION_BUDGET_MS = ENVIRONMENT.int("REQUEST_DURATION_BUDGET_MS", default=0)
+REQUEST_BUDGET_SQL_MAX_LENGTH = ENVIRONMENT.int("REQUEST_BUDGET_SQL_MAX_LENGTH", default=2000)
 REDIS_CACHE_CONNECTION_PARAMS = dict(
     max_connections=REDIS_MAX_CONNECTIONS,
     host=REDIS_HOST,
@@ -363,6 +391,8 @@ PERMISSION_SEEDING_ENABLED = ENVIRONMENT.bool("PERMISSION_SEEDING_ENABLED", defa
 ROLE_SEEDING_ENABLED = ENVIRONMENT.bool("ROLE_SEEDING_ENABLED", default=True)
 GROUP_SEEDING_ENABLED = ENVIRONMENT.bool("GROUP_SEEDING_ENABLED", default=True)
 MAX_SEED_THREADS = ENVIRONMENT.int("MAX_SEED_THREADS", default=None)
+# Seed each role definition file in its own transaction, concurrently in MAX_SEED_THREADS threads
+PARALLEL_ROLE_SEEDING_ENABLED = ENVIRONMENT.bool("PARALLEL_ROLE_SEEDING_ENABLED", default=False)
 
 try:
     DESTRUCTIVE_SEEDING_OK_UNTIL = parse_dt(
@@ -399,6 +429,21 @@ MOCK_KAFKA = ENVIRONMENT.get_value("MOCK_KAFKA", default=False)
 NOTIFICATIONS_ENABLED = ENVIRONMENT.get_value("NOTIFICATIONS_ENABLED", default=False)
 NOTIFICATIONS_RH_ENABLED = ENVIRONMENT.get_value("NOTIFICATIONS_RH_ENABLED", default=False)
 NOTIFICATIONS_TOPIC = ENVIRONMENT.get_value("NOTIFICATIONS_TOPIC", default=None)
+# Send notifications for all tenants from a celery worker instead of the process making the change
+NOTIFICATIONS_FAN_OUT_ASYNC = ENVIRONMENT.bool("NOTIFICATIONS_FAN_OUT_ASYNC", default=False)
+# Number of tenant org ids fetched from the database at a time when notifying all tenants
+NOTIFICATIONS_FAN_OUT_CHUNK_SIZE = ENVIRONMENT.int("NOTIFICATIONS_FAN_OUT_CHUNK_SIZE", default=2000)
+
+# Batching and compression of the messages sent by the kafka producer
+KAFKA_PRODUCER_LINGER_MS = ENVIRONMENT.int("KAFKA_PRODUCER_LINGER_MS", default=5)
+KAFKA_PRODUCER_BATCH_SIZE = ENVIRONMENT.int("KAFKA_PRODUCER_BATCH_SIZE", default=65536)
+KAFKA_PRODUCER_COMPRESSION_TYPE = ENVIRONMENT.get_value("KAFKA_PRODUCER_COMPRESSION_TYPE", default="gzip") or None
+# Bytes of undelivered messages buffered by the kafka producer, sends block once it is full
+KAFKA_PRODUCER_BUFFER_MEMORY = ENVIRONMENT.int("KAFKA_PRODUCER_BUFFER_MEMORY", default=33554432)
+# Milliseconds a send blocks waiting for buffer space before failing
+KAFKA_PRODUCER_MAX_BLOCK_MS = ENVIRONMENT.int("KAFKA_PRODUCER_MAX_BLOCK_MS", default=10000)
+# Seconds to wait for buffered messages to be delivered when the process shuts down
+KAFKA_PRODUCER_SHUTDOWN_TIMEOUT = ENVIRONMENT.int("KAFKA_PRODUCER_SHUTDOWN_TIMEOUT", default=10)
 
 EXTERNAL_SYNC_TOPIC = ENVIRONMENT.get_value("EXTERNAL_SYNC_TOPIC", default=None)
 EXTERNAL_CHROME_TOPIC = ENVIRONMENT.get_value("EXTERNAL_CHROME_TOPIC", default=None)
@@ -481,12 +526,30 @@ IT_SERVICE_PORT = ENVIRONMENT.int("IT_SERVICE_PORT", default="443")
 IT_SERVICE_PROTOCOL_SCHEME = ENVIRONMENT.get_value("IT_SERVICE_PROTOCOL_SCHEME", default="https")
 IT_SERVICE_TIMEOUT_SECONDS = ENVIRONMENT.int("IT_SERVICE_TIMEOUT_SECONDS", default=10)
 IT_TOKEN_JKWS_CACHE_LIFETIME = ENVIRONMENT.int("IT_TOKEN_JKWS_CACHE_LIFETIME", default=28800)
+# In-process cache of IT's imported JSON Web Key Set, 0 disables it
+IT_TOKEN_JWKS_LOCAL_CACHE_TTL = ENVIRONMENT.int("IT_TOKEN_JWKS_LOCAL_CACHE_TTL", default=0)
+# Seconds before its expiry in which the key set is refreshed in the background
+IT_TOKEN_JWKS_REFRESH_AHEAD_SECONDS = ENVIRONMENT.int("IT_TOKEN_JWKS_REFRESH_AHEAD_SECONDS", default=60)
+# Minimum seconds between the refreshes caused by tokens signed by a key which is not in the key set
+IT_TOKEN_JWKS_MIN_REFRESH_SECONDS = ENVIRONMENT.int("IT_TOKEN_JWKS_MIN_REFRESH_SECONDS", default=30)
+# In-process cache of the claims of validated bearer tokens, never kept past the expiry of the token; a TTL of 0
+# disables it
+IT_TOKEN_VALIDATION_CACHE_SIZE = ENVIRONMENT.int("IT_TOKEN_VALIDATION_CACHE_SIZE", default=1000)
+IT_TOKEN_VALIDATION_CACHE_TTL = ENVIRONMENT.int("IT_TOKEN_VALIDATION_CACHE_TTL", default=0)
+# Pages of service accounts requested from IT at a time, seconds a tenant's service accounts are cached (0 disables
+# the cache), and seconds after which they are fetched again if a service account is missing
+IT_SERVICE_PAGE_CONCURRENCY = ENVIRONMENT.int("IT_SERVICE_PAGE_CONCURRENCY", default=4)
+IT_SERVICE_ACCOUNTS_CACHE_TTL = ENVIRONMENT.int("IT_SERVICE_ACCOUNTS_CACHE_TTL", default=0)
+IT_SERVICE_ACCOUNTS_CACHE_REFRESH_INTERVAL = ENVIRONMENT.int("IT_SERVICE_ACCOUNTS_CACHE_REFRESH_INTERVAL", default=30)
 
 PRINCIPAL_USER_DOMAIN = ENVIRONMENT.get_value("PRINCIPAL_USER_DOMAIN", default="localhost")
 
 # Settings for enabling/disabling deletion in principal cleanup job via UMB
 PRINCIPAL_CLEANUP_DELETION_ENABLED_UMB = ENVIRONMENT.bool("PRINCIPAL_CLEANUP_DELETION_ENABLED_UMB", default=False)
 PRINCIPAL_CLEANUP_UPDATE_ENABLED_UMB = ENVIRONMENT.bool("PRINCIPAL_CLEANUP_UPDATE_ENABLED_UMB", default=False)
+# Usernames looked up in BOP per request, and tenants cleaned up concurrently, by the principal cleanup job
+PRINCIPAL_CLEANUP_BATCH_SIZE = ENVIRONMENT.int("PRINCIPAL_CLEANUP_BATCH_SIZE", default=100)
+PRINCIPAL_CLEANUP_THREADS = ENVIRONMENT.int("PRINCIPAL_CLEANUP_THREADS", default=4)
 UMB_JOB_ENABLED = ENVIRONMENT.bool("UMB_JOB_ENABLED", default=True)
 UMB_HOST = ENVIRONMENT.get_value("UMB_HOST", default="localhost")
 UMB_PORT = ENVIRONMENT.get_value("UMB_PORT", default="61612")
@@ -494,6 +557,13 @@ UMB_PORT = ENVIRONMENT.get_value("UMB_PORT", default="61612")
 SA_NAME = ENVIRONMENT.get_value("SA_NAME", default="nonprod-hcc-rbac")
 
 RELATION_API_SERVER = ENVIRONMENT.get_value("RELATION_API_SERVER", default="localhost:9000")
+# Relations API client: channels kept per process, tuples per request, parallel requests per event and retries
+RELATION_API_CHANNEL_POOL_SIZE = ENVIRONMENT.int("RELATION_API_CHANNEL_POOL_SIZE", default=2)
+RELATION_API_MAX_TUPLES_PER_REQUEST = ENVIRONMENT.int("RELATION_API_MAX_TUPLES_PER_REQUEST", default=500)
+RELATION_API_MAX_IN_FLIGHT = ENVIRONMENT.int("RELATION_API_MAX_IN_FLIGHT", default=4)
+RELATION_API_MAX_RETRIES = ENVIRONMENT.int("RELATION_API_MAX_RETRIES", default=3)
+RELATION_API_RETRY_BACKOFF = ENVIRONMENT.float("RELATION_API_RETRY_BACKOFF", default=0.5)
+RELATION_API_TIMEOUT = ENVIRONMENT.float("RELATION_API_TIMEOUT", default=10.0)
 ENV_NAME = ENVIRONMENT.get_value("ENV_NAME", default="stage")
 
 # Versioned API settings
@@ -1,6 +1,11 @@
 from copy import deepcopy
 from unittest.mock import Mock, DEFAULT
 
+from django.test import SimpleTestCase
+from prometheus_client import REGISTRY
+
+from core.kafka import RBACProducer, _producers, flush_producers
+
 
 def copy_call_args(mock):
     kafka_mock = Mock()
@@ -13,3 +18,54 @@ def copy_call_args(mock):
 
     mock.side_effect = side_effect
     return kafka_mock
+
+
+class RBACProducerTests(SimpleTestCase):
+    """Test the kafka producer wrapper."""
+
+    def setUp(self):
+        """Set up the producer tests."""
+        self.producer = Mock()
+        self.future = self.producer.send.return_value
+        self.rbac_producer = RBACProducer()
+        self.rbac_producer.producer = self.producer
+
+    def sample(self, name, topic=None):
+        """Return the current value of a kafka metric."""
+        return REGISTRY.get_sample_value(name, {"topic": topic} if topic else {}) or 0
+
+    def test_delivery_callbacks_record_metrics(self):
+        """Test that acknowledged and failed messages are counted."""
+        sent = self.sample("rbac_kafka_messages_sent_total", "topic")
+        failed = self.sample("rbac_kafka_messages_failed_total", "topic")
+        pending = self.sample("rbac_kafka_messages_pending")
+
+        self.rbac_producer.send_kafka_message("topic", {"key": "value"}, ("header", b"value"))
+        self.producer.send.assert_called_once_with("topic", value=b'{"key":"value"}', headers=[("header", b"value")])
+        self.assertEqual(self.sample("rbac_kafka_messages_pending"), pending + 1)
+
+        callback, *args = self.future.add_callback.call_args.args
+        callback(*args, Mock())
+        self.assertEqual(self.sample("rbac_kafka_messages_sent_total", "topic"), sent + 1)
+        self.assertEqual(self.sample("rbac_kafka_messages_pending"), pending)
+
+        self.rbac_producer.send_kafka_message("topic", {"key": "value"})
+        errback, *args = self.future.add_errback.call_args.args
+        errback(*args, Exception("timed out"))
+        self.assertEqual(self.sample("rbac_kafka_messages_failed_total", "topic"), failed + 1)
+        self.assertEqual(self.sample("rbac_kafka_messages_pending"), pending)
+
+    def test_send_failure_is_counted(self):
+        """Test that a send failing while the buffer is full is counted and raised."""
+        failed = self.sample("rbac_kafka_messages_failed_total", "topic")
+        self.producer.send.side_effect = Exception("buffer full")
+
+        with self.assertRaises(Exception):
+            self.rbac_producer.send_kafka_message("topic", {"key": "value"})
+        self.assertEqual(self.sample("rbac_kafka_messages_failed_total", "topic"), failed + 1)
+
+    def test_flush_producers(self):
+        """Test that the producers in use are flushed on shutdown."""
+        _producers.add(self.rbac_producer)
+        flush_producers(5)
+        self.producer.flush.assert_called_once_with(5)
@@ -19,6 +19,7 @@ from rest_framework import status
 from rest_framework.test import APIClient
 from django.conf import settings
 from django.test import override_settings
+from django.utils import timezone
 from datetime import datetime, timedelta
 from unittest.mock import MagicMock
 from unittest.mock import patch
@@ -26,7 +27,7 @@ import pytz
 import json
 
 from api.models import User, Tenant
-from management.models import Group, Permission, Policy, Role
+from management.models import Group, Permission, Policy, Role, TenantMigrationCheckpoint
 from tests.identity_request import IdentityRequest
 
 
@@ -206,6 +207,26 @@ class InternalViewsetTests(IdentityRequest):
             "Please specify a migration name in the `?migration_name=` param.",
         )
 
+    def test_data_migration_progress(self):
+        """Test that the data migration progress reports the checkpoints, throughput and ETA."""
+        tenant = Tenant.objects.create(org_id="migrated")
+        TenantMigrationCheckpoint.objects.create(
+            tenant=tenant,
+            status=TenantMigrationCheckpoint.Status.COMPLETED,
+            started=timezone.now() - timedelta(seconds=10),
+            completed=timezone.now(),
+        )
+        response = self.client.get(
+            "/_private/api/migrations/progress/?migration_name=v1_to_v2_data", **self.request.META
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        payload = json.loads(response.content)
+        total = Tenant.objects.exclude(tenant_name="public").count()
+        self.assertEqual(payload["tenants_completed_count"], 1)
+        self.assertEqual(payload["total_tenants_count"], total)
+        self.assertGreater(payload["tenants_per_second"], 0)
+        self.assertIsNotNone(payload["eta_seconds"])
+
     @patch("management.tasks.run_seeds_in_worker.delay")
     def test_run_seeds_with_defaults(self, seed_mock):
         """Test that we can trigger seeds with defaults."""
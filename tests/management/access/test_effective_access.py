@@ -0,0 +1,218 @@
+#
+# Copyright 2024 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Test the materialized effective access."""
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from management.access.effective_access import (
+    build_effective_access,
+    check_effective_access,
+    get_effective_access_queryset,
+    refresh_effective_access,
+)
+from management.access.model import (
+    EffectiveAccess,
+    EffectiveAccessStatus,
+    group_deleted_effective_access_handler,
+    invalidate_effective_access,
+    principals_to_groups_effective_access_handler,
+    role_related_obj_change_effective_access_handler,
+)
+from management.models import Access, Group, Permission, Policy, Principal, ResourceDefinition, Role
+from management.utils import access_for_principal
+from tests.identity_request import IdentityRequest
+
+
+class EffectiveAccessTests(IdentityRequest):
+    """Test the effective access table."""
+
+    def setUp(self):
+        """Set up the effective access tests."""
+        super().setUp()
+        self.principal = Principal.objects.create(username=self.user_data["username"], tenant=self.tenant)
+        self.other_principal = Principal.objects.create(username="other", tenant=self.tenant)
+
+        self.permission = Permission.objects.create(permission="app:*:*", tenant=self.tenant)
+        self.other_permission = Permission.objects.create(permission="other:*:read", tenant=self.tenant)
+        self.admin_permission = Permission.objects.create(permission="app:admin:write", tenant=self.tenant)
+
+        self.role = Role.objects.create(name="role", tenant=self.tenant)
+        self.access = Access.objects.create(permission=self.permission, role=self.role, tenant=self.tenant)
+        ResourceDefinition.objects.create(
+            access=self.access,
+            attributeFilter={"key": "app.id", "operation": "equal", "value": "1"},
+            tenant=self.tenant,
+        )
+        Access.objects.create(permission=self.other_permission, role=self.role, tenant=self.tenant)
+        self.policy = Policy.objects.create(name="policy", tenant=self.tenant)
+        self.policy.roles.add(self.role)
+        self.group = Group.objects.create(name="group", tenant=self.tenant)
+        self.group.policies.add(self.policy)
+        self.group.principals.add(self.principal)
+
+        self.admin_role = Role.objects.create(name="admin role", tenant=self.tenant)
+        Access.objects.create(permission=self.admin_permission, role=self.admin_role, tenant=self.tenant)
+        self.admin_policy = Policy.objects.create(name="admin policy", tenant=self.tenant)
+        self.admin_policy.roles.add(self.admin_role)
+        self.admin_group = Group.objects.create(name="admin group", admin_default=True, tenant=self.tenant)
+        self.admin_group.policies.add(self.admin_policy)
+
+    def tearDown(self):
+        """Tear down the effective access tests."""
+        Group.objects.all().delete()
+        Principal.objects.all().delete()
+        Role.objects.all().delete()
+        Policy.objects.all().delete()
+        Permission.objects.all().delete()
+
+    def test_refresh_materializes_group_and_admin_access(self):
+        """Test that a refresh stores the group access and flags the admin default group access."""
+        self.assertEqual(refresh_effective_access(self.principal, self.tenant), 3)
+        self.assertTrue(EffectiveAccessStatus.fresh_set().filter(principal=self.principal).exists())
+
+        rows = EffectiveAccess.objects.filter(principal=self.principal)
+        self.assertEqual(
+            set(rows.values_list("permission__permission", "admin_only")),
+            {("app:*:*", False), ("other:*:read", False), ("app:admin:write", True)},
+        )
+
+    def test_lookup_matches_access_for_principal(self):
+        """Test the table lookup returns the same access as the group chain."""
+        for is_org_admin in (False, True):
+            expected = access_for_principal(self.principal, self.tenant, application="app", is_org_admin=is_org_admin)
+            actual = get_effective_access_queryset(self.principal, self.tenant, "app", is_org_admin)
+            self.assertEqual({access.id for access in actual}, {access.id for access in expected})
+
+        actual = get_effective_access_queryset(self.principal, self.tenant, "app,other")
+        self.assertEqual(actual.count(), 2)
+
+    def test_check_detects_stale_rows(self):
+        """Test the consistency checker reports rows that no longer match the group chain."""
+        refresh_effective_access(self.principal, self.tenant)
+        self.assertEqual(check_effective_access(self.principal, self.tenant), {"missing": set(), "unexpected": set()})
+
+        self.group.principals.remove(self.principal)
+        diff = check_effective_access(self.principal, self.tenant)
+        self.assertEqual(len(diff["unexpected"]), 4)
+        self.assertEqual(len(diff["missing"]), 0)
+
+    def test_membership_change_invalidates_principal(self):
+        """Test that group membership changes mark the principal as stale."""
+        refresh_effective_access(self.principal, self.tenant)
+        refresh_effective_access(self.other_principal, self.tenant)
+
+        principals_to_groups_effective_access_handler(
+            instance=self.group, action="post_add", pk_set={self.other_principal.pk}
+        )
+        self.assertTrue(EffectiveAccessStatus.fresh_set().filter(principal=self.principal).exists())
+        self.assertFalse(EffectiveAccessStatus.fresh_set().filter(principal=self.other_principal).exists())
+
+    @override_settings(EFFECTIVE_ACCESS_TABLE_ENABLED=False)
+    def test_changes_invalidate_while_table_disabled(self):
+        """Test that changes mark the principals as stale while the table is not read, for when it is enabled again."""
+        refresh_effective_access(self.principal, self.tenant)
+
+        self.group.principals.remove(self.principal)
+        self.assertFalse(EffectiveAccessStatus.fresh_set().filter(principal=self.principal).exists())
+
+    def test_role_change_invalidates_members(self):
+        """Test that a change to a role marks the members of the groups using it as stale."""
+        refresh_effective_access(self.principal, self.tenant)
+        refresh_effective_access(self.other_principal, self.tenant)
+
+        role_related_obj_change_effective_access_handler(instance=self.access)
+        self.assertFalse(EffectiveAccessStatus.fresh_set().filter(principal=self.principal).exists())
+        self.assertTrue(EffectiveAccessStatus.fresh_set().filter(principal=self.other_principal).exists())
+
+    def test_default_group_change_invalidates_tenant(self):
+        """Test that a change to a default group marks every principal of the tenant as stale."""
+        refresh_effective_access(self.principal, self.tenant)
+        refresh_effective_access(self.other_principal, self.tenant)
+
+        group_deleted_effective_access_handler(instance=self.admin_group)
+        self.assertFalse(EffectiveAccessStatus.fresh_set().filter(principal__tenant=self.tenant).exists())
+
+    def test_lookup_refreshes_stale_principal(self):
+        """Test that a stale principal is rebuilt on lookup."""
+        refresh_effective_access(self.principal, self.tenant)
+        self.group.principals.remove(self.principal)
+        principals_to_groups_effective_access_handler(
+            instance=self.group, action="pre_remove", pk_set={self.principal.pk}
+        )
+
+        self.assertEqual(get_effective_access_queryset(self.principal, self.tenant, "app").count(), 0)
+        self.assertEqual(check_effective_access(self.principal, self.tenant), {"missing": set(), "unexpected": set()})
+
+    def test_refresh_rebuilds_rows_invalidated_while_built(self):
+        """Test that rows built while an invalidation commits are built again instead of being marked up to date."""
+
+        def build_then_revoke(principal, tenant):
+            rows = build_effective_access(principal, tenant)
+            if build.call_count == 1:
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.group.principals.remove(self.principal)
+                    invalidate_effective_access([self.principal.pk])
+            return rows
+
+        with patch(
+            "management.access.effective_access.build_effective_access", side_effect=build_then_revoke
+        ) as build:
+            self.assertEqual(refresh_effective_access(self.principal, self.tenant), 1)
+
+        self.assertEqual(build.call_count, 2)
+        self.assertTrue(EffectiveAccessStatus.fresh_set().filter(principal=self.principal).exists())
+        self.assertEqual(check_effective_access(self.principal, self.tenant), {"missing": set(), "unexpected": set()})
+
+    def test_refresh_skips_rows_refreshed_concurrently(self):
+        """Test that a refresh finding the rows already up to date under the lock leaves them in place."""
+        refresh_effective_access(self.principal, self.tenant)
+        row_ids = set(EffectiveAccess.objects.filter(principal=self.principal).values_list("id", flat=True))
+
+        EffectiveAccessStatus.objects.filter(principal=self.principal).update(built_version=None)
+
+        def refresh_elsewhere(principal, tenant):
+            EffectiveAccessStatus.objects.filter(principal=principal).update(built_version=F("version"))
+            return []
+
+        with patch("management.access.effective_access.build_effective_access", side_effect=refresh_elsewhere):
+            self.assertEqual(refresh_effective_access(self.principal, self.tenant), 0)
+
+        self.assertEqual(
+            set(EffectiveAccess.objects.filter(principal=self.principal).values_list("id", flat=True)), row_ids
+        )
+
+    def test_rebuild_command(self):
+        """Test the rebuild command materializes every principal of the tenant."""
+        call_command("effective_access", "rebuild", "--org-list", self.tenant.org_id)
+        self.assertEqual(EffectiveAccessStatus.fresh_set().filter(principal__tenant=self.tenant).count(), 2)
+
+    @override_settings(EFFECTIVE_ACCESS_TABLE_ENABLED=True, ACCESS_CACHE_ENABLED=False)
+    def test_access_view_uses_table(self):
+        """Test the access endpoint is served from the effective access table."""
+        url = "{}?application=app".format(reverse("v1_management:access"))
+        client = APIClient()
+        response = client.get(url, **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({access["permission"] for access in response.data["data"]}, {"app:*:*", "app:admin:write"})
+        self.assertTrue(EffectiveAccessStatus.fresh_set().filter(principal=self.principal).exists())
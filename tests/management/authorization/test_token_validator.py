@@ -15,14 +15,18 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 """Test the token validator class."""
+import time
+
 import requests
 
 from django.conf import settings
-from django.test import override_settings
+from django.test import SimpleTestCase, override_settings
 from rest_framework import status
 
 from management.authorization.scope_claims import ScopeClaims
 from management.authorization.token_validator import ITSSOTokenValidator, InvalidTokenError, MissingAuthorizationError
+from management.authorization.token_validator import KeySetCache, token_key_id
+from management.cache import LocalTokenCache
 from management.authorization.token_validator import UnableMeetPrerequisitesError
 from tests.identity_request import IdentityRequest
 from unittest import mock
@@ -67,6 +71,7 @@ class TokenValidatorTests(IdentityRequest):
         url: str,
         oidc_configuration_url_status_code: status = status.HTTP_200_OK,
         jwks_url_response_status_code: status = status.HTTP_200_OK,
+        **kwargs,
     ) -> mock.Mock:
         """Side effect handler for when we need the "requests.get" method to return different responses."""
         if url == self.oidc_configuration_url:
@@ -79,7 +84,7 @@ class TokenValidatorTests(IdentityRequest):
                 status_code=jwks_url_response_status_code, json=lambda: self.jwks_certificates_response_json
             )
 
-    def _requests_get_sideffect_jwks_bad_response(self, url: str) -> mock.Mock:
+    def _requests_get_sideffect_jwks_bad_response(self, url: str, **kwargs) -> mock.Mock:
         """Side effect handler that returns bad request response for when the JWKS certificates are fetched."""
         if url == self.oidc_configuration_url:
             return mock.Mock(
@@ -91,7 +96,7 @@ class TokenValidatorTests(IdentityRequest):
                 status_code=status.HTTP_400_BAD_REQUEST, json=lambda: self.jwks_certificates_response_json
             )
 
-    def _requests_get_sideffect_jwks_connection_error(self, url: str) -> mock.Mock:
+    def _requests_get_sideffect_jwks_connection_error(self, url: str, **kwargs) -> mock.Mock:
         """Side effect handler that raises a connection error when the JWKS certificates are fetched."""
         if url == self.oidc_configuration_url:
             return mock.Mock(
@@ -101,7 +106,7 @@ class TokenValidatorTests(IdentityRequest):
         elif url == self.oidc_configuration_jwks_url:
             raise requests.exceptions.ConnectionError
 
-    def _requests_get_sideffect_jwks_timeout_error(self, url: str) -> mock.Mock:
+    def _requests_get_sideffect_jwks_timeout_error(self, url: str, **kwargs) -> mock.Mock:
         """Side effect handler that raises a timeout error when the JWKS certificates are fetched."""
         if url == self.oidc_configuration_url:
             return mock.Mock(
@@ -129,7 +134,7 @@ class TokenValidatorTests(IdentityRequest):
             )
 
     @mock.patch("management.authorization.token_validator.JWKSCache.get_jwks_response")
-    @mock.patch("management.authorization.token_validator.requests.get")
+    @mock.patch("management.authorization.token_validator.requests.Session.get")
     @mock.patch("management.authorization.token_validator.KeySet.import_key_set")
     def test_get_json_web_keyset_cache(
         self, import_key_set: mock.Mock, get: mock.Mock, get_jwks_response: mock.Mock
@@ -149,7 +154,7 @@ class TokenValidatorTests(IdentityRequest):
         get.assert_not_called()
 
     @mock.patch("management.authorization.token_validator.JWKSCache.get_jwks_response")
-    @mock.patch("management.authorization.token_validator.requests.get")
+    @mock.patch("management.authorization.token_validator.requests.Session.get")
     @mock.patch("management.authorization.token_validator.JWKSCache.set_jwks_response")
     @mock.patch("management.authorization.token_validator.KeySet.import_key_set")
     def test_get_json_web_keyset(
@@ -174,7 +179,7 @@ class TokenValidatorTests(IdentityRequest):
         import_key_set.assert_called_with(self.jwks_certificates_response_json)
 
     @mock.patch("management.authorization.token_validator.JWKSCache.get_jwks_response")
-    @mock.patch("management.authorization.token_validator.requests.get")
+    @mock.patch("management.authorization.token_validator.requests.Session.get")
     @mock.patch("management.authorization.token_validator.JWKSCache.set_jwks_response")
     @mock.patch("management.authorization.token_validator.KeySet.import_key_set")
     def test_get_json_web_keyset_oidc_network_errors(
@@ -220,7 +225,7 @@ class TokenValidatorTests(IdentityRequest):
                 )
 
     @mock.patch("management.authorization.token_validator.JWKSCache.get_jwks_response")
-    @mock.patch("management.authorization.token_validator.requests.get")
+    @mock.patch("management.authorization.token_validator.requests.Session.get")
     @mock.patch("management.authorization.token_validator.JWKSCache.set_jwks_response")
     @mock.patch("management.authorization.token_validator.KeySet.import_key_set")
     def test_get_json_web_keyset_oidc_not_ok(
@@ -265,7 +270,7 @@ class TokenValidatorTests(IdentityRequest):
             )
 
     @mock.patch("management.authorization.token_validator.JWKSCache.get_jwks_response")
-    @mock.patch("management.authorization.token_validator.requests.get")
+    @mock.patch("management.authorization.token_validator.requests.Session.get")
     @mock.patch("management.authorization.token_validator.JWKSCache.set_jwks_response")
     @mock.patch("management.authorization.token_validator.KeySet.import_key_set")
     def test_get_json_web_keyset_oidc_not_jwks_url(
@@ -310,7 +315,7 @@ class TokenValidatorTests(IdentityRequest):
             )
 
     @mock.patch("management.authorization.token_validator.JWKSCache.get_jwks_response")
-    @mock.patch("management.authorization.token_validator.requests.get")
+    @mock.patch("management.authorization.token_validator.requests.Session.get")
     @mock.patch("management.authorization.token_validator.JWKSCache.set_jwks_response")
     @mock.patch("management.authorization.token_validator.KeySet.import_key_set")
     def test_get_json_web_keyset_oidc_empty_jwks_url(
@@ -355,7 +360,7 @@ class TokenValidatorTests(IdentityRequest):
             )
 
     @mock.patch("management.authorization.token_validator.JWKSCache.get_jwks_response")
-    @mock.patch("management.authorization.token_validator.requests.get")
+    @mock.patch("management.authorization.token_validator.requests.Session.get")
     @mock.patch("management.authorization.token_validator.JWKSCache.set_jwks_response")
     @mock.patch("management.authorization.token_validator.KeySet.import_key_set")
     def test_get_json_web_keyset_jwks_network_error(
@@ -407,7 +412,7 @@ class TokenValidatorTests(IdentityRequest):
                 )
 
     @mock.patch("management.authorization.token_validator.JWKSCache.get_jwks_response")
-    @mock.patch("management.authorization.token_validator.requests.get")
+    @mock.patch("management.authorization.token_validator.requests.Session.get")
     @mock.patch("management.authorization.token_validator.JWKSCache.set_jwks_response")
     @mock.patch("management.authorization.token_validator.KeySet.import_key_set")
     def test_get_json_web_keyset_jwks_not_ok(
@@ -451,7 +456,7 @@ class TokenValidatorTests(IdentityRequest):
             )
 
     @mock.patch("management.authorization.token_validator.JWKSCache.get_jwks_response")
-    @mock.patch("management.authorization.token_validator.requests.get")
+    @mock.patch("management.authorization.token_validator.requests.Session.get")
     @mock.patch("management.authorization.token_validator.JWKSCache.set_jwks_response")
     @mock.patch("management.authorization.token_validator.KeySet.import_key_set")
     def test_get_json_web_keyset_import_key_set_error(
@@ -686,3 +691,125 @@ class TokenValidatorTests(IdentityRequest):
             )
 
             self.assertEqual("The token's claims are invalid", str(e), "unexpected exception message")
+
+    @override_settings(IT_TOKEN_VALIDATION_CACHE_TTL=60)
+    @mock.patch("management.authorization.token_validator.ITSSOTokenValidator._get_json_web_keyset")
+    @mock.patch("management.authorization.token_validator.jwt.decode")
+    def test_validate_token_cached(self, decode: mock.Mock, _get_json_web_keyset: mock.Mock) -> None:
+        """Test that a validated token is not decoded again, and that rejected tokens are not cached."""
+        decode.return_value = mock.Mock(
+            claims={"iss": self.issuer, "scope": "openid api.iam.service_accounts", "exp": int(time.time()) + 3600}
+        )
+        request = mock.Mock()
+        request.headers = {"Authorization": "Bearer mocked-token"}
+        scopes = {ScopeClaims.SERVICE_ACCOUNTS_CLAIM}
+
+        with mock.patch(
+            "management.authorization.token_validator._validated_tokens", LocalTokenCache(maxsize=10, ttl=60)
+        ):
+            self.assertEqual(self.token_validator.validate_token(request, scopes), "mocked-token")
+            self.assertEqual(self.token_validator.validate_token(request, scopes), "mocked-token")
+
+            decode.return_value.claims["scope"] = "openid"
+            request.headers = {"Authorization": "Bearer other-token"}
+            with self.assertRaises(InvalidTokenError):
+                self.token_validator.validate_token(request, scopes)
+            with self.assertRaises(InvalidTokenError):
+                self.token_validator.validate_token(request, scopes)
+
+        # Rejected tokens are not cached.
+        self.assertEqual(decode.call_count, 3)
+
+    @override_settings(IT_TOKEN_VALIDATION_CACHE_TTL=60)
+    @mock.patch("management.authorization.token_validator.ITSSOTokenValidator._get_json_web_keyset")
+    @mock.patch("management.authorization.token_validator.jwt.decode")
+    def test_validate_token_not_cached_past_expiration(
+        self, decode: mock.Mock, _get_json_web_keyset: mock.Mock
+    ) -> None:
+        """Test that a token is not cached past its expiration."""
+        decode.return_value = mock.Mock(claims={"iss": self.issuer, "exp": int(time.time()) + 1})
+        request = mock.Mock()
+        request.headers = {"Authorization": "Bearer mocked-token"}
+        cache = LocalTokenCache(maxsize=10, ttl=60)
+
+        with mock.patch("management.authorization.token_validator._validated_tokens", cache):
+            self.token_validator.validate_token(request, set())
+
+        expires, _ = next(iter(cache._entries.values()))
+        self.assertLessEqual(expires, time.monotonic() + 1)
+
+
+@override_settings(
+    IT_TOKEN_JWKS_LOCAL_CACHE_TTL=300, IT_TOKEN_JWKS_REFRESH_AHEAD_SECONDS=60, IT_TOKEN_JWKS_MIN_REFRESH_SECONDS=30
+)
+@mock.patch("management.authorization.token_validator.KeySet.import_key_set", side_effect=lambda contents: object())
+class KeySetCacheTests(SimpleTestCase):
+    """Test the in-process cache of the JSON Web Key Set."""
+
+    def setUp(self):
+        """Set up the key set cache with a fake clock."""
+        self.now = 1000.0
+        self.cache = KeySetCache(clock=lambda: self.now)
+        self.jwks = {"keys": [{"kid": "key-1"}]}
+        self.load = mock.Mock(side_effect=lambda use_cache: self.jwks)
+
+    def test_key_set_cached(self, import_key_set):
+        """Test that the key set is loaded and imported once while it is fresh."""
+        first = self.cache.get(self.load, "key-1")
+        self.now += 100
+        second = self.cache.get(self.load, "key-1")
+        third = self.cache.get(self.load)
+
+        self.assertIs(first, second)
+        self.assertIs(first, third)
+        self.load.assert_called_once_with(True)
+        import_key_set.assert_called_once_with(self.jwks)
+
+    def test_expired_key_set_reimported_only_on_change(self, import_key_set):
+        """Test that an expired key set is loaded again, but only imported again if the JWKS changed."""
+        first = self.cache.get(self.load)
+        self.now += 300
+        second = self.cache.get(self.load)
+        self.assertIs(first, second)
+
+        self.jwks = {"keys": [{"kid": "key-2"}]}
+        self.now += 300
+        third = self.cache.get(self.load)
+
+        self.assertIsNot(first, third)
+        self.assertEqual(self.load.call_count, 3)
+        self.assertEqual(import_key_set.call_count, 2)
+
+    def test_unknown_key_refreshes_from_it(self, import_key_set):
+        """Test that a token signed by an unknown key refreshes the key set from IT, at most once in a while."""
+        self.cache.get(self.load, "key-1")
+        self.jwks = {"keys": [{"kid": "key-1"}, {"kid": "key-2"}]}
+        self.now += 31
+
+        self.cache.get(self.load, "key-2")
+        self.cache.get(self.load, "key-3")
+        self.now += 31
+        self.cache.get(self.load, "key-3")
+
+        self.assertEqual(self.load.call_args_list, [mock.call(True), mock.call(False), mock.call(False)])
+
+    @mock.patch("management.authorization.token_validator.threading.Thread")
+    def test_refresh_in_background_before_expiry(self, thread, import_key_set):
+        """Test that a key set about to expire is served while it is refreshed in the background."""
+        thread.side_effect = lambda target, **kwargs: mock.Mock(start=target)
+        first = self.cache.get(self.load)
+        self.now += 250
+
+        self.assertIs(self.cache.get(self.load), first)
+        self.assertEqual(self.load.call_count, 2)
+        thread.assert_called_once()
+
+        # The background refresh extended the expiry of the key set.
+        self.now += 200
+        self.cache.get(self.load)
+        self.assertEqual(self.load.call_count, 2)
+
+    def test_token_key_id(self, import_key_set):
+        """Test that the key id is read from the header of the token."""
+        self.assertEqual(token_key_id("eyJhbGciOiJSUzI1NiIsImtpZCI6ImtleS0xIn0.e30.c2ln"), "key-1")
+        self.assertIsNone(token_key_id("not a token"))
@@ -19,10 +19,10 @@ import random
 from unittest.mock import call, patch, ANY, Mock
 from uuid import uuid4
 
-from django.db import transaction
+from django.db import connection, transaction
 from django.conf import settings
 from django.urls import reverse, resolve
-from django.test.utils import override_settings
+from django.test.utils import CaptureQueriesContext, override_settings
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.test import APIClient
@@ -1473,6 +1473,35 @@ class GroupViewsetTests(IdentityRequest):
         self.assertEqual(roles[0].get("name"), self.roleB.name)
         self.assertEqual(roles[0].get("description"), self.roleB.description)
 
+    def test_get_group_roles_paginated_in_database(self):
+        """Test that the queries to get a page of the group roles don't grow with the number of roles."""
+        permission = Permission.objects.create(permission="app:resource:read", tenant=self.tenant)
+
+        def add_roles(start, count):
+            for i in range(start, start + count):
+                role = Role.objects.create(name=f"paged role {i}", tenant=self.tenant)
+                Access.objects.create(permission=permission, role=role, tenant=self.tenant)
+                self.policy.roles.add(role)
+
+        url = f"{reverse('v1_management:group-roles', kwargs={'uuid': self.group.uuid})}?limit=2&order_by=-name"
+        client = APIClient()
+        add_roles(0, 3)
+        client.get(url, **self.headers)
+        with CaptureQueriesContext(connection) as few_roles:
+            response = client.get(url, **self.headers)
+        self.assertEqual(response.data.get("meta").get("count"), 4)
+
+        add_roles(3, 10)
+        with CaptureQueriesContext(connection) as many_roles:
+            response = client.get(url, **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get("meta").get("count"), 14)
+        roles = response.data.get("data")
+        self.assertEqual([role["name"] for role in roles], ["roleA", "paged role 9"])
+        self.assertEqual(roles[1]["applications"], ["app"])
+        self.assertEqual(len(many_roles), len(few_roles))
+
     def test_get_group_roles_ordered(self):
         """Test getting roles with 'order_by=' returns properly."""
         url = f"{reverse('v1_management:group-roles', kwargs={'uuid': self.group.uuid})}?order_by=-name"
@@ -2265,12 +2294,11 @@ class GroupViewsetTests(IdentityRequest):
             group.principals.add(principal)
         group.save()
 
-        # Set the return value for the mock
-        mock_request.return_value["data"] = [
-            {"username": principals_list[0].username},
-            {"username": principals_list[1].username},
-            {"username": principals_list[2].username},
-        ]
+        # Only the usernames of the page are looked up
+        mock_request.side_effect = lambda usernames, **kwargs: {
+            "status_code": 200,
+            "data": [{"username": username} for username in usernames],
+        }
 
         # Test that /groups/{uuid}/principals/ returns correct data with default limit and offset
         url = f"{reverse('v1_management:group-principals', kwargs={'uuid': group.uuid})}"
@@ -2304,6 +2332,23 @@ class GroupViewsetTests(IdentityRequest):
             self.assertEqual(int(response.data.get("meta").get("offset")), offset)
             self.assertEqual(len(response.data.get("data")), expected_data_count)
 
+            usernames = [principal.username for principal in principals_list]
+            self.assertEqual(mock_request.call_args.args[0], usernames[offset : offset + limit])
+
+    @patch("management.principal.proxy.PrincipalProxy.request_filtered_principals")
+    def test_get_group_user_principals_username_only(self, mock_request):
+        """Test that getting only the usernames of the principals of a group doesn't call BOP."""
+        url = f"{reverse('v1_management:group-principals', kwargs={'uuid': self.group.uuid})}?username_only=true"
+        url += "&order_by=-username&limit=1"
+        client = APIClient()
+        response = client.get(url, **self.headers)
+
+        expected = max(self.principal.username, self.principalB.username)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get("meta").get("count"), 2)
+        self.assertEqual(response.data.get("data"), [{"username": expected}])
+        mock_request.assert_not_called()
+
     @override_settings(IT_BYPASS_TOKEN_VALIDATION=True)
     @patch("management.principal.it_service.ITService.request_service_accounts")
     def test_get_group_service_account_success(self, mock_request):
@@ -0,0 +1,94 @@
+#
+# Copyright 2024 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Test the notification handlers."""
+from unittest.mock import ANY, call, patch
+
+from django.conf import settings
+from django.test import override_settings
+from management.notifications.notification_handlers import (
+    build_notifications_message,
+    fan_out_notifications,
+    message_template,
+    notify_all,
+)
+
+from api.models import Tenant
+from tests.core.test_kafka import copy_call_args
+from tests.identity_request import IdentityRequest
+
+
+class NotificationHandlersTests(IdentityRequest):
+    """Test the notification handlers."""
+
+    def setUp(self):
+        """Set up the notification handlers tests."""
+        super().setUp()
+        self.other_tenant = Tenant.objects.create(tenant_name="acct456", org_id="456")
+        self.payload = {"username": "Red Hat", "name": "role", "uuid": "1234"}
+
+    def test_build_notifications_message_does_not_mutate_template(self):
+        """Test that messages are built from a copy of the template."""
+        message = build_notifications_message("rh-new-role-available", self.payload, "123")
+
+        self.assertEqual(message["org_id"], "123")
+        self.assertEqual(message["events"][0]["payload"], self.payload)
+        self.assertNotIn("org_id", message_template)
+        self.assertEqual(message_template["events"][0]["payload"], "")
+
+    @patch("core.kafka.RBACProducer.flush")
+    @patch("core.kafka.RBACProducer.send_kafka_message")
+    @override_settings(NOTIFICATIONS_FAN_OUT_CHUNK_SIZE=1)
+    def test_fan_out_notifications(self, send_kafka_message, flush):
+        """Test that every tenant but the public one is notified and the producer is flushed."""
+        kafka_mock = copy_call_args(send_kafka_message)
+
+        sent = fan_out_notifications("rh-new-role-available", self.payload)
+
+        org_ids = [self.tenant.org_id, self.other_tenant.org_id]
+        self.assertEqual(sent, 2)
+        kafka_mock.assert_has_calls(
+            [
+                call(
+                    settings.NOTIFICATIONS_TOPIC,
+                    {
+                        "bundle": "console",
+                        "application": "rbac",
+                        "event_type": "rh-new-role-available",
+                        "timestamp": ANY,
+                        "events": [{"metadata": {}, "payload": self.payload}],
+                        "org_id": org_id,
+                    },
+                    ANY,
+                )
+                for org_id in org_ids
+            ],
+            any_order=True,
+        )
+        self.assertEqual(kafka_mock.call_count, 2)
+        flush.assert_called_once()
+
+    @patch("management.tasks.fan_out_notifications_in_worker.delay")
+    @patch("management.notifications.notification_handlers.fan_out_notifications")
+    @override_settings(NOTIFICATIONS_FAN_OUT_ASYNC=True)
+    def test_notify_all_in_worker(self, fan_out, delay):
+        """Test that the fan out is handed to the worker once the transaction commits."""
+        with self.captureOnCommitCallbacks(execute=True):
+            notify_all("rh-new-role-available", self.payload)
+            delay.assert_not_called()
+
+        delay.assert_called_once_with("rh-new-role-available", self.payload)
+        fan_out.assert_not_called()
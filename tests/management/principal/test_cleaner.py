@@ -26,7 +26,11 @@ from rest_framework import status
 from management.group.definer import seed_group
 from management.group.model import Group
 from management.policy.model import Policy
-from management.principal.cleaner import clean_tenant_principals
+from management.principal.cleaner import (
+    PrincipalCleanupStats,
+    clean_tenant_principals,
+    clean_tenants_principals,
+)
 from management.principal.model import Principal
 from management.principal.cleaner import process_principal_events_from_umb
 from management.principal.proxy import external_principal_to_user
@@ -168,6 +172,58 @@ class PrincipalCleanerTests(IdentityRequest):
             self.fail(msg="clean_tenant_principals encountered an exception")
         self.assertEqual(Principal.objects.count(), 1)
 
+    @override_settings(PRINCIPAL_CLEANUP_BATCH_SIZE=2)
+    @patch("management.principal.proxy.PrincipalProxy._request_principals")
+    def test_principal_cleanup_batches_usernames(self, mock_request):
+        """Test that usernames are looked up in batches and the missing principals removed at once."""
+        for username in ("user1", "user2", "user3"):
+            Principal.objects.create(username=username, tenant=self.tenant)
+        Principal.objects.create(username="CAR", cross_account=True, tenant=self.tenant)
+        mock_request.side_effect = [
+            {"status_code": status.HTTP_200_OK, "data": [{"username": "USER1"}]},
+            {"status_code": status.HTTP_200_OK, "data": [{"username": "user3"}]},
+        ]
+        stats = PrincipalCleanupStats()
+
+        clean_tenant_principals(self.tenant, stats)
+
+        self.assertEqual(mock_request.call_count, 2)
+        requested = [set(call.kwargs["data"]["users"]) for call in mock_request.call_args_list]
+        self.assertEqual(set().union(*requested), {"user1", "user2", "user3"})
+        self.assertEqual(
+            set(Principal.objects.filter(tenant=self.tenant).values_list("username", flat=True)),
+            {"user1", "user3", "CAR"},
+        )
+        self.assertEqual((stats.tenants, stats.checked, stats.bop_requests, stats.removed), (1, 3, 2, 1))
+
+    @override_settings(PRINCIPAL_CLEANUP_BATCH_SIZE=1)
+    @patch("management.principal.proxy.PrincipalProxy._request_principals")
+    def test_principal_cleanup_batch_error(self, mock_request):
+        """Test that the principals of a batch which failed to be looked up are kept."""
+        for username in ("user1", "user2"):
+            Principal.objects.create(username=username, tenant=self.tenant)
+        mock_request.side_effect = lambda *args, **kwargs: (
+            {"status_code": status.HTTP_200_OK, "data": []}
+            if kwargs["data"]["users"] == ["user1"]
+            else {"status_code": status.HTTP_504_GATEWAY_TIMEOUT}
+        )
+
+        clean_tenant_principals(self.tenant)
+
+        self.assertEqual(list(Principal.objects.values_list("username", flat=True)), ["user2"])
+
+    @patch("management.principal.cleaner.clean_tenant_principals")
+    def test_clean_tenants_principals(self, clean_mock):
+        """Test that every tenant is cleaned up, and that a failing tenant does not stop the run."""
+        clean_mock.side_effect = lambda tenant, stats: stats.add(tenants=1) if tenant == self.tenant else 1 / 0
+
+        clean_tenants_principals()
+
+        self.assertEqual(
+            {call.args[0] for call in clean_mock.call_args_list},
+            set(Tenant.objects.all()),
+        )
+
 
 FRAME_BODY = (
     b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<CanonicalMessage xmlns="http://esb.redhat.com/Canonical/6">\n    '
@@ -280,7 +336,7 @@ class PrincipalUMBTests(IdentityRequest):
             "data": [],
         },
     )
-    @patch("management.group.model.AccessCache")
+    @patch("management.cache.AccessCache")
     @patch("management.principal.cleaner.UMB_CLIENT")
     def test_cleanup_principal_in_or_not_in_group(self, client_mock, cache_class, proxy_mock):
         """Test that we can run a principal clean up on a tenant with a principal in a group."""
@@ -294,7 +350,8 @@ class PrincipalUMBTests(IdentityRequest):
         client_mock.receiveFrame.return_value = MagicMock(body=FRAME_BODY)
         cache_mock = MagicMock()
         cache_class.return_value = cache_mock
-        process_principal_events_from_umb()
+        with self.captureOnCommitCallbacks(execute=True):
+            process_principal_events_from_umb()
 
         client_mock.receiveFrame.assert_called_once()
         client_mock.disconnect.assert_called_once()
@@ -302,7 +359,7 @@ class PrincipalUMBTests(IdentityRequest):
         self.assertFalse(Principal.objects.filter(username=principal_name).exists())
         self.group.refresh_from_db()
         self.assertFalse(self.group.principals.all())
-        cache_mock.delete_policy.assert_called_once_with(self.principal.uuid)
+        cache_mock.delete_policies.assert_called_once_with({self.principal.uuid})
 
         # When principal not in group
         self.principal = Principal(username=principal_name, tenant=self.tenant, user_id="56780000")
@@ -16,6 +16,7 @@
 #
 """Test the principal model."""
 import requests
+import time
 import uuid
 
 from django.conf import settings
@@ -350,30 +351,13 @@ class ITServiceTests(IdentityRequest):
         # Create the mocked response from IT.
         mocked_service_accounts = self._create_mock_it_service_accounts(300)
 
-        # Make sure the "get" function returns multiple pages of service accounts.
-        first_hundred_sas = mocked_service_accounts[0:100]
-        second_hundred_sas = mocked_service_accounts[100:200]
-        third_hundred_sas = mocked_service_accounts[200:300]
-
+        # Make sure the "get" function returns multiple pages of service accounts. The pages after the first one are
+        # fetched concurrently, so the responses depend on the requested offset rather than on the order of the calls.
         get.__name__ = "get"
-        get.side_effect = [
-            mock.Mock(
-                json=lambda: first_hundred_sas,
-                status_code=status.HTTP_200_OK,
-            ),
-            mock.Mock(
-                json=lambda: second_hundred_sas,
-                status_code=status.HTTP_200_OK,
-            ),
-            mock.Mock(
-                json=lambda: third_hundred_sas,
-                status_code=status.HTTP_200_OK,
-            ),
-            mock.Mock(
-                json=lambda: [],
-                status_code=status.HTTP_200_OK,
-            ),
-        ]
+        get.side_effect = lambda **kwargs: mock.Mock(
+            json=lambda: mocked_service_accounts[kwargs["params"]["first"] : kwargs["params"]["first"] + 100],
+            status_code=status.HTTP_200_OK,
+        )
 
         bearer_token_mock = "bearer-token-mock"
         # For multiple pages giving just three client IDs does not make sense, but we are going to give them anyway to
@@ -423,14 +407,108 @@ class ITServiceTests(IdentityRequest):
                     params=parameters_fourth_call,
                     timeout=settings.IT_SERVICE_TIMEOUT_SECONDS,
                 ),
-            ]
+            ],
+            any_order=True,
         )
+        self.assertEqual(len(result), 300)
 
         # Assert that the payload is correct.
         self._assert_IT_to_RBAC_model_transformations(
             it_service_accounts=mocked_service_accounts, rbac_service_accounts=result
         )
 
+    @override_settings(IT_SERVICE_PAGE_CONCURRENCY=3)
+    @mock.patch("management.principal.it_service.requests.get")
+    def test_request_service_accounts_concurrent_pages(self, get: mock.Mock):
+        """Test that the pages fetched concurrently are returned in order, up to the first short page"""
+        mocked_service_accounts = self._create_mock_it_service_accounts(250)
+
+        get.__name__ = "get"
+        get.side_effect = lambda **kwargs: mock.Mock(
+            json=lambda: mocked_service_accounts[kwargs["params"]["first"] : kwargs["params"]["first"] + 100],
+            status_code=status.HTTP_200_OK,
+        )
+
+        result: list[dict] = self.it_service.request_service_accounts(bearer_token="bearer-token-mock")
+
+        self.assertEqual(
+            sorted(call.kwargs["params"]["first"] for call in get.call_args_list),
+            [0, 100, 200, 300],
+        )
+        self.assertEqual([sa["clientId"] for sa in result], [sa["clientId"] for sa in mocked_service_accounts])
+
+    @override_settings(IT_SERVICE_ACCOUNTS_CACHE_TTL=300, IT_SERVICE_ACCOUNTS_CACHE_REFRESH_INTERVAL=30)
+    @mock.patch("management.principal.it_service.ServiceAccountCache")
+    @mock.patch("management.principal.it_service.ITService.request_service_accounts")
+    def test_request_service_accounts_directory(self, request_service_accounts: mock.Mock, cache_class: mock.Mock):
+        """Test that the service accounts of a tenant are served from the cached directory, unless it is stale"""
+        cache = cache_class.return_value
+        client_id = str(uuid.uuid4())
+        new_client_id = str(uuid.uuid4())
+        service_accounts = [{"clientId": client_id}]
+        request_service_accounts.return_value = [{"clientId": client_id}, {"clientId": new_client_id}]
+        user = User()
+        user.org_id = "12345"
+        user.admin = True
+        user.bearer_token = "bearer-token-mock"
+
+        # Nothing cached yet.
+        cache.get_service_accounts.return_value = None
+        result = self.it_service.request_service_accounts_directory(user=user, client_ids=[client_id])
+        self.assertEqual(result, request_service_accounts.return_value)
+        cache.save_service_accounts.assert_called_once_with("12345", request_service_accounts.return_value)
+
+        # A directory which has every requested service account.
+        request_service_accounts.reset_mock()
+        cache.get_service_accounts.return_value = {"service_accounts": service_accounts, "fetched": time.time() - 60}
+        result = self.it_service.request_service_accounts_directory(user=user, client_ids=[client_id])
+        self.assertEqual(result, service_accounts)
+        request_service_accounts.assert_not_called()
+
+        # A recent directory is not fetched again, even if it misses a service account.
+        cache.get_service_accounts.return_value = {"service_accounts": service_accounts, "fetched": time.time()}
+        result = self.it_service.request_service_accounts_directory(user=user, client_ids=[new_client_id])
+        self.assertEqual(result, service_accounts)
+        request_service_accounts.assert_not_called()
+
+        # An older directory which misses a service account is fetched again.
+        cache.get_service_accounts.return_value = {"service_accounts": service_accounts, "fetched": time.time() - 60}
+        result = self.it_service.request_service_accounts_directory(user=user, client_ids=[new_client_id])
+        self.assertEqual(result, request_service_accounts.return_value)
+        request_service_accounts.assert_called_once_with(bearer_token="bearer-token-mock")
+
+        # Users who aren't org admins may see fewer service accounts, so they always get them from IT.
+        request_service_accounts.reset_mock()
+        cache.reset_mock()
+        user.admin = False
+        cache.get_service_accounts.return_value = {"service_accounts": service_accounts, "fetched": time.time()}
+        result = self.it_service.request_service_accounts_directory(user=user, client_ids=[client_id])
+        self.assertEqual(result, request_service_accounts.return_value)
+        cache.get_service_accounts.assert_not_called()
+        cache.save_service_accounts.assert_not_called()
+
+    @override_settings(IT_SERVICE_ACCOUNTS_CACHE_TTL=300, IT_SERVICE_ACCOUNTS_CACHE_REFRESH_INTERVAL=30)
+    @mock.patch("management.principal.it_service.ServiceAccountCache")
+    @mock.patch("management.principal.it_service.ITService.request_service_accounts")
+    def test_is_service_account_valid_skips_directory(
+        self, request_service_accounts: mock.Mock, cache_class: mock.Mock
+    ):
+        """Test that service accounts are validated against IT, even when a cached directory still lists them"""
+        client_id = str(uuid.uuid4())
+        cache_class.return_value.get_service_accounts.return_value = {
+            "service_accounts": [{"clientId": client_id}],
+            "fetched": time.time(),
+        }
+        request_service_accounts.return_value = []
+        user = User()
+        user.org_id = "12345"
+        user.admin = True
+        user.bearer_token = "bearer-token-mock"
+
+        self.assertFalse(self.it_service._is_service_account_valid(user=user, client_id=client_id))
+        request_service_accounts.assert_called_once_with(bearer_token="bearer-token-mock")
+        cache_class.return_value.get_service_accounts.assert_not_called()
+
     @mock.patch("management.principal.it_service.requests.get")
     def test_request_service_accounts_unexpected_status_code(self, get: mock.Mock):
         """Test that the function under test raises an exception when an unexpected status code is received from IT"""
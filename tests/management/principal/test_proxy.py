@@ -17,10 +17,11 @@
 """Test the principal proxy."""
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from rest_framework import status
 import requests
-from management.principal.proxy import PrincipalProxy
+from management.cache import LocalPrincipalCache
+from management.principal.proxy import PrincipalProxy, bop_session
 
 
 class MockResponse:  # pylint: disable=too-few-public-methods
@@ -212,3 +213,72 @@ class PrincipalProxyTest(TestCase):
             "errors": [{"detail": "Unexpected error.", "status": "500", "source": "principals"}],
         }
         self.assertEqual(expected, result)
+
+    def test_bop_session_shared(self):
+        """Test that the requests to BOP of a process share one keep-alive session."""
+        self.assertIs(bop_session(), bop_session())
+        self.assertIsInstance(bop_session(), requests.Session)
+
+    @override_settings(PRINCIPAL_CACHE_TTL=60)
+    @patch("management.cache.PrincipalCache.save")
+    @patch("management.cache.PrincipalCache.get_cached", return_value=None)
+    @patch("management.principal.proxy.PrincipalProxy.request_filtered_principals")
+    def test_request_principal_cached(self, mock_request, get_cached, save):
+        """Test that a found principal is served from the cache on the next lookup."""
+        mock_request.return_value = {"status_code": status.HTTP_200_OK, "data": [{"username": "test_user"}]}
+        proxy = PrincipalProxy()
+        with patch("management.cache._local_principals", LocalPrincipalCache(maxsize=10, ttl=60)):
+            first = proxy.request_principal("test_user", org_id="1234", options={"status": "enabled"})
+            first["data"][0]["is_org_admin"] = True
+            second = proxy.request_principal("TEST_USER", org_id="1234", options={"status": "enabled"})
+            other = proxy.request_principal("test_user", org_id="1234", options={"status": "all"})
+
+        self.assertEqual(second, {"status_code": status.HTTP_200_OK, "data": [{"username": "test_user"}]})
+        self.assertEqual(other, second)
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(save.call_count, 2)
+
+    @override_settings(PRINCIPAL_CACHE_TTL=60)
+    @patch("management.cache.PrincipalCache.save")
+    @patch("management.cache.PrincipalCache.get_cached", return_value=None)
+    @patch("management.principal.proxy.PrincipalProxy.request_filtered_principals")
+    def test_request_cached_filtered_principals(self, mock_request, get_cached, save):
+        """Test that only the principals missing from the cache are requested, and the order is kept."""
+        mock_request.side_effect = lambda usernames, **kwargs: {
+            "status_code": status.HTTP_200_OK,
+            "data": [{"username": username} for username in usernames],
+        }
+        proxy = PrincipalProxy()
+        with patch("management.cache._local_principals", LocalPrincipalCache(maxsize=10, ttl=60)):
+            proxy.request_cached_filtered_principals(["user_a", "user_b"], org_id="1234")
+            result = proxy.request_cached_filtered_principals(["user_b", "user_c", "user_a"], org_id="1234")
+            single = proxy.request_principal("user_c", org_id="1234")
+
+        self.assertEqual(
+            result,
+            {
+                "status_code": status.HTTP_200_OK,
+                "data": [{"username": "user_b"}, {"username": "user_c"}, {"username": "user_a"}],
+            },
+        )
+        self.assertEqual(single["data"], [{"username": "user_c"}])
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertEqual(mock_request.call_args.args[0], ["user_c"])
+        self.assertEqual(save.call_count, 3)
+
+    @override_settings(PRINCIPAL_CACHE_TTL=60)
+    @patch("management.cache.PrincipalCache.save")
+    @patch("management.cache.PrincipalCache.get_cached", return_value=None)
+    @patch(
+        "management.principal.proxy.PrincipalProxy.request_filtered_principals",
+        return_value={"status_code": status.HTTP_200_OK, "data": []},
+    )
+    def test_request_principal_not_found_not_cached(self, mock_request, get_cached, save):
+        """Test that a principal which was not found is looked up again."""
+        proxy = PrincipalProxy()
+        with patch("management.cache._local_principals", LocalPrincipalCache(maxsize=10, ttl=60)):
+            proxy.request_principal("test_user", org_id="1234")
+            proxy.request_principal("test_user", org_id="1234")
+
+        self.assertEqual(mock_request.call_count, 2)
+        save.assert_not_called()
@@ -0,0 +1,79 @@
+#
+# Copyright 2024 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""A local, in-process fake of the Relations API gRPC server."""
+import threading
+from concurrent import futures
+
+import grpc
+from kessel.relations.v1beta1 import relation_tuples_pb2
+from kessel.relations.v1beta1 import relation_tuples_pb2_grpc
+
+
+class FakeTupleService(relation_tuples_pb2_grpc.KesselTupleServiceServicer):
+    """Records the CreateTuples requests, optionally failing the first ones."""
+
+    def __init__(self):
+        """Initialize the service."""
+        self.requests = []
+        self.failures = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0
+        self._lock = threading.Lock()
+
+    def CreateTuples(self, request, context):
+        """Record the request, or fail it with the next queued status code."""
+        with self._lock:
+            failure = self.failures.pop(0) if self.failures else None
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if failure is not None:
+                context.abort(failure, "Fake failure")
+            if self.delay:
+                threading.Event().wait(self.delay)
+            with self._lock:
+                self.requests.append(request)
+            return relation_tuples_pb2.CreateTuplesResponse()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+class FakeRelationsApiServer:
+    """Runs a FakeTupleService on a free local port."""
+
+    def __init__(self):
+        """Initialize the server."""
+        self.service = FakeTupleService()
+        self._server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+        relation_tuples_pb2_grpc.add_KesselTupleServiceServicer_to_server(self.service, self._server)
+        self.port = self._server.add_insecure_port("localhost:0")
+
+    @property
+    def address(self):
+        """Address to use as RELATION_API_SERVER."""
+        return f"localhost:{self.port}"
+
+    def __enter__(self):
+        """Start the server."""
+        self._server.start()
+        return self
+
+    def __exit__(self, *args):
+        """Stop the server."""
+        self._server.stop(grace=None)
@@ -0,0 +1,102 @@
+#
+# Copyright 2024 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Test the outbox replicators."""
+from unittest.mock import patch
+
+from django.db.models import signals
+from django.test import TestCase
+from management.models import Outbox
+from management.relation_replicator.outbox_replicator import BufferedOutboxReplicator, OutboxReplicator
+from management.relation_replicator.relation_replicator import ReplicationEvent, ReplicationEventType
+from migration_tool.utils import create_relationship
+
+
+def _event(partition_key, role_id):
+    """Build a replication event for the given aggregate."""
+    return ReplicationEvent(
+        event_type=ReplicationEventType.CREATE_CUSTOM_ROLE,
+        partition_key=partition_key,
+        add=[create_relationship(("rbac", "role"), role_id, ("rbac", "principal"), "localhost/1", "member")],
+        info={"role_uuid": role_id},
+    )
+
+
+class BufferedOutboxReplicatorTest(TestCase):
+    """Test the buffered outbox replicator."""
+
+    def setUp(self):
+        """Record the outbox rows as they are inserted."""
+        self.inserted = []
+        signals.post_save.connect(self._record, sender=Outbox)
+        self.addCleanup(signals.post_save.disconnect, self._record, sender=Outbox)
+
+    def _record(self, sender=None, instance=None, **kwargs):
+        self.inserted.append(instance.payload["relations_to_add"][0]["resource"]["id"])
+
+    def test_events_written_in_batches_preserving_order(self):
+        """Test that buffered events are written with one insert and one delete per batch, in order."""
+        replicator = BufferedOutboxReplicator(batch_size=3)
+        with patch.object(Outbox.objects, "bulk_create", wraps=Outbox.objects.bulk_create) as bulk_create:
+            with replicator.atomic():
+                for i in range(4):
+                    replicator.replicate(_event("aggregate", f"role-{i}"))
+                self.assertEqual(bulk_create.call_count, 1)
+            self.assertEqual(bulk_create.call_count, 1)
+            written = [
+                record.payload["relations_to_add"][0]["resource"]["id"] for record in bulk_create.call_args[0][0]
+            ]
+
+        self.assertEqual(written, ["role-0", "role-1", "role-2"])
+        # The last event is written on its own before the transaction commits.
+        self.assertEqual(self.inserted, ["role-3"])
+        self.assertFalse(Outbox.objects.exists())
+
+    def test_events_dropped_on_rollback(self):
+        """Test that no events are written when the block fails."""
+        replicator = BufferedOutboxReplicator()
+        with patch.object(OutboxReplicator, "_write_records") as write_records:
+            with self.assertRaises(ValueError):
+                with replicator.atomic():
+                    replicator.replicate(_event("aggregate", "role-0"))
+                    raise ValueError()
+            write_records.assert_not_called()
+
+    def test_nested_rollback_keeps_outer_events(self):
+        """Test that a failed nested block only drops its own events."""
+        replicator = BufferedOutboxReplicator()
+        with patch.object(OutboxReplicator, "_write_records") as write_records:
+            with replicator.atomic():
+                replicator.replicate(_event("aggregate", "role-0"))
+                try:
+                    with replicator.atomic():
+                        replicator.replicate(_event("aggregate", "role-1"))
+                        raise ValueError()
+                except ValueError:
+                    pass
+                replicator.replicate(_event("aggregate", "role-2"))
+
+        written = [
+            [record.payload["relations_to_add"][0]["resource"]["id"] for record in call.args[0]]
+            for call in write_records.call_args_list
+        ]
+        self.assertEqual(written, [["role-0"], ["role-2"]])
+
+    def test_event_written_immediately_outside_atomic(self):
+        """Test that events replicated outside of atomic() are not buffered."""
+        BufferedOutboxReplicator().replicate(_event("aggregate", "role-0"))
+        self.assertEqual(self.inserted, ["role-0"])
+        self.assertFalse(Outbox.objects.exists())
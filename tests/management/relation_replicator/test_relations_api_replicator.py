@@ -0,0 +1,98 @@
+#
+# Copyright 2024 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Test the Relations API replicator."""
+import grpc
+from django.test import SimpleTestCase, override_settings
+from management.relation_replicator.relation_replicator import ReplicationEvent, ReplicationEventType
+from management.relation_replicator.relations_api_replicator import RelationsApiReplicator, channel_pool
+from migration_tool.utils import create_relationship
+
+from tests.management.relation_replicator.fake_relations_api import FakeRelationsApiServer
+
+
+def _event(count):
+    """Build an event adding the given number of tuples."""
+    return ReplicationEvent(
+        event_type=ReplicationEventType.MIGRATE_CUSTOM_ROLE,
+        partition_key="rbactodo",
+        add=[
+            create_relationship(("rbac", "role_binding"), f"binding_{i}", ("rbac", "role"), "role", "role")
+            for i in range(count)
+        ],
+    )
+
+
+class RelationsApiReplicatorTest(SimpleTestCase):
+    """Test the Relations API replicator against a local fake server."""
+
+    def setUp(self):
+        """Start the fake server and point the channel pool at it."""
+        self.server = FakeRelationsApiServer().__enter__()
+        self.addCleanup(self.server.__exit__)
+        settings_override = override_settings(
+            RELATION_API_SERVER=self.server.address,
+            RELATION_API_MAX_TUPLES_PER_REQUEST=10,
+            RELATION_API_MAX_IN_FLIGHT=2,
+            RELATION_API_RETRY_BACKOFF=0,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        channel_pool.close()
+        self.addCleanup(channel_pool.close)
+
+    def test_tuples_written_in_chunks(self):
+        """Test that the tuples are split into requests of the configured size."""
+        RelationsApiReplicator().replicate(_event(25))
+
+        sizes = sorted(len(request.tuples) for request in self.server.service.requests)
+        self.assertEqual(sizes, [5, 10, 10])
+        ids = {t.resource.id for request in self.server.service.requests for t in request.tuples}
+        self.assertEqual(len(ids), 25)
+
+    def test_in_flight_requests_bounded(self):
+        """Test that no more than the configured number of requests are in flight at once."""
+        self.server.service.delay = 0.05
+        RelationsApiReplicator().replicate(_event(60))
+
+        self.assertEqual(len(self.server.service.requests), 6)
+        self.assertLessEqual(self.server.service.max_in_flight, 2)
+
+    def test_channels_reused(self):
+        """Test that consecutive calls share the pooled channels."""
+        RelationsApiReplicator().replicate(_event(1))
+        channels = list(channel_pool._channels)
+        RelationsApiReplicator().replicate(_event(1))
+
+        self.assertEqual(len(channels), 2)
+        self.assertEqual(channel_pool._channels, channels)
+        self.assertEqual(len(self.server.service.requests), 2)
+
+    def test_transient_errors_retried(self):
+        """Test that transient errors are retried and the tuples eventually written."""
+        self.server.service.failures = [grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.RESOURCE_EXHAUSTED]
+        RelationsApiReplicator().replicate(_event(5))
+
+        self.assertEqual(len(self.server.service.requests), 1)
+
+    def test_permanent_errors_not_retried(self):
+        """Test that non transient errors are logged without retrying."""
+        self.server.service.failures = [grpc.StatusCode.INVALID_ARGUMENT, grpc.StatusCode.INVALID_ARGUMENT]
+        with self.assertLogs("management.relation_replicator.relations_api_replicator", level="ERROR"):
+            RelationsApiReplicator().replicate(_event(5))
+
+        self.assertEqual(len(self.server.service.requests), 0)
+        self.assertEqual(self.server.service.failures, [grpc.StatusCode.INVALID_ARGUMENT])
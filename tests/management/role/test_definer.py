@@ -354,3 +354,67 @@ class RoleDefinerTests(IdentityRequest):
             self.assertTrue(
                 any(self.is_remove_event("inventory_hosts_read", args[0]) for args, _ in mock_replicate.call_args_list)
             )
+
+    @patch("management.relation_replicator.outbox_replicator.OutboxReplicator.replicate")
+    @patch(
+        "builtins.open",
+        new_callable=mock_open,
+        read_data='{"roles": [{"name": "dummy_role_update", "system": true, "version": 3, "access": ['
+        '{"permission": "dummy:hosts:read"}, {"permission": "dummy:hosts:write"}]}]}',
+    )
+    @patch("os.listdir")
+    @patch("os.path.isfile")
+    def test_seed_roles_update_role_only_changed_access(
+        self,
+        mock_isfile,
+        mock_listdir,
+        mock_open,
+        mock_replicate,
+    ):
+        """Test that a version bump keeps the unchanged access and replicates only the changed relations."""
+        mock_listdir.return_value = ["role.json"]
+        mock_isfile.return_value = True
+
+        role = Role.objects.create(name="dummy_role_update", system=True, version=1, tenant=self.public_tenant)
+        read, _ = Permission.objects.get_or_create(permission="dummy:hosts:read", tenant=self.public_tenant)
+        delete, _ = Permission.objects.get_or_create(permission="dummy:hosts:delete", tenant=self.public_tenant)
+        kept_access = Access.objects.create(permission=read, role=role, tenant=self.public_tenant)
+        Access.objects.create(permission=delete, role=role, tenant=self.public_tenant)
+
+        seed_roles()
+
+        role.refresh_from_db()
+        self.assertEqual(role.version, 3)
+        self.assertEqual(
+            set(role.access.values_list("permission__permission", flat=True)),
+            {"dummy:hosts:read", "dummy:hosts:write"},
+        )
+        self.assertTrue(role.access.filter(id=kept_access.id).exists())
+
+        update_events = [
+            args[0]
+            for args, _ in mock_replicate.call_args_list
+            if args[0].event_type == ReplicationEventType.UPDATE_SYSTEM_ROLE
+        ]
+        self.assertEqual(len(update_events), 1)
+        self.assertEqual([t.relation for t in update_events[0].add], ["dummy_hosts_write"])
+        self.assertEqual([t.relation for t in update_events[0].remove], ["dummy_hosts_delete"])
+
+    @patch("management.role.definer._seed_system_roles", side_effect=Exception("seeding failed"))
+    @patch("management.role.definer.destructive_ok", return_value=True)
+    @patch("builtins.open", new_callable=mock_open, read_data='{"roles": []}')
+    @patch("os.listdir")
+    @patch("os.path.isfile")
+    def test_seed_roles_in_parallel_failure_keeps_roles(
+        self, mock_isfile, mock_listdir, mock_open, mock_destructive_ok, mock_seed_system_roles
+    ):
+        """Test that roles are not removed when a role definition file failed to seed in parallel."""
+        mock_listdir.return_value = ["role.json", "other.json"]
+        mock_isfile.return_value = True
+        role = Role.objects.create(name="dummy_role_keep", system=True, tenant=self.public_tenant)
+
+        with self.settings(PARALLEL_ROLE_SEEDING_ENABLED=True, MAX_SEED_THREADS=2):
+            seed_roles()
+
+        self.assertEqual(mock_seed_system_roles.call_count, 2)
+        self.assertTrue(Role.objects.filter(id=role.id).exists())
@@ -21,7 +21,8 @@ from uuid import uuid4
 
 from django.conf import settings
 from django.core.serializers.json import DjangoJSONEncoder
-from django.test.utils import override_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse, resolve
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -1127,6 +1128,39 @@ class RoleViewsetTests(IdentityRequest):
         self.assertEqual(admin_role["groups_in_count"], 1)
         self.assertEqual(admin_role["groups_in"][0]["name"], self.group.name)
 
+    def test_list_role_with_additional_fields_queries_per_page(self):
+        """Test that the queries to list the roles with all the fields don't grow with the number of roles."""
+
+        def add_roles(start, count):
+            for i in range(start, start + count):
+                role = Role.objects.create(name=f"listed role {i}", tenant=self.tenant)
+                Access.objects.create(permission=self.permission, role=role, tenant=self.tenant)
+                ExtRoleRelation.objects.create(role=role, ext_tenant=self.ext_tenant, ext_id=f"ext{i}")
+                self.policy.roles.add(role)
+
+        url = f"{URL}?add_fields=groups_in_count,groups_in,access&limit=20"
+        client = APIClient()
+        add_roles(0, 2)
+        client.get(url, **self.headers)
+        with CaptureQueriesContext(connection) as few_roles:
+            response = client.get(url, **self.headers)
+        self.assertEqual(response.data.get("meta").get("count"), 6)
+
+        add_roles(2, 10)
+        with CaptureQueriesContext(connection) as many_roles:
+            response = client.get(url, **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data.get("meta").get("count"), 16)
+        role = next(role for role in response.data.get("data") if role["name"] == "listed role 9")
+        self.assertEqual(role["groups_in_count"], 1)
+        self.assertEqual(role["groups_in"][0]["name"], self.group.name)
+        self.assertEqual(role["applications"], ["app"])
+        self.assertEqual(role["access"][0]["permission"], self.permission.permission)
+        self.assertEqual(role["external_role_id"], "ext9")
+        self.assertEqual(role["external_tenant"], self.ext_tenant.name)
+        self.assertEqual(len(many_roles), len(few_roles))
+
     def test_list_role_with_username_forbidden_to_nonadmin(self):
         """Test that non admin can not read a list of roles for username."""
         # Setup non admin request
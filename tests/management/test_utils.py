@@ -120,6 +120,26 @@ class UtilsTests(IdentityRequest):
         access = access_for_principal(self.principal, self.tenant, **kwargs)
         self.assertCountEqual(access, [self.accessA, self.default_access])
 
+    def test_access_for_principal_single_query(self):
+        """Test that the whole principal to access chain is resolved with a single query."""
+        kwargs = {"application": "app", "is_org_admin": True}
+        with self.assertNumQueries(1):
+            access = list(access_for_principal(self.principal, self.tenant, **kwargs))
+        self.assertCountEqual(access, [self.accessA, self.default_access, self.default_admin_access])
+
+    def test_groups_for_principal_public_default_fallback(self):
+        """Test that the public tenant's default group is used when the tenant has no custom one."""
+        public_tenant = Tenant.objects.get(tenant_name="public")
+        public_default_group = Group.objects.create(
+            name="public default group", system=True, platform_default=True, tenant=public_tenant
+        )
+        groups = groups_for_principal(self.principal, self.tenant)
+        self.assertCountEqual(groups, [self.groupA, self.default_group])
+
+        self.default_group.delete()
+        groups = groups_for_principal(self.principal, self.tenant)
+        self.assertCountEqual(groups, [self.groupA, public_default_group])
+
     def test_groups_for_principal(self):
         """Test that we get the correct groups for a principal."""
         groups = groups_for_principal(self.principal, self.tenant)
@@ -0,0 +1,85 @@
+#
+# Copyright 2024 Red Hat, Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+"""Test the in-memory tuple store."""
+from django.test import SimpleTestCase
+
+from migration_tool.in_memory_tuples import (
+    InMemoryTuples,
+    all_of,
+    one_of,
+    relation,
+    resource,
+    resource_type,
+    subject,
+)
+from migration_tool.utils import create_relationship
+
+
+def _binding(binding_id, group_id):
+    return create_relationship(("rbac", "role_binding"), binding_id, ("rbac", "group"), group_id, "subject", "member")
+
+
+class InMemoryTuplesTests(SimpleTestCase):
+    """Test the in-memory tuple store."""
+
+    def setUp(self):
+        """Set up a store with a few bindings."""
+        self.store = InMemoryTuples()
+        self.store.write(
+            add=[_binding("b1", "g1"), _binding("b1", "g2"), _binding("b2", "g1")],
+            remove=[],
+        )
+
+    def test_indexed_and_scanned_queries_agree(self):
+        """Test that queries answered from the indexes match a full scan."""
+        predicates = [
+            resource("rbac", "role_binding", "b1"),
+            subject("rbac", "group", "g1", "member"),
+            relation("subject"),
+            all_of(
+                resource("rbac", "role_binding", "b1"), relation("subject"), subject("rbac", "group", "g2", "member")
+            ),
+            one_of(resource("rbac", "role_binding", "b2"), subject("rbac", "group", "g2", "member")),
+            resource_type("rbac", "role_binding"),
+        ]
+        for predicate in predicates:
+            scanned = [rel for rel in self.store._tuples if predicate(rel)]
+            self.assertCountEqual(self.store.find_tuples(predicate), scanned, predicate)
+
+    def test_indexed_query_only_tests_candidates(self):
+        """Test that an indexed query only evaluates the tuples of the smallest index entry."""
+        tested = []
+        predicate = all_of(resource("rbac", "role_binding", "b2"), relation("subject"))
+        func = predicate.func
+        predicate.func = lambda rel: tested.append(rel) or func(rel)
+
+        self.assertEqual(len(self.store.find_tuples(predicate)), 1)
+        self.assertEqual(len(tested), 1)
+
+    def test_indexes_follow_removals(self):
+        """Test that removed tuples are no longer found through the indexes."""
+        self.store.remove(_binding("b1", "g1"))
+        self.assertEqual(self.store.count_tuples(subject("rbac", "group", "g1", "member")), 1)
+        self.assertEqual(self.store.count_tuples(resource("rbac", "role_binding", "b1")), 1)
+
+        self.store.clear()
+        self.assertEqual(self.store.count_tuples(relation("subject")), 0)
+
+    def test_invalid_ids_rejected(self):
+        """Test that tuples with invalid ids are rejected."""
+        with self.assertRaises(ValueError):
+            self.store.add(_binding("b 1", "g1"))
@@ -157,3 +157,21 @@ class MigrateTests(TestCase):
             call(f"workspace:{workspace_2}#binding@role_binding:{rolebinding_a32}"),
         ]
         logger_mock.info.assert_has_calls(tuples, any_order=True)
+
+    @patch("management.relation_replicator.logging_replicator.logger")
+    def test_migration_continues_after_failure_and_resumes(self, logger_mock):
+        """Test that a failed tenant is checkpointed without stopping the others, and retried on resume."""
+        # The other tenant has no default workspace, so its migration fails.
+        migrate_data(exclude_apps=["app1"], orgs=["1234567", "7654321"])
+
+        checkpoints = {c.tenant.org_id: c for c in TenantMigrationCheckpoint.objects.select_related("tenant")}
+        self.assertEqual(checkpoints["1234567"].status, TenantMigrationCheckpoint.Status.COMPLETED)
+        self.assertIsNotNone(checkpoints["1234567"].completed)
+        self.assertEqual(checkpoints["7654321"].status, TenantMigrationCheckpoint.Status.FAILED)
+        self.assertTrue(checkpoints["7654321"].error)
+
+        migrate_data(exclude_apps=["app1"], orgs=["1234567", "7654321"], resume=True)
+
+        checkpoints = {c.tenant.org_id: c for c in TenantMigrationCheckpoint.objects.select_related("tenant")}
+        self.assertEqual(checkpoints["1234567"].attempts, 1)
+        self.assertEqual(checkpoints["7654321"].attempts, 2)
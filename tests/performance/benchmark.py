@@ -0,0 +1,318 @@
+# Load test harness for the RBAC API
+#
+# A scenario is a list of GET requests built from the data generated by test_performance_util.setUp. The requests
+# are sent through the Django test client from a pool of threads, each with its own client and database connection,
+# and the latency and number of queries of every request are recorded.
+
+import json
+import logging
+import math
+import subprocess
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Callable
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.models import Tenant
+from management.models import Group, Principal
+
+from tests.performance.test_performance_util import PREFIX, build_identity
+
+THREADS = 10
+# Maximum number of requests sent by each scenario
+MAX_REQUESTS = 1000
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+@dataclass
+class Scenario:
+    """A named list of requests, built lazily by the given function which takes the maximum number of requests."""
+
+    name: str
+    build_requests: Callable[[int], list]
+
+
+@dataclass
+class ScenarioResult:
+    """Latency and query count statistics of a scenario run."""
+
+    name: str
+    requests: int
+    errors: int
+    threads: int
+    total_seconds: float
+    requests_per_second: float
+    mean_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    queries_mean: float
+    queries_max: int
+
+
+def percentile(sorted_values, pct):
+    """Return the nearest-rank percentile of the sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+
+def _perf_tenants(limit):
+    """Return the generated tenants."""
+    return Tenant.objects.filter(tenant_name__startswith=f"{PREFIX}_acct").order_by("id")[:limit]
+
+
+def _perf_principals(limit):
+    """Return the generated principals with their tenant."""
+    return (
+        Principal.objects.filter(username__startswith=f"{PREFIX}_principal_")
+        .select_related("tenant")
+        .order_by("id")[:limit]
+    )
+
+
+def _perf_groups(limit):
+    """Return the generated groups with their tenant."""
+    return Group.objects.filter(name__startswith=f"{PREFIX}_group_").select_related("tenant").order_by("id")[:limit]
+
+
+def _org_admin_headers(tenant):
+    """Return the identity headers of an org admin of the tenant."""
+    return build_identity(org_id=tenant.org_id, username=f"{PREFIX}_admin_{tenant.org_id}", is_internal=False).META
+
+
+def _principal_headers(principal):
+    """Return the identity headers of a principal who isn't an org admin."""
+    return build_identity(
+        org_id=principal.tenant.org_id,
+        username=principal.username,
+        user_id=principal.user_id,
+        is_org_admin=False,
+        is_internal=False,
+    ).META
+
+
+def _integration_url(org_id, path):
+    return f"/_private/api/v1/integrations/tenant/{org_id}/{path}?external_tenant=ocm"
+
+
+def _access_requests(limit):
+    url = f"{reverse('v1_management:access')}?application={PREFIX}"
+    return [(url, _principal_headers(principal)) for principal in _perf_principals(limit)]
+
+
+def _groups_requests(limit):
+    url = reverse("v1_management:group-list")
+    return [(url, _org_admin_headers(tenant)) for tenant in _perf_tenants(limit)]
+
+
+def _roles_requests(limit):
+    url = f"{reverse('v1_management:role-list')}?add_fields=groups_in_count"
+    return [(url, _org_admin_headers(tenant)) for tenant in _perf_tenants(limit)]
+
+
+def _principals_requests(limit):
+    url = reverse("v1_management:principals")
+    return [(url, _org_admin_headers(tenant)) for tenant in _perf_tenants(limit)]
+
+
+def _tenant_groups_requests(limit):
+    identity = build_identity().META
+    return [(_integration_url(tenant.org_id, "groups/"), identity) for tenant in _perf_tenants(limit)]
+
+
+def _tenant_roles_requests(limit):
+    identity = build_identity().META
+    return [(_integration_url(tenant.org_id, "roles/"), identity) for tenant in _perf_tenants(limit)]
+
+
+def _group_roles_requests(limit):
+    identity = build_identity().META
+    return [
+        (_integration_url(group.tenant.org_id, f"groups/{group.uuid}/roles/"), identity)
+        for group in _perf_groups(limit)
+    ]
+
+
+def _principals_groups_requests(limit):
+    identity = build_identity().META
+    return [
+        (_integration_url(principal.tenant.org_id, f"principal/{principal.username}/groups/"), identity)
+        for principal in _perf_principals(limit)
+    ]
+
+
+def _principals_roles_requests(limit):
+    identity = build_identity().META
+    requests = []
+    for group in _perf_groups(limit).prefetch_related("principals"):
+        for principal in group.principals.all():
+            path = f"principal/{principal.username}/groups/{group.uuid}/roles/"
+            requests.append((_integration_url(group.tenant.org_id, path), identity))
+            if len(requests) == limit:
+                return requests
+    return requests
+
+
+def _full_sync_requests(limit):
+    """Return the requests of an OCM full sync: the tenants, then the groups, roles and principals of each."""
+    identity = build_identity().META
+    requests = [("/_private/api/v1/integrations/tenant/?external_tenant=ocm&modified_only=true", identity)]
+    for tenant in _perf_tenants(limit).prefetch_related("group_set"):
+        requests.append((_integration_url(tenant.org_id, "groups/"), identity))
+        for group in tenant.group_set.all():
+            requests.append((_integration_url(tenant.org_id, f"groups/{group.uuid}/roles/"), identity))
+            path = f"groups/{group.uuid}/principals/"
+            requests.append((f"{_integration_url(tenant.org_id, path)}&username_only=true", identity))
+    return requests[:limit]
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("access", _access_requests),
+        Scenario("groups", _groups_requests),
+        Scenario("roles", _roles_requests),
+        Scenario("principals", _principals_requests),
+        Scenario("tenant_groups", _tenant_groups_requests),
+        Scenario("tenant_roles", _tenant_roles_requests),
+        Scenario("group_roles", _group_roles_requests),
+        Scenario("principals_groups", _principals_groups_requests),
+        Scenario("principals_roles", _principals_roles_requests),
+        Scenario("full_sync", _full_sync_requests),
+    )
+}
+INTEGRATION_SCENARIOS = [
+    "full_sync",
+    "tenant_groups",
+    "tenant_roles",
+    "group_roles",
+    "principals_roles",
+    "principals_groups",
+]
+
+
+def _timed_request(request):
+    """Send a request with the client of the current thread, returning its latency, query count and status."""
+    if not hasattr(_local, "client"):
+        _local.client = APIClient()
+    url, headers = request
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        response = _local.client.get(url, follow=True, **headers)
+        elapsed = time.perf_counter() - start
+    return elapsed, len(queries), response.status_code
+
+
+def run_scenario(scenario, threads=THREADS, max_requests=MAX_REQUESTS):
+    """Run a scenario and return its statistics."""
+    requests = scenario.build_requests(max_requests)
+    print(f"Running {scenario.name}: {len(requests)} requests in {threads} threads...")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        samples = list(executor.map(_timed_request, requests))
+    total = time.perf_counter() - start
+
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in samples)
+    queries = [count for _, count, _ in samples]
+    errors = [status for _, _, status in samples if status >= 400]
+    if errors:
+        logger.warning(
+            "Scenario %s received %s error responses, e.g. status %s.", scenario.name, len(errors), errors[0]
+        )
+
+    result = ScenarioResult(
+        name=scenario.name,
+        requests=len(samples),
+        errors=len(errors),
+        threads=threads,
+        total_seconds=round(total, 3),
+        requests_per_second=round(len(samples) / total, 2) if total else 0.0,
+        mean_ms=round(sum(latencies) / len(latencies), 2) if latencies else 0.0,
+        p50_ms=round(percentile(latencies, 50), 2),
+        p95_ms=round(percentile(latencies, 95), 2),
+        p99_ms=round(percentile(latencies, 99), 2),
+        max_ms=round(latencies[-1], 2) if latencies else 0.0,
+        queries_mean=round(sum(queries) / len(queries), 2) if queries else 0.0,
+        queries_max=max(queries, default=0),
+    )
+    print(
+        f"{result.name}: {result.requests} requests, {result.errors} errors, {result.requests_per_second} req/s, "
+        f"p50 {result.p50_ms}ms, p95 {result.p95_ms}ms, p99 {result.p99_ms}ms, {result.queries_mean} queries/req"
+    )
+    return result
+
+
+def _git_commit():
+    """Return the commit being benchmarked, if known."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_benchmark(scenario_names=None, threads=THREADS, max_requests=MAX_REQUESTS, output=None):
+    """Run the given scenarios (all by default) and write the results as JSON to the output file, if any."""
+    results = [
+        run_scenario(SCENARIOS[name], threads=threads, max_requests=max_requests)
+        for name in scenario_names or SCENARIOS
+    ]
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "threads": threads,
+        "max_requests": max_requests,
+        "results": [asdict(result) for result in results],
+    }
+    if output:
+        with open(output, "w") as result_file:
+            json.dump(report, result_file, indent=2)
+        print(f"Results written to {output}")
+    return report
+
+
+def compare_results(baseline_path, current_path, threshold=0.1):
+    """Compare two result files, printing the change of p95 latency and queries per scenario.
+
+    Returns the names of the scenarios whose p95 latency or mean query count grew by more than the threshold.
+    """
+    with open(baseline_path) as baseline_file, open(current_path) as current_file:
+        baseline = {result["name"]: result for result in json.load(baseline_file)["results"]}
+        current = {result["name"]: result for result in json.load(current_file)["results"]}
+
+    regressions = []
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]
+        p95_change = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] if before["p95_ms"] else 0.0
+        queries_change = (
+            (result["queries_mean"] - before["queries_mean"]) / before["queries_mean"]
+            if before["queries_mean"]
+            else 0.0
+        )
+        regressed = p95_change > threshold or queries_change > threshold
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms ({p95_change:+.0%}), "
+            f"queries {before['queries_mean']} -> {result['queries_mean']} ({queries_change:+.0%})"
+            f"{' REGRESSION' if regressed else ''}"
+        )
+    return regressions
@@ -0,0 +1,60 @@
+# Benchmark of the relation replication outbox writes
+
+import logging
+
+from django.db import transaction
+from management.relation_replicator.outbox_replicator import BufferedOutboxReplicator, OutboxReplicator
+from management.relation_replicator.relation_replicator import ReplicationEvent, ReplicationEventType
+from migration_tool.utils import create_relationship
+
+from tests.performance.test_performance_util import timerStart, timerStop, write_to_logger
+
+N_EVENTS = 10000
+TUPLES_PER_EVENT = 10
+
+logger = logging.getLogger(__name__)
+
+
+def _events():
+    """Build role events spread over a few aggregates, like a tenant migration emits."""
+    events = []
+    for i in range(N_EVENTS):
+        tuples = [
+            create_relationship(("rbac", "role_binding"), f"binding_{i}", ("rbac", "role"), f"role_{j}", "role")
+            for j in range(TUPLES_PER_EVENT)
+        ]
+        events.append(
+            ReplicationEvent(
+                event_type=ReplicationEventType.MIGRATE_CUSTOM_ROLE,
+                partition_key=f"tenant_{i % 10}",
+                add=tuples,
+                info={"role_uuid": f"role_{i}"},
+            )
+        )
+    return events
+
+
+def _replicate(name, replicator, batch):
+    events = _events()
+    start = timerStart(name)
+    with batch():
+        for event in events:
+            replicator.replicate(event)
+    request_time, average = timerStop(start, len(events))
+    write_to_logger(logger, name, "outbox", len(events), request_time, average)
+    return len(events) / request_time
+
+
+def test_outbox_replication():
+    """Compare events/sec of one-by-one outbox writes against the batched writes."""
+    # Silence the per-event logging, which would otherwise dominate both runs.
+    replicator_logger = logging.getLogger("management.relation_replicator.outbox_replicator")
+    level = replicator_logger.level
+    replicator_logger.setLevel(logging.WARNING)
+    try:
+        single = _replicate("Outbox (create and delete per event)", OutboxReplicator(), transaction.atomic)
+        replicator = BufferedOutboxReplicator()
+        batched = _replicate("Outbox (batched)", replicator, replicator.atomic)
+    finally:
+        replicator_logger.setLevel(level)
+    print(f"Batched outbox writes: {batched:.0f} events/sec vs {single:.0f} events/sec ({batched / single:.1f}x)")
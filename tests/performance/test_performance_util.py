@@ -1,121 +1,131 @@
 import time
 
 from base64 import b64encode
+from dataclasses import asdict, dataclass
 from json import dumps as json_dumps
 from unittest.mock import Mock
-from management.role.model import ExtRoleRelation, ExtTenant
+
+from django.db import transaction
+from management.role.model import Access, ExtRoleRelation, ExtTenant
 
 from api.models import Tenant
 from api.common import RH_IDENTITY_HEADER
-from management.models import Group, Principal, Policy, Role
-
-N_TENANTS = 1000
-GROUPS_PER_TENANT = 10
-
-N = 10  # number of roles per group, number of principals per group
-PRINCIPALS_PER_TENANT = 10
+from management.models import Group, Permission, Principal, Policy, Role
 
 PREFIX = "perf_test"
-
-
-def setUp():
-    """Set up the test data."""
-    print("Setting up test data...")
-    tenants = []
-
-    if ExtTenant.objects.filter(name="ocm").exists():
-        ext_tenant = ExtTenant.objects.get(name="ocm")
-    else:
-        ext_tenant = ExtTenant.objects.create(name="ocm")
-
-    def create_tenant(i):
-        account = i
-
-        if Tenant.objects.filter(tenant_name=f"{PREFIX}_acct{account}").exists():
-            t = Tenant.objects.get(tenant_name=f"{PREFIX}_acct{account}")
-        else:
-            t = Tenant.objects.create(
-                org_id=i,
-                account_id=account,
-                tenant_name=f"{PREFIX}_acct{account}",
-            )
-            t.ready = True
-            t.save()
-
-        return t
-
-    # create 2k tenants locally (so 2k different orgs)
-    for i in range(N_TENANTS):
-        tenants.append(create_tenant(i))
-
-    def create_principal(tenant, i, j):
-        username = f"{PREFIX}_principal_{i}_{j}"
-        if Principal.objects.filter(username=username).exists():
-            Principal.objects.get(username=username)
-        else:
-            Principal.objects.create(
-                username=username,
-                tenant=tenant,
-            )
-
-    # for each org, create 10 principals
-    for i in range(N_TENANTS):
-        for j in range(PRINCIPALS_PER_TENANT):
-            create_principal(tenants[i], i, j)
-
-    def create_group(tenant, i, j):
-        name = f"{PREFIX}_group_{i}_{j}"
-        group = None
-        if Group.objects.filter(name=name).exists():
-            group = Group.objects.get(name=name)
-        else:
-            group = Group.objects.create(
-                name=name,
-                tenant=tenant,
+# Number of tenants whose data is created in one transaction
+TENANTS_PER_BATCH = 100
+
+
+@dataclass
+class Scale:
+    """Size of the generated performance test data."""
+
+    tenants: int = 1000
+    groups_per_tenant: int = 10
+    principals_per_tenant: int = 10
+    roles_per_group: int = 10
+    principals_per_group: int = 10
+    permissions_per_role: int = 5
+
+    def as_dict(self):
+        """Return the scale as a dict."""
+        return asdict(self)
+
+
+def _create_permissions(scale):
+    """Create the permissions granted by the generated roles."""
+    public_tenant = Tenant.objects.get(tenant_name="public")
+    names = [f"{PREFIX}:resource_{k}:read" for k in range(scale.permissions_per_role)]
+    Permission.objects.bulk_create(
+        [
+            Permission(
+                permission=name,
+                application=PREFIX,
+                resource_type=name.split(":")[1],
+                verb="read",
+                tenant=public_tenant,
             )
-
-        name = f"{PREFIX}_policy_{i}_{j}"
-        policy = None
-        if Policy.objects.filter(name=name).exists():
-            policy = Policy.objects.get(name=name)
-        else:
-            policy = Policy.objects.create(
-                name=name,
-                tenant=tenant,
+            for name in names
+        ],
+        ignore_conflicts=True,
+    )
+    return list(Permission.objects.filter(permission__in=names))
+
+
+def _create_tenant_data(scale, tenant, ext_tenant, permissions):
+    """Create the principals, groups, policies and roles of a tenant in bulk."""
+    i = tenant.org_id
+    principals = Principal.objects.bulk_create(
+        [
+            Principal(username=f"{PREFIX}_principal_{i}_{j}", user_id=f"{PREFIX}_{i}_{j}", tenant=tenant)
+            for j in range(scale.principals_per_tenant)
+        ]
+    )
+    groups = Group.objects.bulk_create(
+        [Group(name=f"{PREFIX}_group_{i}_{j}", tenant=tenant) for j in range(scale.groups_per_tenant)]
+    )
+    policies = Policy.objects.bulk_create(
+        [Policy(name=f"{PREFIX}_policy_{i}_{j}", group=group, tenant=tenant) for j, group in enumerate(groups)]
+    )
+
+    # For each group, add roles which are OCM roles, so those with an external tenant
+    role_keys = [(j, k) for j in range(scale.groups_per_tenant) for k in range(scale.roles_per_group)]
+    roles = Role.objects.bulk_create(
+        [
+            Role(name=f"{PREFIX}_role_{i}_{j}_{k}", display_name=f"{PREFIX}_role_{i}_{j}_{k}", tenant=tenant)
+            for j, k in role_keys
+        ]
+    )
+    # External ids are limited to 20 characters
+    ExtRoleRelation.objects.bulk_create(
+        [
+            ExtRoleRelation(ext_id=f"perf{i}_{j}_{k}", ext_tenant=ext_tenant, role=role)
+            for (j, k), role in zip(role_keys, roles)
+        ]
+    )
+    Access.objects.bulk_create(
+        [Access(permission=permission, role=role, tenant=tenant) for role in roles for permission in permissions]
+    )
+    Policy.roles.through.objects.bulk_create(
+        [
+            Policy.roles.through(policy=policy, role=role)
+            for j, policy in enumerate(policies)
+            for role in roles[j * scale.roles_per_group : (j + 1) * scale.roles_per_group]  # noqa: E203
+        ]
+    )
+    # For each group, assign the first principals of the tenant to the group
+    Group.principals.through.objects.bulk_create(
+        [
+            Group.principals.through(group=group, principal=principal)
+            for group in groups
+            for principal in principals[: scale.principals_per_group]
+        ]
+    )
+
+
+def setUp(scale=None):
+    """Set up the test data."""
+    scale = scale or Scale()
+    if Tenant.objects.filter(tenant_name__startswith=f"{PREFIX}_acct").exists():
+        print("Test data already exists, run the teardown first to generate it with a different scale.")
+        return
+
+    print(f"Setting up test data {scale.as_dict()}...")
+    ext_tenant, _ = ExtTenant.objects.get_or_create(name="ocm")
+    permissions = _create_permissions(scale)
+
+    for start in range(0, scale.tenants, TENANTS_PER_BATCH):
+        with transaction.atomic():
+            tenants = Tenant.objects.bulk_create(
+                [
+                    Tenant(org_id=str(i), account_id=str(i), tenant_name=f"{PREFIX}_acct{i}", ready=True)
+                    for i in range(start, min(start + TENANTS_PER_BATCH, scale.tenants))
+                ]
             )
-
-        # for each group, add "n" number of roles (should be OCM roles, so those with an external tenant)
-        for k in range(N):
-            name = f"{PREFIX}_role_{i}_{j}_{k}"
-            role = None
-            if Role.objects.filter(name=name).exists():
-                role = Role.objects.get(name=name)
-            else:
-                role = Role.objects.create(
-                    name=name,
-                    tenant=tenant,
-                )
-
-                ExtRoleRelation.objects.create(
-                    ext_id=f"{PREFIX}_r_r{i}_{j}_{k}",
-                    ext_tenant=ext_tenant,
-                    role=role,
-                )
-
-            policy.roles.add(role)
-
-        policy.save()
-        group.policies.add(policy)
-
-        # for each group, assign "n" number of principals to the group
-        for k in range(N):
-            group.principals.add(Principal.objects.get(username=f"{PREFIX}_principal_{i}_{k}"))
-
-        group.save()
-
-    for i in range(N_TENANTS):
-        for j in range(GROUPS_PER_TENANT):
-            create_group(tenants[i], i, j)
+            for tenant in tenants:
+                _create_tenant_data(scale, tenant, ext_tenant, permissions)
+        print(f"Created {min(start + TENANTS_PER_BATCH, scale.tenants)} of {scale.tenants} tenants")
 
     print("Finished setting up test data")
 
@@ -124,12 +134,9 @@ def tearDown():
     """Delete the test data."""
     print("Deleting test data...")
 
-    Principal.objects.filter(username__regex=r"^perf_test_principal_.+").delete()
-    Group.objects.filter(name__regex=r"^perf_test_group_0_0").delete()
-    Policy.objects.filter(name__regex=r"^perf_test_policy_.+").delete()
-    Role.objects.filter(name__regex=r"^perf_test_role_.+").delete()
-    ExtRoleRelation.objects.filter(ext_id__regex=r"^perf_test_r_r_.+").delete()
-    Tenant.objects.filter(tenant_name__regex=r"^perf_test_acct.+").delete()
+    # Everything else belongs to the tenants and is deleted with them
+    Tenant.objects.filter(tenant_name__startswith=f"{PREFIX}_acct").delete()
+    Permission.objects.filter(application=PREFIX).delete()
 
     print("Finished deleting test data")
 
@@ -137,24 +144,26 @@ def tearDown():
 # ------------------------
 # Identity builder helpers
 # ------------------------
-def build_identity():
+def build_identity(org_id="11111", username="user_dev", user_id="51736777", is_org_admin=True, is_internal=True):
     """Build identity."""
     identity = {
         "identity": {
             "account_number": "10001",
-            "org_id": "11111",
+            "org_id": org_id,
             "user": {
-                "username": "user_dev",
-                "email": "user_dev@foo.com",
-                "is_org_admin": True,
-                "is_internal": True,
-                "user_id": "51736777",
+                "username": username,
+                "email": f"{username}@foo.com",
+                "is_org_admin": is_org_admin,
+                "is_internal": is_internal,
+                "user_id": user_id,
             },
         }
     }
-    identity["identity"]["type"] = "Associate"
-    identity["identity"]["associate"] = identity.get("identity").get("user")
-    identity["identity"]["user"]["is_internal"] = True
+    if is_internal:
+        identity["identity"]["type"] = "Associate"
+        identity["identity"]["associate"] = identity.get("identity").get("user")
+    else:
+        identity["identity"]["type"] = "User"
 
     json_identity = json_dumps(identity)
     mock_header = b64encode(json_identity.encode("utf-8"))
@@ -15,13 +15,25 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 #
 """Test the caching system."""
+import json
 import pickle
+import time
 from unittest import skipIf
-from unittest.mock import call, patch
+from unittest.mock import Mock, call, patch
 
+import redis
 from django.conf import settings
-from django.test import TestCase
-from management.cache import TenantCache
+from django.db import DatabaseError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from management.cache import (
+    AccessCache,
+    LocalPrincipalCache,
+    LocalTenantCache,
+    PrincipalCache,
+    RedisCircuitBreaker,
+    TENANT_INVALIDATION_CHANNEL,
+    TenantCache,
+)
 from management.models import Access, Group, Permission, Policy, Principal, ResourceDefinition, Role
 
 from api.models import Tenant
@@ -41,209 +53,265 @@ class AccessCacheTest(TestCase):
     def setUp(self):
         """Set up AccessCache tests."""
         super().setUp()
-        self.principal_a = Principal.objects.create(username="principal_a", tenant=self.tenant)
-        self.principal_b = Principal.objects.create(username="principal_b", tenant=self.tenant)
-        self.group_a = Group.objects.create(name="group_a", platform_default=True, tenant=self.tenant)
-        self.group_b = Group.objects.create(name="group_b", tenant=self.tenant)
-        self.policy_a = Policy.objects.create(name="policy_a", tenant=self.tenant)
-        self.policy_b = Policy.objects.create(name="policy_b", tenant=self.tenant)
-        self.role_a = Role.objects.create(name="role_a", tenant=self.tenant)
-        self.role_b = Role.objects.create(name="role_b", tenant=self.tenant)
+        # Apply the invalidations of the fixtures, so that each test starts without pending invalidations.
+        with patch("management.cache.AccessCache"), self.captureOnCommitCallbacks(execute=True):
+            self.principal_a = Principal.objects.create(username="principal_a", tenant=self.tenant)
+            self.principal_b = Principal.objects.create(username="principal_b", tenant=self.tenant)
+            self.group_a = Group.objects.create(name="group_a", platform_default=True, tenant=self.tenant)
+            self.group_b = Group.objects.create(name="group_b", tenant=self.tenant)
+            self.policy_a = Policy.objects.create(name="policy_a", tenant=self.tenant)
+            self.policy_b = Policy.objects.create(name="policy_b", tenant=self.tenant)
+            self.role_a = Role.objects.create(name="role_a", tenant=self.tenant)
+            self.role_b = Role.objects.create(name="role_b", tenant=self.tenant)
 
     @classmethod
     def tearDownClass(self):
         self.tenant.delete()
         super().tearDownClass()
 
-    @patch("management.group.model.AccessCache.delete_policy")
+    def assign_policies(self):
+        """Assign principal_a to group_a and principal_b to group_b through role_a and role_b."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group_a.principals.add(self.principal_a)
+            self.group_b.principals.add(self.principal_b)
+            self.policy_a.group = self.group_a
+            self.policy_a.save()
+            self.policy_b.group = self.group_b
+            self.policy_b.save()
+            self.policy_a.roles.add(self.role_a)
+            self.policy_b.roles.add(self.role_b)
+
+    @patch("management.cache.AccessCache.delete_policies")
     def test_group_cache_add_remove_signals(self, cache):
         """Test signals attached to Groups"""
-        cache.reset_mock()
-
         # If a Principal is added to a group
-        self.group_a.principals.add(self.principal_a)
-
-        cache.assert_called_once()
-        cache.assert_called_once_with(self.principal_a.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group_a.principals.add(self.principal_a)
+        cache.assert_called_once_with({self.principal_a.uuid})
 
         cache.reset_mock()
         # If a Group is added to a Principal
-        self.principal_b.group.add(self.group_a)
-        cache.asset_called_once()
-        cache.asset_called_once_with(self.principal_b.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.principal_b.group.add(self.group_a)
+        cache.assert_called_once_with({self.principal_b.uuid})
 
         cache.reset_mock()
         # If a Principal is removed from a group
-        self.group_a.principals.remove(self.principal_a)
-        cache.assert_called_once()
-        cache.assert_called_once_with(self.principal_a.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group_a.principals.remove(self.principal_a)
+        cache.assert_called_once_with({self.principal_a.uuid})
 
         cache.reset_mock()
         # If a Group is removed from a Principal
-        self.principal_b.group.remove(self.group_a)
-        cache.asset_called_once()
-        cache.asset_called_once_with(self.principal_b.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.principal_b.group.remove(self.group_a)
+        cache.assert_called_once_with({self.principal_b.uuid})
 
-    @patch("management.group.model.AccessCache.delete_policy")
+    @patch("management.cache.AccessCache.delete_policies")
     def test_group_cache_clear_signals(self, cache):
-        # If all groups are removed from a Principal
-        self.group_a.principals.add(self.principal_a, self.principal_b)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group_a.principals.add(self.principal_a, self.principal_b)
         cache.reset_mock()
-        self.principal_a.group.clear()
-        cache.assert_called_once()
-        cache.assert_called_once_with(self.principal_a.uuid)
+
+        # If all groups are removed from a Principal
+        with self.captureOnCommitCallbacks(execute=True):
+            self.principal_a.group.clear()
+        cache.assert_called_once_with({self.principal_a.uuid})
 
         cache.reset_mock()
         # If all Principals are removed from a Group
-        self.group_a.principals.clear()
-        cache.asset_called_once()
-        cache.asset_called_once_with(self.principal_b.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group_a.principals.clear()
+        cache.assert_called_once_with({self.principal_b.uuid})
 
-    @patch("management.group.model.AccessCache.delete_policy")
+    @patch("management.cache.AccessCache.delete_policies")
     def test_group_cache_delete_group_signal(self, cache):
-        self.group_a.principals.add(self.principal_a)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group_a.principals.add(self.principal_a)
         cache.reset_mock()
-        self.group_a.delete()
-        cache.assert_called_once()
-        cache.assert_called_once_with(self.principal_a.uuid)
 
-    @patch("management.policy.model.AccessCache.delete_all_policies_for_tenant")
-    @patch("management.policy.model.AccessCache.delete_policy")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group_a.delete()
+        cache.assert_called_once_with({self.principal_a.uuid})
+
+    @patch("management.cache.AccessCache.delete_all_policies_for_tenant")
+    @patch("management.cache.AccessCache.delete_policies")
     def test_policy_cache_group_signals(self, cache_delete, cache_delete_all):
         """Test signals attached to Groups"""
-        self.group_a.principals.add(self.principal_a)
-        self.group_b.principals.add(self.principal_b)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group_a.principals.add(self.principal_a)
+            self.group_b.principals.add(self.principal_b)
         cache_delete.reset_mock()
 
-        # If a policy has its group set
-        self.policy_a.group = self.group_a
-        self.policy_a.save()
-        cache_delete_all.asset_called_once()
+        # If a policy has its group set to the platform default group
+        with self.captureOnCommitCallbacks(execute=True):
+            self.policy_a.group = self.group_a
+            self.policy_a.save()
+        cache_delete_all.assert_called_once()
+        cache_delete.assert_not_called()
 
-        cache_delete.reset_mock()
+        cache_delete_all.reset_mock()
         # If a policy has its group changed
-        self.policy_a.group = self.group_b
-        self.policy_a.save()
-        cache_delete.asset_called_once()
-        cache_delete.asset_called_once_with(self.principal_b.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.policy_a.group = self.group_b
+            self.policy_a.save()
+        cache_delete.assert_called_once_with({self.principal_b.uuid})
+        cache_delete_all.assert_not_called()
 
         cache_delete.reset_mock()
         # If a policy is deleted
-        self.policy_a.delete()
-        cache_delete.assert_called_once()
-        cache_delete.assert_called_once_with(self.principal_b.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.policy_a.delete()
+        cache_delete.assert_called_once_with({self.principal_b.uuid})
 
-    @patch("management.policy.model.AccessCache.delete_all_policies_for_tenant")
-    @patch("management.policy.model.AccessCache.delete_policy")
+    @patch("management.cache.AccessCache.delete_all_policies_for_tenant")
+    @patch("management.cache.AccessCache.delete_policies")
     def test_policy_cache_add_remove_roles_signals(self, cache_delete, cache_delete_all):
         """Test signals attached to Policy/Roles"""
-        self.group_b.principals.add(self.principal_b)
-        self.policy_a.group = self.group_a
-        self.policy_a.save()
-        self.policy_b.group = self.group_b
-        self.policy_b.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group_b.principals.add(self.principal_b)
+            self.policy_a.group = self.group_a
+            self.policy_a.save()
+            self.policy_b.group = self.group_b
+            self.policy_b.save()
         cache_delete.reset_mock()
+        cache_delete_all.reset_mock()
 
         # If a Role is added to a platform default group's Policy
-        self.policy_a.roles.add(self.role_a)
-        self.policy_a.save()
-        cache_delete_all.asset_called_once()
-
-        cache_delete.reset_mock()
-        # If a Policy is added to a Role
-        self.role_b.policies.add(self.policy_a)
-        cache_delete.asset_called_once()
-        cache_delete.asset_called_once_with(self.principal_b.uuid)
-
-        cache_delete.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.policy_a.roles.add(self.role_a)
+        cache_delete_all.assert_called_once()
+        cache_delete.assert_not_called()
+
+        cache_delete_all.reset_mock()
+        # If a platform default group's Policy is added to a Role
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role_b.policies.add(self.policy_a)
+        cache_delete_all.assert_called_once()
+        cache_delete.assert_not_called()
+
+        cache_delete_all.reset_mock()
         # If a Role is removed from a platform default group's Policy
-        self.policy_a.roles.remove(self.role_a)
-        self.policy_a.save()
-        cache_delete_all.asset_called_once()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.policy_a.roles.remove(self.role_a)
+        cache_delete_all.assert_called_once()
+        cache_delete.assert_not_called()
 
-        cache_delete.reset_mock()
+        cache_delete_all.reset_mock()
         # If a Role is removed from a Policy
-        self.policy_b.roles.remove(self.role_b)
-        cache_delete.assert_called_once()
-        cache_delete.assert_called_once_with(self.principal_b.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.policy_b.roles.remove(self.role_b)
+        cache_delete.assert_called_once_with({self.principal_b.uuid})
 
         cache_delete.reset_mock()
         # If a Policy is removed from a Role
-        self.role_b.policies.remove(self.policy_b)
-        cache_delete.asset_called_once()
-        cache_delete.asset_called_once_with(self.principal_b.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role_b.policies.remove(self.policy_b)
+        cache_delete.assert_called_once_with({self.principal_b.uuid})
+        cache_delete_all.assert_not_called()
 
-    @patch("management.policy.model.AccessCache.delete_policy")
+    @patch("management.cache.AccessCache.delete_policies")
     def test_policy_cache_clear_signals(self, cache):
-        self.group_a.principals.add(self.principal_a)
-        self.group_b.principals.add(self.principal_b)
-        self.policy_a.group = self.group_a
-        self.policy_a.save()
-        self.policy_b.group = self.group_b
-        self.policy_b.save()
-        self.policy_a.roles.add(self.role_a)
-        self.policy_b.roles.add(self.role_b)
+        self.assign_policies()
         cache.reset_mock()
 
         # If all policies are removed from a role
-        self.role_a.policies.clear()
-        cache.assert_called_once()
-        cache.assert_called_once_with(self.principal_a.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role_a.policies.clear()
+        cache.assert_called_once_with({self.principal_a.uuid})
 
         cache.reset_mock()
         # If all Roles are removed from a Policy
-        self.policy_b.roles.clear()
-        cache.asset_called_once()
-        cache.asset_called_once_with(self.principal_b.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.policy_b.roles.clear()
+        cache.assert_called_once_with({self.principal_b.uuid})
 
-    @patch("management.role.model.AccessCache.delete_policy")
+    @patch("management.cache.AccessCache.delete_policies")
     def test_policy_cache_change_delete_roles_signals(self, cache):
-        self.group_a.principals.add(self.principal_a)
-        self.group_b.principals.add(self.principal_b)
-        self.policy_a.group = self.group_a
-        self.policy_a.save()
-        self.policy_b.group = self.group_b
-        self.policy_b.save()
-        self.policy_a.roles.add(self.role_a)
-        self.policy_b.roles.add(self.role_b)
+        self.assign_policies()
         cache.reset_mock()
 
         # If a role is changed
-        self.role_a.version += 1
-        self.role_a.save()
-        cache.assert_called_once()
-        cache.assert_called_once_with(self.principal_a.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role_a.version += 1
+            self.role_a.save()
+        cache.assert_called_once_with({self.principal_a.uuid})
 
         cache.reset_mock()
         # If Access is added
-        self.permission = Permission.objects.create(permission="foo:*:*", tenant=self.tenant)
-        self.access_a = Access.objects.create(permission=self.permission, role=self.role_a, tenant=self.tenant)
-        cache.assert_called_once()
-        cache.assert_called_once_with(self.principal_a.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.permission = Permission.objects.create(permission="foo:*:*", tenant=self.tenant)
+            self.access_a = Access.objects.create(permission=self.permission, role=self.role_a, tenant=self.tenant)
+        cache.assert_called_once_with({self.principal_a.uuid})
 
         cache.reset_mock()
         # If ResourceDefinition is added
-        self.rd_a = ResourceDefinition.objects.create(access=self.access_a, tenant=self.tenant)
-        cache.assert_called_once()
-        cache.assert_called_once_with(self.principal_a.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rd_a = ResourceDefinition.objects.create(access=self.access_a, tenant=self.tenant)
+        cache.assert_called_once_with({self.principal_a.uuid})
 
         cache.reset_mock()
         # If ResourceDefinition is destroyed
-        self.rd_a.delete()
-        cache.assert_called_once()
-        cache.assert_called_once_with(self.principal_a.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rd_a.delete()
+        cache.assert_called_once_with({self.principal_a.uuid})
 
         cache.reset_mock()
         # If Access is destroyed
-        self.access_a.delete()
-        cache.assert_called_once()
-        cache.assert_called_once_with(self.principal_a.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.access_a.delete()
+        cache.assert_called_once_with({self.principal_a.uuid})
 
         cache.reset_mock()
         # If Role is destroyed
-        self.role_a.delete()
-        cache.assert_called_once()
-        cache.assert_called_once_with(self.principal_a.uuid)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.role_a.delete()
+        cache.assert_called_once_with({self.principal_a.uuid})
+
+    @patch("management.cache.AccessCache.delete_all_policies_for_tenant")
+    @patch("management.cache.AccessCache.delete_policies")
+    def test_invalidations_coalesced_per_transaction(self, cache_delete, cache_delete_all):
+        """Test that the invalidations of a transaction are applied once it commits, in one delete."""
+        self.assign_policies()
+        cache_delete.reset_mock()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group_b.principals.add(self.principal_a)
+            self.role_a.version += 1
+            self.role_a.save()
+            permission = Permission.objects.create(permission="foo:*:*", tenant=self.tenant)
+            access = Access.objects.create(permission=permission, role=self.role_a, tenant=self.tenant)
+            ResourceDefinition.objects.create(access=access, tenant=self.tenant)
+            cache_delete.assert_not_called()
+        cache_delete.assert_called_once_with({self.principal_a.uuid})
+        cache_delete_all.assert_not_called()
+
+    @patch("management.cache.AccessCache.delete_all_policies_for_tenant")
+    @patch("management.cache.AccessCache.delete_policies")
+    def test_invalidations_above_threshold_invalidate_tenant(self, cache_delete, cache_delete_all):
+        """Test that the whole tenant is invalidated when too many principals are."""
+        with override_settings(ACCESS_CACHE_INVALIDATION_TENANT_THRESHOLD=1):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.group_b.principals.add(self.principal_a, self.principal_b)
+        cache_delete_all.assert_called_once()
+        cache_delete.assert_not_called()
+
+    @patch("management.cache.AccessCache.delete_policies")
+    def test_invalidations_rolled_back(self, cache):
+        """Test that the invalidations of a rolled back savepoint are discarded, unless others are committed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.group_b.principals.add(self.principal_a)
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+        cache.assert_not_called()
+
+        # The invalidations collected in the savepoint are purged along with the committed ones, which is harmless.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group_b.principals.add(self.principal_b)
+        cache.assert_called_once_with({self.principal_a.uuid, self.principal_b.uuid})
 
 
 class TenantCacheTest(TestCase):
@@ -259,8 +327,7 @@ class TenantCacheTest(TestCase):
         super().tearDownClass()
 
     @patch("management.cache.TenantCache.connection")
-    @patch("management.cache.BasicCache.redis_health_check")
-    def test_tenant_cache_functions_success(self, redis_health_check, redis_connection):
+    def test_tenant_cache_functions_success(self, redis_connection):
         tenant_name = self.tenant.tenant_name
         tenant_org_id = self.tenant.org_id
         key = f"rbac::tenant::tenant={tenant_org_id}"
@@ -272,10 +339,9 @@ class TenantCacheTest(TestCase):
         self.assertTrue(call().__enter__().set(key, dump_content) in redis_connection.pipeline.mock_calls)
 
         redis_connection.get.return_value = dump_content
-        redis_health_check.return_value = True
-        # Get tenant from cache
+        # Get tenant from cache, without pinging redis first
         tenant = tenant_cache.get_tenant(tenant_org_id)
-        redis_health_check.assert_called_once()
+        redis_connection.ping.assert_not_called()
         redis_connection.get.assert_called_once_with(key)
         self.assertEqual(tenant, self.tenant)
 
@@ -284,8 +350,8 @@ class TenantCacheTest(TestCase):
         redis_connection.delete.assert_called_once_with(key)
 
     @patch("management.cache.TenantCache.connection")
-    @patch("management.cache.BasicCache.redis_health_check")
-    def test_tenant_cache_functions_failure(self, redis_health_check, redis_connection):
+    @patch("management.cache.circuit_breaker.allow_request")
+    def test_tenant_cache_functions_failure(self, allow_request, redis_connection):
         tenant_name = self.tenant.tenant_name
         tenant_org_id = self.tenant.org_id
         key = f"rbac::tenant::tenant={tenant_org_id}"
@@ -297,8 +363,218 @@ class TenantCacheTest(TestCase):
         self.assertTrue(call().__enter__().set(key, dump_content) in redis_connection.pipeline.mock_calls)
 
         redis_connection.get.return_value = dump_content
-        redis_health_check.return_value = False
-        # Get tenant from cache (should fail because redis_health_check failed)
+        allow_request.return_value = False
+        # Get tenant from cache (should fail because the circuit breaker is open)
         tenant = tenant_cache.get_tenant(tenant_org_id)
-        redis_health_check.assert_called_once()
+        allow_request.assert_called_once()
+        redis_connection.get.assert_not_called()
         self.assertNotEqual(tenant, self.tenant)
+
+    @patch("management.cache.TenantCache.connection")
+    @patch("management.cache._tenant_invalidation_listener")
+    def test_tenant_served_from_local_cache(self, listener, redis_connection):
+        """Test that tenants are served from the in-process cache while invalidations are received."""
+        listener.subscribed = True
+        redis_connection.get.return_value = pickle.dumps(self.tenant)
+        tenant_cache = TenantCache()
+        with patch("management.cache._local_tenants", LocalTenantCache(maxsize=10, ttl=60)):
+            self.assertEqual(tenant_cache.get_tenant(self.tenant.org_id), self.tenant)
+            self.assertEqual(tenant_cache.get_tenant(self.tenant.org_id), self.tenant)
+            redis_connection.get.assert_called_once()
+
+            tenant_cache.delete_tenant(self.tenant.org_id)
+            redis_connection.publish.assert_called_once_with(TENANT_INVALIDATION_CHANNEL, self.tenant.org_id)
+            self.assertEqual(tenant_cache.get_tenant(self.tenant.org_id), self.tenant)
+            self.assertEqual(redis_connection.get.call_count, 2)
+
+    @patch("management.cache.TenantCache.connection")
+    @patch("management.cache._tenant_invalidation_listener")
+    def test_local_cache_skipped_without_subscription(self, listener, redis_connection):
+        """Test that the in-process cache is not used while invalidations cannot be received."""
+        listener.subscribed = False
+        redis_connection.get.return_value = pickle.dumps(self.tenant)
+        tenant_cache = TenantCache()
+        with patch("management.cache._local_tenants", LocalTenantCache(maxsize=10, ttl=60)) as local_tenants:
+            tenant_cache.get_tenant(self.tenant.org_id)
+            tenant_cache.get_tenant(self.tenant.org_id)
+            self.assertIsNone(local_tenants.get(self.tenant.org_id))
+        self.assertEqual(redis_connection.get.call_count, 2)
+
+
+class LocalTenantCacheTest(SimpleTestCase):
+    def setUp(self):
+        """Set up a cache with a controllable clock."""
+        self.now = 0.0
+        self.cache = LocalTenantCache(maxsize=2, ttl=60, clock=lambda: self.now)
+
+    def test_least_recently_used_evicted(self):
+        """Test that the least recently used tenant is evicted when the cache is full."""
+        self.cache.set("1", Tenant(org_id="1"))
+        self.cache.set("2", Tenant(org_id="2"))
+        self.cache.get("1")
+        self.cache.set("3", Tenant(org_id="3"))
+
+        self.assertIsNone(self.cache.get("2"))
+        self.assertEqual(self.cache.get("1").org_id, "1")
+        self.assertEqual(self.cache.get("3").org_id, "3")
+
+    def test_entries_expire(self):
+        """Test that tenants expire after the TTL."""
+        self.cache.set("1", Tenant(org_id="1"))
+        self.now = 59
+        self.assertIsNotNone(self.cache.get("1"))
+        self.now = 60
+        self.assertIsNone(self.cache.get("1"))
+
+    def test_each_lookup_gets_a_copy(self):
+        """Test that changes to a returned tenant do not leak into the cache."""
+        self.cache.set("1", Tenant(org_id="1", ready=False))
+        self.cache.get("1").ready = True
+        self.assertFalse(self.cache.get("1").ready)
+
+        self.cache.delete("1")
+        self.assertIsNone(self.cache.get("1"))
+
+
+class PrincipalCacheTest(SimpleTestCase):
+    def setUp(self):
+        """Set up an in-process principal cache with a controllable clock."""
+        self.now = 0.0
+        self.local_principals = LocalPrincipalCache(maxsize=10, ttl=60, clock=lambda: self.now)
+        patcher = patch("management.cache._local_principals", self.local_principals)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch("management.cache.PrincipalCache.get_cached")
+    def test_redis_entry_cached_in_process_until_it_expires(self, get_cached):
+        """Test that a lookup found in Redis is cached in the process for the rest of its TTL only."""
+        get_cached.return_value = {"data": [{"username": "user"}], "duration": 0.2, "expires": time.time() + 10}
+
+        self.assertEqual(PrincipalCache().get_principal("key")["data"], [{"username": "user"}])
+        self.assertIsNotNone(self.local_principals.get("key"))
+        self.now = 11
+        self.assertIsNone(self.local_principals.get("key"))
+
+    @patch("management.cache.PrincipalCache.save")
+    @patch("management.cache.PrincipalCache.get_cached", return_value=None)
+    def test_saved_entry_served_in_process(self, get_cached, save):
+        """Test that a saved lookup is served from the process without querying Redis."""
+        cache = PrincipalCache()
+        self.assertIsNone(cache.get_principal("key"))
+        cache.save_principal("key", [{"username": "user"}], 0.2)
+
+        self.assertEqual(cache.get_principal("key")["data"], [{"username": "user"}])
+        get_cached.assert_called_once()
+        save.assert_called_once()
+
+
+class AccessCacheGenerationTest(TestCase):
+    @patch("management.cache.AccessCache.connection")
+    def test_policy_saved_and_read_with_generation(self, redis_connection):
+        """Test that policies are saved under the generation observed when reading them."""
+        pipe = redis_connection.pipeline.return_value.__enter__.return_value
+        pipe.execute.return_value = [b"3", None]
+        cache = AccessCache("12345")
+
+        self.assertIsNone(cache.get_policy("uuid", "app"))
+        pipe.get.assert_called_once_with("rbac::policy::tenant=12345::generation")
+        pipe.hget.assert_called_once_with("rbac::policy::tenant=12345::user=uuid", "app")
+
+        cache.save_policy("uuid", "app", [{"permission": "app:*:*"}])
+        entry = json.dumps({"generation": 3, "policy": [{"permission": "app:*:*"}]})
+        pipe.hset.assert_called_once_with("rbac::policy::tenant=12345::user=uuid", "app", entry)
+
+        pipe.execute.return_value = [b"3", entry.encode()]
+        self.assertEqual(cache.get_policy("uuid", "app"), [{"permission": "app:*:*"}])
+
+    @patch("management.cache.AccessCache.connection")
+    def test_tenant_invalidation_makes_entries_stale(self, redis_connection):
+        """Test that a tenant-wide invalidation increments the generation instead of scanning keys."""
+        cache = AccessCache("12345")
+        cache.delete_all_policies_for_tenant()
+        redis_connection.incr.assert_called_once_with("rbac::policy::tenant=12345::generation")
+        redis_connection.keys.assert_not_called()
+
+        entry = json.dumps({"generation": 3, "policy": [{"permission": "app:*:*"}]})
+        pipe = redis_connection.pipeline.return_value.__enter__.return_value
+        pipe.execute.return_value = [b"4", entry.encode()]
+        self.assertIsNone(cache.get_policy("uuid", "app"))
+
+    @patch("management.cache.time.time_ns", return_value=1700000000000000000)
+    @patch("management.cache.AccessCache.connection")
+    def test_missing_generation_makes_entries_stale(self, redis_connection, _):
+        """Test that entries are stale when the generation was evicted, which restarts from the current time."""
+        entry = json.dumps({"generation": 0, "policy": [{"permission": "app:*:*"}]})
+        pipe = redis_connection.pipeline.return_value.__enter__.return_value
+        pipe.execute.return_value = [None, entry.encode()]
+        redis_connection.get.return_value = b"1700000000000000000"
+        cache = AccessCache("12345")
+
+        self.assertIsNone(cache.get_policy("uuid", "app"))
+        redis_connection.set.assert_called_once_with(
+            "rbac::policy::tenant=12345::generation", 1700000000000000000, nx=True
+        )
+
+        cache.save_policy("uuid", "app", [{"permission": "app:*:*"}])
+        entry = json.dumps({"generation": 1700000000000000000, "policy": [{"permission": "app:*:*"}]})
+        pipe.hset.assert_called_once_with("rbac::policy::tenant=12345::user=uuid", "app", entry)
+
+
+class RedisCircuitBreakerTest(SimpleTestCase):
+    def setUp(self):
+        """Set up a breaker with a controllable clock."""
+        self.now = 0.0
+        self.breaker = RedisCircuitBreaker(
+            failure_threshold=2, open_seconds=30, half_open_seconds=5, clock=lambda: self.now
+        )
+
+    def test_opens_after_consecutive_failures(self):
+        """Test that the breaker only opens after the configured number of consecutive failures."""
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, RedisCircuitBreaker.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_half_open_lets_one_trial_through(self):
+        """Test that an open breaker lets a single trial command through once the open period has passed."""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+
+        self.now = 30
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, RedisCircuitBreaker.HALF_OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        self.now = 35
+        self.assertTrue(self.breaker.allow_request())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, RedisCircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_trial_reopens(self):
+        """Test that a failed trial command opens the breaker again."""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.now = 30
+        self.assertTrue(self.breaker.allow_request())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, RedisCircuitBreaker.OPEN)
+        self.now = 59
+        self.assertFalse(self.breaker.allow_request())
+
+    @patch("management.cache.TenantCache.connection")
+    def test_failed_commands_skip_the_cache(self, redis_connection):
+        """Test that failed commands open the shared breaker and later lookups skip Redis."""
+        breaker = RedisCircuitBreaker(failure_threshold=1, open_seconds=30, half_open_seconds=5)
+        redis_connection.get = Mock(side_effect=redis.exceptions.ConnectionError)
+        with patch("management.cache.circuit_breaker", breaker):
+            tenant_cache = TenantCache()
+            self.assertIsNone(tenant_cache.get_tenant("12345"))
+            self.assertIsNone(tenant_cache.get_tenant("12345"))
+        redis_connection.get.assert_called_once()
+        self.assertEqual(breaker.state, RedisCircuitBreaker.OPEN)
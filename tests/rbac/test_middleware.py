@@ -49,7 +49,14 @@ from migration_tool.in_memory_tuples import (
 )
 from tests.identity_request import IdentityRequest
 from rbac import urls
-from rbac.middleware import HttpResponseUnauthorizedRequest, IdentityHeaderMiddleware, ReadOnlyApiMiddleware
+from rbac.instrumentation import record_redis_call, track_external_call
+from rbac.middleware import (
+    HttpResponseUnauthorizedRequest,
+    IdentityHeaderMiddleware,
+    ReadOnlyApiMiddleware,
+    RequestInstrumentationMiddleware,
+)
+from prometheus_client import REGISTRY
 from management.models import Access, Group, Permission, Principal, Policy, ResourceDefinition, Role
 
 
@@ -593,6 +600,23 @@ class AccessHandlingTest(TestCase):
         }
         self.assertEqual(expected, access)
 
+    @patch("management.cache.AccessCache.save_user_access")
+    @patch("management.cache.AccessCache.get_user_access")
+    def test_principal_access_served_from_cache(self, get_user_access, save_user_access):
+        """Test that the access map is read from the access cache, and only computed and saved on a miss."""
+        principal = Principal.objects.create(username="test_user", tenant=self.tenant)
+        cached = {"group": {"read": ["*"], "write": []}}
+        get_user_access.return_value = cached
+        with self.assertNumQueries(1):
+            access = IdentityHeaderMiddleware._get_access_for_user("test_user", self.tenant)
+        self.assertEqual(access, cached)
+        get_user_access.assert_called_once_with(principal.uuid)
+        save_user_access.assert_not_called()
+
+        get_user_access.return_value = None
+        access = IdentityHeaderMiddleware._get_access_for_user("test_user", self.tenant)
+        save_user_access.assert_called_once_with(principal.uuid, access)
+
 
 class RBACReadOnlyApiMiddleware(IdentityRequest):
     """Tests against the read-only API middleware."""
@@ -803,3 +827,62 @@ class RBACReadOnlyApiMiddlewareV2(RBACReadOnlyApiMiddleware):
             middleware = ReadOnlyApiMiddleware(get_response=Mock())
             resp = middleware.process_request(self.request)
             self.assertEqual(resp, None)
+
+
+class RequestInstrumentationMiddlewareTest(IdentityRequest):
+    """Tests against the request instrumentation middleware."""
+
+    def setUp(self):
+        """Set up the instrumentation middleware tests."""
+        super().setUp()
+        self.labels = {"behalf": "principal", "method": "GET", "view": "role-list", "status": "200"}
+
+    def sample(self, name, **labels):
+        """Return the value of a metric sample for the role list requests."""
+        return REGISTRY.get_sample_value(name, {**self.labels, **labels}) or 0
+
+    def test_records_queries_per_view(self):
+        """Test that the queries of a request are recorded under its view."""
+        before_count = self.sample("rbac_request_db_queries_count")
+        before_sum = self.sample("rbac_request_db_queries_sum")
+
+        response = APIClient().get(reverse("v1_management:role-list"), **self.headers)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.sample("rbac_request_db_queries_count"), before_count + 1)
+        self.assertGreater(self.sample("rbac_request_db_queries_sum"), before_sum)
+
+    def test_records_redis_and_external_calls(self):
+        """Test that the Redis and external calls made by the view are recorded."""
+
+        def get_response(request):
+            record_redis_call()
+            record_redis_call()
+            with track_external_call("bop"):
+                pass
+            return Mock(status_code=200)
+
+        request = RequestFactory().get("/api/rbac/v1/roles/")
+        request.resolver_match = Mock(url_name="role-list")
+        before_redis = self.sample("rbac_request_redis_calls_sum")
+        before_bop = self.sample("rbac_request_external_seconds_count", service="bop")
+
+        RequestInstrumentationMiddleware(get_response)(request)
+
+        self.assertEqual(self.sample("rbac_request_redis_calls_sum"), before_redis + 2)
+        self.assertEqual(self.sample("rbac_request_external_seconds_count", service="bop"), before_bop + 1)
+
+    @override_settings(REQUEST_QUERY_BUDGET=1)
+    def test_logs_requests_over_budget(self):
+        """Test that a request over the query budget is logged with its slowest query."""
+        with self.assertLogs("rbac.middleware", level="WARNING") as logs:
+            APIClient().get(reverse("v1_management:role-list"), **self.headers)
+
+        self.assertTrue(any("Request over budget" in line and "SELECT" in line for line in logs.output))
+
+    def test_no_log_within_budget(self):
+        """Test that requests aren't logged when no budget is set."""
+        with patch("rbac.middleware.logger.warning") as warning:
+            APIClient().get(reverse("v1_management:role-list"), **self.headers)
+
+        self.assertFalse(any("Request over budget" in str(args) for args in warning.call_args_list))